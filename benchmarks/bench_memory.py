@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""bench_memory
+
+Compare the memory used by the students of a parsed table when they are
+stored as defaultdict(str) keyed by column title and as Student records.
+
+Usage: PYTHONPATH=. python benchmarks/bench_memory.py [nb_students]
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from collections import defaultdict
+import sys
+import tracemalloc
+from grades import parsers, writers
+from grades.student import Student
+from bench_parsers import make_table
+
+
+def measure(build):
+    """Return the result of build() and the number of bytes it allocated."""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main(nb_students=50000):
+    rows = str(writers.TableWriter(make_table(nb_students))).split('\n')
+    table = parsers.TableParser().parse([row.strip() for row in rows
+                                         if row.strip()])
+    titles = [column['title'] for column in table.columns]
+    entries = [[student[title] for title in titles]
+               for student in table.students]
+    layout = dict((title, i) for i, title in enumerate(titles))
+
+    dicts, dicts_size = measure(
+            lambda: [defaultdict(str, zip(titles, values))
+                     for values in entries])
+    records, records_size = measure(
+            lambda: [Student(layout, values) for values in entries])
+    assert dicts == records
+    print('{} students, {} columns'.format(nb_students, len(titles)))
+    print('defaultdict: {:8.1f} MB ({:.0f} bytes per student)'.format(
+            dicts_size / 1e6, dicts_size / nb_students))
+    print('Student:     {:8.1f} MB ({:.0f} bytes per student)'.format(
+            records_size / 1e6, records_size / nb_students))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""bench_parsers
+
+Compare the time needed to split the rows of a large table into cells with
+the row layouts of the parsers against splitting the rows one by one, for
+each table format.
+
+Usage: PYTHONPATH=. python benchmarks/bench_parsers.py [nb_students]
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import random
+import re
+import sys
+import timeit
+from grades import gradestable, parsers, writers
+
+
+def make_table(nb_students):
+    """Return a GradesTable with nb_students random students."""
+    rand = random.Random(42)
+    table = gradestable.GradesTable()
+    table.columns = [
+            {'title': 'Name', 'is_num': False, 'evalu': None, 'width': 0},
+            {'title': 'Group', 'is_num': False, 'evalu': None, 'width': 0}]
+    for i in range(1, 6):
+        table.columns.append({'title': 'Test %d' % i, 'is_num': True,
+                              'evalu': {'max_grade': 100., 'weight': 20.},
+                              'width': 0})
+    for i in range(nb_students):
+        student = {'Name': 'Student %d' % i, 'Group': str(301 + i % 3)}
+        for column in table.columns[2:]:
+            if rand.random() < 0.1:
+                student[column['title']] = 'ABS'
+            else:
+                student[column['title']] = rand.uniform(0, 100)
+        table.students.append(student)
+    return table
+
+
+def split_rows_pipe(rows):
+    """Split rows one by one, compiling the separator for each row."""
+    return [re.compile(r'\s*\|\s*').split(row)[1:-1] for row in rows]
+
+
+def split_rows_fixed(rows, columns):
+    """Split rows one by one, slicing and stripping each cell."""
+    return [[row[start:end].strip() for start, end in columns]
+            for row in rows]
+
+
+def main(nb_students=50000):
+    table = make_table(nb_students)
+    print('{} students'.format(nb_students))
+    formats = (('org', writers.TableWriter),
+               ('simple_rst', writers.SimpleRSTWriter),
+               ('grid_rst', writers.GridRSTWriter))
+    for table_format, writer in formats:
+        rows = [row.strip() for row in str(writer(table)).split('\n')
+                if row.strip()]
+        if table_format == 'simple_rst':
+            tparser = parsers.SimpleRSTParser(rows[0])
+            reference = lambda: split_rows_fixed(body, tparser.columns)
+        else:
+            tparser = parsers.TableParser()
+            reference = lambda: split_rows_pipe(body)
+        tparser.layout.compile([tparser.split_row(rows[1])])
+        body = [row for row in rows[1:]
+                if not row.startswith(parsers.ROW_SEPS)]
+        assert ([list(cells) for cells in tparser.layout.split_all(body)] ==
+                reference())
+        before = min(timeit.repeat(reference, number=1, repeat=3))
+        after = min(timeit.repeat(lambda: tparser.layout.split_all(body),
+                                  number=1, repeat=3))
+        parse = min(timeit.repeat(lambda: tparser.parse(rows), number=1,
+                                  repeat=3))
+        print('{:<12} split: {:.3f}s -> {:.3f}s ({:.1f}x)   parse: {:.3f}s'
+              .format(table_format, before, after, before / after, parse))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
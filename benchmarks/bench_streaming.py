@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""bench_streaming
+
+Compare the peak memory used to print a grades file with its cumulative
+grades and means when the whole table is parsed (GradesFile) and when it is
+printed a chunk of students at a time (StreamingFile), for files of
+increasing size.
+
+Usage: PYTHONPATH=. python benchmarks/bench_streaming.py [nb_students]
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import os
+import sys
+import tempfile
+import tracemalloc
+from grades import streaming, writers
+from bench_parsers import make_table
+
+
+def peak(run):
+    """Return the peak number of bytes allocated by run()."""
+    tracemalloc.start()
+    run()
+    size = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size
+
+
+def print_whole(fname, output):
+    gfile = writers.GradesFile(fname)
+    gfile.table.compute_cumul()
+    gfile.table.compute_mean()
+    gfile.table.compute_grouped_mean('Group')
+    gfile.print_file(div_on=('Group',), file=output)
+
+
+def print_streaming(fname, output):
+    sfile = streaming.StreamingFile(fname, cumul=True, mean=True,
+                                    group_by='Group')
+    sfile.print_file(div_on=('Group',), file=output)
+
+
+def main(nb_students=100000):
+    output = open(os.devnull, 'w')
+    for size in (nb_students // 5, nb_students):
+        fd, fname = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as fileh:
+            writers.SimpleRSTWriter(make_table(size)).printt(file=fileh)
+        whole = peak(lambda: print_whole(fname, output))
+        stream = peak(lambda: print_streaming(fname, output))
+        os.unlink(fname)
+        print('{:7d} students: GradesFile {:6.1f} MB, StreamingFile {:6.1f} MB'
+              .format(size, whole / 1e6, stream / 1e6))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main()
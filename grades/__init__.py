@@ -25,7 +25,16 @@ __license__ = "BSD"
 __version__ = "0.3dev"
 
 
+from . import aggregates
+from . import cache
+from . import categorical
+from . import columnar
 from . import gradestable
+from . import indexes
 from . import parsers
+from . import query
+from . import schema
+from . import streaming
+from . import student
 from . import ui
 from . import writers
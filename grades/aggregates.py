@@ -0,0 +1,331 @@
+#-*- coding: utf-8 -*-
+"""aggregates
+
+This module provides running aggregates of the numerical columns of a
+GradesTable.
+
+An Aggregates object keeps, for each numerical column, the number of grades,
+their sum and the sum of their squares, overall and for each group of
+students of a few group_by columns. It also keeps the weighted total of the
+evaluations of each student, from which the cumulative grade is obtained.
+When students are appended, modified or deleted through the table, only the
+entries of these students are added or removed, in O(columns) time, so that
+the means and the cumulative grades are available without going through all
+the students again (see GradesTable.create_aggregates).
+
+The sum of the grades of a column is the floating point sum of the grades in
+the order of the rows, as computed by compute_mean and compute_grouped_mean,
+so that the means are the same whether they come from the aggregates or not.
+Grades added at the end of the table are simply added to the sum. Removing or
+changing a grade generally changes the rounding of the sum: unless all the
+grades are integers, whose sums are exact, the sum is then computed again
+from the students the next time it is needed (see Aggregates.refresh). The
+sums of squares, used for the variance, are kept without rounding errors.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import math
+
+
+class ExactSum:
+    """Sum of floating point numbers without rounding errors.
+
+    The sum is stored as a list of non overlapping partial sums, as done by
+    math.fsum (Shewchuk's algorithm). A number is removed from the sum by
+    adding its opposite. Numbers added in bulk with extend are first summed
+    with math.fsum, with an error of at most half an ulp.
+
+    """
+    __slots__ = ('partials',)
+
+    def __init__(self):
+        self.partials = []
+
+    def add(self, x):
+        """Add x to the sum."""
+        partials = self.partials
+        i = 0
+        for y in partials:
+            if abs(x) < abs(y):
+                x, y = y, x
+            high = x + y
+            low = y - (high - x)
+            if low:
+                partials[i] = low
+                i += 1
+            x = high
+        partials[i:] = [x]
+
+    def extend(self, numbers):
+        """Add the numbers of the iterable numbers to the sum. Their sum is
+        correctly rounded first, which is much faster than adding the
+        numbers one by one."""
+        self.add(math.fsum(numbers))
+
+    def value(self):
+        """Return the sum, correctly rounded."""
+        return math.fsum(self.partials)
+
+
+# Sums of integers smaller than this bound are exact.
+_EXACT_BOUND = 2. ** 53
+
+
+class Stats:
+    """Number of grades, sum and sum of squares of the grades of a column.
+
+    total is the sum of the grades in the order of the rows or None if it was
+    lost by removing or inserting a grade. bound is the sum of the absolute
+    values of the grades if they are all integers and None otherwise.
+
+    """
+    __slots__ = ('count', 'total', 'bound', 'squares')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.bound = 0.
+        self.squares = ExactSum()
+
+    def _exact(self, grade):
+        """Return True if the sums stay exact with grade."""
+        if self.bound is not None and float(grade).is_integer():
+            self.bound += abs(grade)
+            if self.bound < _EXACT_BOUND:
+                return True
+        self.bound = None
+        return False
+
+    def add(self, grade, last=True):
+        """Add grade. last is False if grade does not come after all the
+        other grades in the order of the rows."""
+        self.count += 1
+        if not self._exact(grade) and not last:
+            self.total = None
+        elif self.total is not None:
+            self.total += grade
+        self.squares.add(grade * grade)
+
+    def extend(self, grades):
+        """Add all the grades of the list grades, which come after the other
+        grades in the order of the rows."""
+        self.count += len(grades)
+        if self.bound is not None:
+            for grade in grades:
+                if not self._exact(grade):
+                    break
+        if self.total is not None:
+            self.total = sum(grades, self.total)
+        self.squares.extend([grade * grade for grade in grades])
+
+    def remove(self, grade):
+        """Remove grade, which was added before."""
+        self.count -= 1
+        if self.bound is None:
+            self.total = None
+        elif self.total is not None:
+            self.total -= grade
+        self.squares.add(-grade * grade)
+
+    def mean(self):
+        """Return the mean of the grades or None if there is none. The sum
+        of the grades must be known."""
+        if not self.count:
+            return None
+        return self.total / self.count
+
+    def variance(self):
+        """Return the population variance of the grades or None if there is
+        none."""
+        if not self.count:
+            return None
+        mean = self.mean()
+        return max(self.squares.value() / self.count - mean * mean, 0.)
+
+
+def _is_number(entry):
+    """Return True if entry is a grade."""
+    return isinstance(entry, (float, int))
+
+
+def _stats(entries):
+    """Return the Stats of the grades among entries, in order."""
+    stats = Stats()
+    stats.extend([entry for entry in entries if _is_number(entry)])
+    return stats
+
+
+class Aggregates:
+    """Running aggregates of the numerical columns of a table.
+
+    Input
+    -----
+    students: list
+       The students of the table.
+
+    columns: schema.Schema
+       The columns of the table.
+
+    group_by: iterable
+       Titles of the columns used to group the students.
+
+    version: int
+       Version of the table the aggregates are built from.
+
+    ``columns`` maps each numerical column title to its Stats, ``groups``
+    maps each group_by title to a dictionary that maps each group, in order
+    of first appearance, to the Stats of the columns for the students of this
+    group. ``totals`` and ``weights`` are the weighted totals and the total
+    weights of the evaluations of each student, as computed by
+    GradesTable.compute_cumul. ``lost`` is True if the sums of some Stats
+    were lost and must be computed again with refresh.
+
+    """
+    def __init__(self, students, columns, group_by=(), version=0):
+        self.titles = [column.title for column in columns if column.is_num]
+        supp = columns.supplemental
+        self.evaluations = [(column.title, column.evalu['weight'],
+                             column.evalu['max_grade'])
+                            for column in columns.evaluations
+                            if column is not supp]
+        self.group_by = tuple(group_by)
+        self.columns = {}
+        self.groups = dict((key, {}) for key in self.group_by)
+        # Number of students in each group.
+        self.sizes = dict((key, {}) for key in self.group_by)
+        for key in self.group_by:
+            sizes = self.sizes[key]
+            for student in students:
+                group = student[key]
+                sizes[group] = sizes.get(group, 0) + 1
+            self.groups[key] = dict((group, {}) for group in sizes)
+        for title in self.titles:
+            self._add_grades(title, students)
+        totals = [self.weighted_total(student) for student in students]
+        self.totals = [total for total, tot_weight in totals]
+        self.weights = [tot_weight for total, tot_weight in totals]
+        self.lost = False
+        self.size = len(students)
+        self.version = version
+
+    def weighted_total(self, student):
+        """Return the weighted total and the total weight of the evaluations
+        of student."""
+        total = 0.
+        tot_weight = 0.
+        for title, weight, max_grade in self.evaluations:
+            grade = student.get(title)
+            if _is_number(grade):
+                total += grade * weight / max_grade
+                tot_weight += weight
+        return total, tot_weight
+
+    def cumul(self, position):
+        """Return the cumulative grade of the student at position."""
+        return self.totals[position] / ((self.weights[position] or 1.) * 0.01)
+
+    def _group_stats(self, key, group):
+        """Return the Stats of the columns for group of column key."""
+        stats = self.groups[key].get(group)
+        if stats is None:
+            stats = self.groups[key][group] = dict(
+                    (title, Stats()) for title in self.titles)
+            self.sizes[key][group] = 0
+        return stats
+
+    def add(self, position, student):
+        """Add the grades of student at position. position is either the
+        position of a new student, at the end of the table, or the position
+        of a student whose grades were removed."""
+        grades = [(title, student.get(title)) for title in self.titles]
+        grades = [(title, grade) for title, grade in grades
+                  if _is_number(grade)]
+        # The grades of a new student come after the others, in its group
+        # too.
+        last = position == len(self.totals)
+        for title, grade in grades:
+            self._add(self.columns[title], grade, last)
+        for key in self.group_by:
+            stats = self._group_stats(key, student[key])
+            self.sizes[key][student[key]] += 1
+            for title, grade in grades:
+                self._add(stats[title], grade, last)
+        total, tot_weight = self.weighted_total(student)
+        if last:
+            self.totals.append(total)
+            self.weights.append(tot_weight)
+        else:
+            self.totals[position] = total
+            self.weights[position] = tot_weight
+
+    def remove(self, position, student):
+        """Remove the grades of student at position. The weighted total of
+        the student is kept until it is added again or deleted."""
+        grades = [(title, student.get(title)) for title in self.titles]
+        grades = [(title, grade) for title, grade in grades
+                  if _is_number(grade)]
+        for title, grade in grades:
+            self._remove(self.columns[title], grade)
+        for key in self.group_by:
+            group = student[key]
+            stats = self.groups[key][group]
+            for title, grade in grades:
+                self._remove(stats[title], grade)
+            self.sizes[key][group] -= 1
+            if not self.sizes[key][group]:
+                del self.groups[key][group]
+                del self.sizes[key][group]
+
+    def _add(self, stats, grade, last):
+        """Add grade to stats, noting if its sum is lost."""
+        stats.add(grade, last)
+        self.lost = self.lost or stats.total is None
+
+    def _remove(self, stats, grade):
+        """Remove grade from stats, noting if its sum is lost."""
+        stats.remove(grade)
+        self.lost = self.lost or stats.total is None
+
+    def refresh(self, students):
+        """Compute again the Stats whose sum was lost from students, the
+        students of the table."""
+        for title in self.titles:
+            if self.columns[title].total is None:
+                self.columns[title] = _stats(student.get(title)
+                                             for student in students)
+        for key in self.group_by:
+            for group, stats in self.groups[key].items():
+                for title in self.titles:
+                    if stats[title].total is None:
+                        stats[title] = _stats(student.get(title)
+                                              for student in students
+                                              if student[key] == group)
+        self.lost = False
+
+    def delete(self, position):
+        """Forget the student at position, whose grades were removed."""
+        del self.totals[position]
+        del self.weights[position]
+
+    def add_column(self, title, students):
+        """Add the numerical column title, whose entries for students, the
+        students of the table, were just computed."""
+        self.titles.append(title)
+        self._add_grades(title, students)
+
+    def _add_grades(self, title, students):
+        """Compute the Stats of column title from the grades of students."""
+        grades = [student.get(title) for student in students]
+        self.columns[title] = _stats(grades)
+        for key in self.group_by:
+            by_group = dict((group, []) for group in self.groups[key])
+            for student, grade in zip(students, grades):
+                if _is_number(grade):
+                    by_group[student[key]].append(grade)
+            for group, group_grades in by_group.items():
+                self.groups[key][group][title] = _stats(group_grades)
@@ -0,0 +1,205 @@
+#-*- coding: utf-8 -*-
+"""cache
+
+This module provides a persistent cache for parsed grades files.
+
+Parsing a grades file is by far the most expensive part of a ``grades print``
+call. The ParseCache stores a binary snapshot (a pickle) of each parsed
+GradesFile, that is the text before and after the table as well as the
+GradesTable itself, in a cache directory. When the file has not changed
+since it was parsed, the snapshot is loaded instead of parsing the file again.
+
+A snapshot is identified by the absolute path of the file and the parsing
+options. It records the modification time, the size and a SHA-1 hash of the
+content of the file. The snapshot is used only if the content of the file has
+the same hash: the modification time and the size alone miss the changes
+made within the resolution of the modification time or that preserve it (as
+``cp -p`` does). Hashing the file is much faster than parsing it.
+
+Encrypted files are never cached since that would write their decrypted
+content to the disk.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import hashlib
+import os
+import pickle
+import tempfile
+from . import __version__
+from . import defaults
+from . import writers
+
+
+# Increment when the content of the snapshots changes.
+CACHE_FORMAT = 6
+
+
+def _hash_file(fname):
+    """Return the SHA-1 hash of the content of file fname."""
+    sha1 = hashlib.sha1()
+    with open(fname, 'rb') as fileh:
+        for block in iter(lambda: fileh.read(1 << 16), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+class ParseCache:
+    """A ParseCache stores parsed grades files in a directory.
+
+    The cache holds at most ``max_entries`` snapshots. When a new snapshot is
+    stored, the least recently used snapshots are evicted.
+
+    """
+    def __init__(self, directory=defaults.CACHE_DIR,
+                 max_entries=defaults.CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def _entry_name(self, fname, options):
+        """Return the file name of the snapshot for fname parsed with
+        options. The number of processes used for parsing does not change
+        the result, so it is not part of the key."""
+        options = dict((key, value) for key, value in options.items()
+                       if key != 'processes')
+        key = repr((os.path.abspath(fname), sorted(options.items())))
+        return os.path.join(self.directory,
+                            hashlib.sha1(key.encode('utf-8')).hexdigest()
+                            + '.pickle')
+
+    def _read_entry(self, entry_name):
+        """Return the snapshot stored in entry_name or None if there is no
+        valid snapshot."""
+        try:
+            with open(entry_name, 'rb') as entry:
+                snapshot = pickle.load(entry)
+        except Exception:
+            # Missing, unreadable or corrupted snapshot.
+            return None
+        if (snapshot.get('format') != CACHE_FORMAT or
+            snapshot.get('version') != __version__):
+            return None
+        return snapshot
+
+    def _write_entry(self, entry_name, snapshot):
+        """Atomically write snapshot to entry_name. Failing to write the
+        cache is not an error."""
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            fd, tmpname = tempfile.mkstemp(dir=self.directory)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, 'wb') as entry:
+                pickle.dump(snapshot, entry, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpname, entry_name)
+        except (OSError, pickle.PicklingError):
+            self._remove(tmpname)
+            return
+        self.evict()
+
+    def load(self, fname, ignore_char=defaults.IGNORE_CHAR, columns=None,
+             where=None, **options):
+        """Return the GradesFile for file fname.
+
+        The GradesFile is loaded from the cache if the file did not change
+        since it was stored. Otherwise, the file is parsed and the result is
+        stored in the cache. options are passed to GradesFile.
+
+        The snapshots hold all the columns and all the students, so that a
+        single snapshot serves every projection and every query: columns,
+        the parsers.Projection of the needed columns, is only used to parse
+        the files that are not cached, and the students that match where, a
+        query.Query, are selected from the table of the snapshot.
+
+        """
+        if fname.endswith('.asc'):
+            with open(fname) as fileh:
+                return writers.GradesFile(fileh, ignore_char, columns=columns,
+                                          where=where, **options)
+        options['ignore_char'] = ignore_char
+        entry_name = self._entry_name(fname, options)
+        stat = os.stat(fname)
+        sha1 = _hash_file(fname)
+        snapshot = self._read_entry(entry_name)
+        if (snapshot and snapshot['size'] == stat.st_size and
+            snapshot['sha1'] == sha1):
+            if snapshot['mtime'] == stat.st_mtime:
+                self._touch(entry_name)
+            else:
+                # The file was touched but its content did not change.
+                snapshot['mtime'] = stat.st_mtime
+                self._write_entry(entry_name, snapshot)
+            return _select(snapshot['gfile'], where)
+
+        with open(fname) as fileh:
+            gfile = writers.GradesFile(fileh, **options)
+        snapshot = {'format': CACHE_FORMAT, 'version': __version__,
+                    'path': os.path.abspath(fname), 'mtime': stat.st_mtime,
+                    'size': stat.st_size, 'sha1': sha1, 'gfile': gfile}
+        self._write_entry(entry_name, snapshot)
+        return _select(gfile, where)
+
+    def _touch(self, entry_name):
+        """Mark a snapshot as recently used."""
+        try:
+            os.utime(entry_name, None)
+        except OSError:
+            pass
+
+    def _entries(self):
+        """Return the list of snapshot file names in the cache."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [os.path.join(self.directory, name) for name in names
+                if name.endswith('.pickle')]
+
+    def invalidate(self, fname):
+        """Remove all the snapshots of file fname from the cache."""
+        path = os.path.abspath(fname)
+        for entry_name in self._entries():
+            snapshot = self._read_entry(entry_name)
+            if snapshot is None or snapshot['path'] == path:
+                self._remove(entry_name)
+
+    def evict(self):
+        """Remove the least recently used snapshots until at most
+        max_entries snapshots are left."""
+        entries = []
+        for entry_name in self._entries():
+            try:
+                entries.append((os.path.getmtime(entry_name), entry_name))
+            except OSError:
+                pass
+        entries.sort(reverse=True)
+        for mtime, entry_name in entries[self.max_entries:]:
+            self._remove(entry_name)
+
+    def clear(self):
+        """Remove all the snapshots from the cache."""
+        for entry_name in self._entries():
+            self._remove(entry_name)
+
+    def _remove(self, entry_name):
+        """Remove a snapshot, ignoring errors."""
+        try:
+            os.remove(entry_name)
+        except OSError:
+            pass
+
+
+def _select(gfile, where):
+    """Keep the students of the table of gfile that match the query where,
+    if given, and return gfile."""
+    if where is not None:
+        calc_char = gfile.table.calc_char
+        gfile.table = gfile.table.select(where)
+        gfile.table.calc_char = calc_char
+    return gfile
@@ -0,0 +1,109 @@
+#-*- coding: utf-8 -*-
+"""categorical
+
+This module provides the dictionary encoding of the non numerical columns of
+a GradesTable that hold a few distinct entries, such as the groups of the
+students.
+
+A Categories object keeps the distinct entries of a column, in order of first
+appearance, and the code of the entry of each student, i.e. its position in
+the list of distinct entries. Grouping the students or finding where the
+entry changes from one student to the next then compares small integers
+instead of strings. The parser also makes the students share one string
+object per distinct entry.
+
+A column is encoded only when it has at most MAX_CATEGORIES distinct entries
+and at most one distinct entry for every two students. Categories are built
+by the table on first use and kept up to date when students are appended or
+modified through the table (see GradesTable.categorical).
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+# Codes are stored in a bytearray.
+MAX_CATEGORIES = 256
+
+
+class Categories:
+    """Dictionary encoding of the entries of a column.
+
+    Input
+    -----
+    students: list
+       The students of the table.
+
+    title: string
+       Title of the encoded column.
+
+    version: int
+       Version of the table the encoding is built from.
+
+    If the column has too many distinct entries, ``codes`` and ``values``
+    are None. Categories are updated through the add and remove methods, like
+    an indexes.HashIndex.
+
+    """
+    def __init__(self, students, title, version=0):
+        self.title = title
+        self.values = []
+        self.code_of = {}
+        self.codes = bytearray()
+        limit = min(MAX_CATEGORIES, len(students) // 2 or 1)
+        for student in students:
+            code = self._encode(student.get(title, ''), limit)
+            if code is None:
+                self._overflow()
+                break
+            self.codes.append(code)
+        self.size = len(students)
+        self.version = version
+
+    def __len__(self):
+        return len(self.values or ())
+
+    def _encode(self, entry, limit=MAX_CATEGORIES):
+        """Return the code of entry or None if there is no room for a new
+        category."""
+        code = self.code_of.get(entry)
+        if code is None:
+            if len(self.values) >= limit:
+                return None
+            code = self.code_of[entry] = len(self.values)
+            self.values.append(entry)
+        return code
+
+    def _overflow(self):
+        """Give up the encoding of the column."""
+        self.values = self.code_of = self.codes = None
+
+    def add(self, position, entry):
+        """Record that the student at position has entry. position is
+        either the position of a new student, at the end of the table, or
+        the position of a student whose entry changed. The encoding is
+        given up if the column gets too many distinct entries."""
+        if self.codes is None:
+            return
+        code = self._encode(entry)
+        if code is None:
+            self._overflow()
+        elif position == len(self.codes):
+            self.codes.append(code)
+        else:
+            self.codes[position] = code
+
+    def remove(self, position, entry):
+        """Nothing to do: the code of the student at position is replaced
+        when its new entry is added."""
+
+    def delete(self, position):
+        """Forget the student at position."""
+        if self.codes is not None:
+            del self.codes[position]
+
+    def value(self, position):
+        """Return the entry of the student at position."""
+        return self.values[self.codes[position]]
@@ -0,0 +1,382 @@
+#-*- coding: utf-8 -*-
+"""columnar
+
+This module provides a column oriented storage backend for grades tables.
+
+A ColumnarGradesTable stores one float64 array per numerical column and one
+string array per non numerical column instead of a list of students. Non
+numerical entries found in numerical columns (blanks, 'ABS', ...) are kept in
+a side table so that they are written back unchanged. The list of students is
+still available as a read-only view so that the parsers and the writers work
+with both backends.
+
+This backend requires numpy.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from collections import defaultdict
+from copy import deepcopy
+from itertools import compress
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from .gradestable import GradesTable
+from .schema import Column
+from .student import Student, UNSET
+from . import defaults
+
+
+# Marker for cells that were never set in a student record.
+_ABSENT = object()
+
+
+class ColumnarGradesTable(GradesTable):
+    """A GradesTable that stores its data column by column.
+
+    Numerical columns are stored in ``float64`` arrays. A boolean array tells
+    which cells contain a number and the original content of the other cells
+    is kept in a dictionary keyed by row number. Other columns are stored in
+    string arrays.
+
+    """
+    def __init__(self, data=None, calc_char=defaults.CALC_CHAR):
+        """Instanciate a new ColumnarGradesTable.
+
+        Input
+        -----
+        data: GradesTable
+           A GradesTable to copy. Any GradesTable can be converted to the
+           columnar backend this way.
+
+        """
+        if np is None:
+            raise ImportError('ColumnarGradesTable requires numpy.')
+        self._nrows = 0
+        self._values = {}
+        self._valid = {}
+        self._tokens = {}
+        self._text = {}
+        self._rows = None
+        GradesTable.__init__(self, calc_char=calc_char)
+        if isinstance(data, GradesTable):
+            self.columns = deepcopy(data.columns)
+            self.footers = deepcopy(data.footers)
+            self._load(data.students, data)
+
+    def _get_students(self):
+        """Row view of the table. The list of students is built on demand
+        from the columns and cached until the columns change. Modifying the
+        students in this list does not modify the table; assign a new list to
+        ``students`` instead.
+
+        """
+        if self._rows is None:
+            layout = dict(self.columns.positions)
+            cells = [[UNSET if cell is _ABSENT else cell
+                      for cell in self._cells(column.title)]
+                     for column in self.columns]
+            self._rows = [Student(layout, values) for values in zip(*cells)]
+            if not self.columns:
+                self._rows = [Student(layout) for i in range(self._nrows)]
+        return self._rows
+
+    def _set_students(self, students):
+        """Replace the content of the table with the list of students."""
+        self._load(students)
+
+    def _load(self, students, masked=None):
+        """Store the list of students in the columns. If masked is a
+        GradesTable, its validity masks and sentinels are used for the
+        numerical columns instead of testing the type of each entry."""
+        students = list(students)
+        self._nrows = len(students)
+        self._values = {}
+        self._valid = {}
+        self._tokens = {}
+        self._text = {}
+        for column in self.columns:
+            title = column['title']
+            cells = [student.get(title, _ABSENT) for student in students]
+            if column['is_num'] and masked is not None:
+                self._store_masked(title, cells, masked.mask(title),
+                                   masked.sentinels[title])
+            elif column['is_num']:
+                self._store_numbers(title, cells)
+            else:
+                self._text[title] = np.array(
+                        ['' if cell is _ABSENT else cell for cell in cells],
+                        dtype=str)
+        self._rows = None
+        self.changed()
+
+    students = property(_get_students, _set_students)
+
+    def _get_sentinels(self):
+        """Non numerical entries of the numerical columns, keyed by column
+        title then by row number."""
+        return self._tokens
+
+    def _set_sentinels(self, sentinels):
+        self._tokens = sentinels
+
+    sentinels = property(_get_sentinels, _set_sentinels)
+
+    def _store_numbers(self, title, cells):
+        """Store the list cells in the arrays for the numerical column
+        title."""
+        valid = np.array([isinstance(cell, (float, int)) for cell in cells],
+                         dtype=bool)
+        values = np.full(len(cells), np.nan)
+        values[valid] = [cell for cell, ok in zip(cells, valid) if ok]
+        self._values[title] = values
+        self._valid[title] = valid
+        self._tokens[title] = dict((i, cell) for i, cell in enumerate(cells)
+                                   if not valid[i] and cell is not _ABSENT)
+
+    def _store_masked(self, title, cells, mask, sentinels):
+        """Store the list cells in the arrays for the numerical column title
+        using the validity mask and the sentinels of a GradesTable."""
+        valid = np.frombuffer(bytes(mask), dtype=np.uint8).astype(bool)
+        values = np.full(len(cells), np.nan)
+        values[valid] = list(compress(cells, mask))
+        self._values[title] = values
+        self._valid[title] = valid
+        self._tokens[title] = dict(sentinels)
+
+    def mask(self, title):
+        """Return the validity mask for the column title. See
+        GradesTable.mask."""
+        return bytearray(self._numbers(title)[1].tobytes())
+
+    def _cells(self, title):
+        """Return the list of the cells in column title as Python objects."""
+        if title in self._values:
+            tokens = self._tokens[title]
+            return [float(value) if ok else tokens.get(i, _ABSENT)
+                    for i, (value, ok) in enumerate(zip(self._values[title],
+                                                        self._valid[title]))]
+        if title in self._text:
+            return self._text[title].tolist()
+        return [_ABSENT] * self._nrows
+
+    def _take(self, indices):
+        """Return a new ColumnarGradesTable that contains the rows at
+        positions indices, a list of positions or a slice."""
+        atable = ColumnarGradesTable(calc_char=self.calc_char)
+        atable._share(self)
+        if isinstance(indices, slice):
+            positions = range(self._nrows)[indices]
+        else:
+            indices = np.asarray(indices, dtype=int)
+            positions = indices.tolist()
+        atable._nrows = len(positions)
+        for title in self._values:
+            atable._values[title] = self._values[title][indices]
+            atable._valid[title] = self._valid[title][indices]
+            tokens = self._tokens[title]
+            atable._tokens[title] = dict(
+                    (i, tokens[j]) for i, j in enumerate(positions)
+                    if j in tokens)
+        for title in self._text:
+            atable._text[title] = self._text[title][indices]
+        return atable
+
+    def __getitem__(self, aslice):
+        """A columnar table can be indexed or sliced like a GradesTable. The
+        result is a ColumnarGradesTable. Slices share the arrays of this
+        table."""
+        if isinstance(aslice, slice):
+            return self._take(aslice)
+        return self._take([range(self._nrows)[aslice]])
+
+    def own(self):
+        """The arrays are never modified in place, so only the columns have
+        to be copied before they are modified."""
+        if self._shared:
+            self.columns = deepcopy(self.columns)
+            self._shared = False
+
+    def __iter__(self):
+        """Iterating over the table iterates through the row view."""
+        return iter(self.students)
+
+    def select(self, expression):
+        """Select a subset of students based on expression. See
+        GradesTable.select for the syntax of expression."""
+        return ColumnarGradesTable(GradesTable.select(self, expression))
+
+    def append(self, student):
+        """Append student to the table. The columns are stored again."""
+        self.extend([student])
+
+    def extend(self, students):
+        """Append all the students of the iterable students to the table.
+        The columns are stored again, once."""
+        self.students = self.students + list(students)
+
+    def set_value(self, position, title, entry):
+        """Set the entry of the student at position in column title. The
+        columns are stored again."""
+        students = self.students
+        students[position][title] = entry
+        self.students = students
+
+    def delete(self, position):
+        """Delete the student at position from the table. The columns are
+        stored again."""
+        students = self.students
+        del students[position]
+        self.students = students
+
+    def _through_rows(self, method, *args, **kwargs):
+        """Run a GradesTable method that modifies the students in place on
+        the row view and store the result back into the columns."""
+        students = self.students
+        method(self, *args, **kwargs)
+        self.students = students
+
+    def _numbers(self, title):
+        """Return the values and validity arrays of column title. Columns
+        without numerical data have no valid cell."""
+        if title in self._values:
+            return self._values[title], self._valid[title]
+        return (np.full(self._nrows, np.nan),
+                np.zeros(self._nrows, dtype=bool))
+
+    def _add_numbers(self, title, values, valid=None):
+        """Append a computed numerical column to the table."""
+        if valid is None:
+            valid = np.ones(self._nrows, dtype=bool)
+        self.columns.append(Column(title, is_num=True, role='computed'))
+        self._values[title] = np.where(valid, values, np.nan)
+        self._valid[title] = valid
+        self._tokens[title] = {}
+        self._rows = None
+
+    def compute_cumul(self):
+        """Calculate the weighted mean for each student and add that result
+        in a new column at the end of the table. See
+        GradesTable.compute_cumul.
+
+        Every evaluation column contributes its grades normalized by
+        weight / max_grade, missing grades contributing nothing to both the
+        weighted sum and the total weight. All the students are handled at
+        once with array operations and the results are identical to the ones
+        of GradesTable.compute_cumul.
+
+        """
+        self.own()
+        supp = self.columns.supplemental
+        evals = [column for column in self.columns.evaluations
+                 if column is not supp]
+        cumul = np.zeros(self._nrows)
+        tot_weight = np.zeros(self._nrows)
+        if evals:
+            weights = np.array([column.evalu['weight'] for column in evals])
+            max_grades = np.array([column.evalu['max_grade']
+                                   for column in evals])
+            scores = np.zeros((len(evals), self._nrows))
+            mask = np.zeros((len(evals), self._nrows), dtype=bool)
+            for j, column in enumerate(evals):
+                values, mask[j] = self._numbers(column.title)
+                scores[j, mask[j]] = values[mask[j]]
+            # Normalized score matrix, with one row per evaluation. Grades
+            # are multiplied by the weight then divided by the maximum, as
+            # done on the rows, so that the results are bitwise identical.
+            scores *= weights[:, np.newaxis]
+            scores /= max_grades[:, np.newaxis]
+            # The weighted sums are accumulated one evaluation at a time
+            # instead of through a BLAS matrix-vector product because the
+            # summation order must be the one used on the rows.
+            for j in range(len(evals)):
+                cumul += scores[j]
+                tot_weight += mask[j] * weights[j]
+        cumul /= np.where(tot_weight == 0., 1., tot_weight) * 0.01
+        self._add_numbers(self._decorate('Cumul'), cumul)
+        if supp:
+            supp_grades, has_supp = self._numbers(supp.title)
+            passed = has_supp & (supp_grades >= 60)
+            self._add_numbers(self._decorate('Adjustment'),
+                              np.where(passed, 60. - cumul, 0.), has_supp)
+            self._add_numbers(self._decorate('Cumul with supp'),
+                              np.where(passed, 60., cumul), has_supp)
+
+    def compute_assignment_mean(self):
+        """Calculate the mean for each student for assignments. See
+        GradesTable.compute_assignment_mean."""
+        self._through_rows(GradesTable.compute_assignment_mean)
+
+    def _mean_row(self, selected, row_name):
+        """Return a footer row with the mean of each numerical column for the
+        rows where the boolean array selected is true. The grades are summed
+        in the order of the rows with sum, as GradesTable.compute_mean does,
+        rather than with the pairwise summation of numpy, so that the means
+        are the same."""
+        mean = defaultdict(str)
+        mean[self.columns[0]['title']] = self._decorate(row_name)
+        for column in self.columns[1:]:
+            title = column['title']
+            if column['is_num'] and title in self._values:
+                valid = self._valid[title] & selected
+                nb_students = np.count_nonzero(valid)
+                if nb_students:
+                    mean[title] = (sum(self._values[title][valid].tolist())
+                                   / nb_students)
+        return mean
+
+    def compute_mean(self, students=None, row_name='Mean'):
+        """Calculate the mean for each evaluation and add the results to
+        a new row at the bottom of the table. See GradesTable.compute_mean.
+
+        """
+        if students:
+            # An explicit list of students can only be handled by the rows.
+            return GradesTable.compute_mean(self, students, row_name)
+        self.footers.append(
+                self._mean_row(np.ones(self._nrows, dtype=bool), row_name))
+
+    def compute_grouped_mean(self, group_by='Group'):
+        """Calculate grouped means. See GradesTable.compute_grouped_mean.
+
+        Each student is mapped to a group number and the sums and counts of
+        every group are obtained with one ``bincount`` per column.
+
+        """
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        for key in group_by:
+            if not self.columns.has_title(key):
+                raise ValueError(key + " is not a valid column title.")
+        num_titles = [col.title for col in self.columns[1:]
+                      if col.is_num and col.title in self._values]
+        for key in group_by:
+            keys = np.array(['' if cell is _ABSENT else str(cell)
+                             for cell in self._cells(key)], dtype=str)
+            groups, first, codes = np.unique(keys, return_index=True,
+                                             return_inverse=True)
+            sums = {}
+            counts = {}
+            for title in num_titles:
+                valid = self._valid[title]
+                counts[title] = np.bincount(codes[valid],
+                                            minlength=len(groups))
+                sums[title] = np.bincount(codes[valid],
+                                          self._values[title][valid],
+                                          minlength=len(groups))
+            # Groups are reported in order of first appearance, as in
+            # GradesTable.compute_grouped_mean.
+            for code in np.argsort(first):
+                mean = defaultdict(str)
+                mean[self.columns[0]['title']] = self._decorate(
+                        'Mean ' + str(groups[code]))
+                for title in num_titles:
+                    if counts[title][code]:
+                        mean[title] = float(sums[title][code] /
+                                            counts[title][code])
+                self.footers.append(mean)
@@ -12,6 +12,9 @@ __author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
 __license__ = "BSD"
 
 
+import os
+
+
 INPUT_FILENAMES = ['Grades.rst.asc', 'Grades.rst']
 OUTPUT_FILENAME = 'Grades.rst'
 IGNORE_CHAR = '*'
@@ -20,7 +23,25 @@ PRECISION = 2
 PADDING_LEFT = 1
 PADDING_RIGHT = 1
 MIN_CELL_WIDTH = 5
+# The GRADES_CACHE_DIR environment variable overrides the cache directory.
+CACHE_DIR = os.environ.get('GRADES_CACHE_DIR') or os.path.join(
+        os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+        'grades')
+CACHE_MAX_ENTRIES = 64
+# Tables with fewer student rows are always parsed in a single process.
+PARALLEL_PARSE_THRESHOLD = 20000
 TABLE_FORMAT = 'simple_rst'
+# Tables with fewer student rows are always rendered in a single process.
+PARALLEL_RENDER_THRESHOLD = 100000
+# Number of characters gathered by the table writers before each write.
+WRITE_BUFFER_SIZE = 65536
+# Number of student rows parsed and printed at a time when a file is printed
+# with a bounded amount of memory (see the streaming module).
+STREAM_CHUNK_SIZE = 5000
+# Non numerical entries that commonly appear in evaluation columns.
+SENTINELS = ('', 'ABS', 'ABSENT', 'ABSENTE', 'EXC', 'EXCUSED', 'EXEMPT',
+             'EXEMPTÉ', 'EXEMPTE', 'DISP', 'DISPENSÉ', 'INC', 'INCOMPLETE',
+             'N/A', 'NA', '-')
 COLUMNS = [
         {'title': 'Name', 'is_num': False, 'evalu': None, 'width': 0},
         {'title': 'Group', 'is_num': False, 'evalu': None, 'width': 0},
@@ -15,18 +15,32 @@ __license__ = "BSD"
 
 
 from collections import defaultdict
-from copy import deepcopy
-import re
+from copy import copy, deepcopy
+from itertools import compress
 from . import defaults
-
-
-ASSIGNMENT_NAMES = ('DEVOIR', 'ASSIGNMENT')
+from .aggregates import Aggregates
+from .categorical import Categories
+from .indexes import HashIndex, SortedIndex
+from .query import Query
+from .schema import Column, Schema
+from .student import Student
 
 
 class GradesTable:
     """A GradesTable contains all the data in a table and can perform
     calculations and modify the table to include the results.
 
+    Slices and selections of a table are copy-on-write views: they share
+    the columns and the student records of the original table and make
+    private copies only when one of the tables modifies them through its
+    methods. Modifying a column or a student record directly, e.g.
+    ``view.students[0]['Test 1'] = 50.``, modifies both tables unless the
+    table called ``own`` first. A copy made with ``GradesTable(table)`` has
+    its own columns and student records.
+
+    The columns are a schema.Schema. A list of column dictionaries assigned
+    to ``columns`` is turned into a Schema.
+
     """
     def __init__(self, data=None, calc_char=defaults.CALC_CHAR):
         """Instanciate a new GradesTable.
@@ -34,28 +48,83 @@ class GradesTable:
         Input
         -----
         data: GradesTable
-           A GradesTable to copy.
+           A GradesTable to copy. The columns and the student records are
+           copied, the entries of the students are shared since they are
+           never modified in place.
 
         """
+        # Incremented each time the students change. See the changed
+        # method.
+        self.version = 0
+        # Sorted indexes of numerical columns and hash indexes of other
+        # columns, keyed by column title. See the create_index and
+        # create_hash_index methods.
+        self.indexes = {}
+        self.hash_indexes = {}
+        # Dictionary encodings of the non numerical columns, keyed by column
+        # title. See the categorical method.
+        self.categoricals = {}
+        # Running aggregates of the numerical columns. See the
+        # create_aggregates method.
+        self._aggregates = None
         self.columns = []
         self.students = []
         self.footers = []
         self.calc_char = calc_char
+        # Validity masks and non numerical entries of the numerical columns,
+        # keyed by column title, and the version of the table each mask was
+        # recorded for. See the mask method.
+        self.masks = {}
+        self.sentinels = {}
+        self.mask_versions = {}
+        # True if the columns and the students may be shared with another
+        # table. See the own method.
+        self._shared = False
 
         if isinstance(data, GradesTable):
             self.columns = deepcopy(data.columns)
-            self.students = deepcopy(data.students)
-            self.footers = deepcopy(data.footers)
+            self.students = [copy(student) for student in data.students]
+            self.footers = [copy(footer) for footer in data.footers]
+            for title in data._current_masks():
+                self.record_mask(title, bytearray(data.masks[title]),
+                                 dict(data.sentinels[title]))
+
+    @property
+    def columns(self):
+        """Schema of the table."""
+        return self._columns
+
+    @columns.setter
+    def columns(self, columns):
+        if not isinstance(columns, Schema):
+            columns = Schema(columns)
+        self._columns = columns
+
+    def _share(self, table):
+        """Use the columns of table. The student records that are later
+        taken from table are shared as well."""
+        self.columns = table.columns
+        self._shared = table._shared = True
+
+    def own(self):
+        """Make private copies of the columns and of the student records
+        that may be shared with other tables. The methods of the table call
+        it before modifying them; code that modifies them directly must call
+        it first."""
+        if self._shared:
+            self.columns = deepcopy(self.columns)
+            self.students = [copy(student) for student in self.students]
+            self._shared = False
 
     def __getitem__(self, aslice):
         """A table can be indexed or sliced. The slicing mechanism work on rows
         of students. A new table is created that contains only the students
-        included in ``aslice``. All the columns and their headers are copied
-        into the new table.
+        included in ``aslice``. The new table shares the columns and the
+        students with this table until one of them is modified.
 
         """
         atable = GradesTable()
-        atable.columns = deepcopy(self.columns)
+        atable._share(self)
         if isinstance(aslice, slice):
             atable.students = self.students[aslice]
         else:
@@ -71,16 +140,21 @@ class GradesTable:
         students in both tables. Adding a student to a table, appends the
         student to the list of students."""
         sumtable = GradesTable(self)
+        sumtable += atable
+        return sumtable
+
+    def __iadd__(self, atable):
+        """Add the students of table atable, or the student atable, to the
+        table in place."""
         if isinstance(atable, GradesTable):
             if self.columns != atable.columns:
                 raise TypeError('Cannot add tables with different headers.')
-            for student in atable:
-                sumtable.students.append(student)
-        elif isinstance(atable, defaultdict):
-            if set(atable.keys()) != set(col['title'] for col in self.columns):
+            self.extend(atable)
+        elif isinstance(atable, (defaultdict, Student)):
+            if set(atable.keys()) != set(self.columns.positions):
                 raise TypeError('Cannot add a student with different keys.')
-            sumtable.students.append(atable)
-        return sumtable
+            self.append(atable)
+        return self
 
     def __str__(self):
         """Simple string representation for the table."""
@@ -97,73 +171,409 @@ class GradesTable:
             return True
         return False
 
-    def __decorate(self, name):
+    def _decorate(self, name):
         """Concatenate name with the calc_char string."""
         return self.calc_char + name + self.calc_char
 
+    def mask(self, title):
+        """Return the validity mask for the column title.
+
+        The mask is a bytearray with one entry per student. An entry is 1 if
+        the student has a number in this column and 0 otherwise (blank, 'ABS'
+        or any other non numerical entry). The non numerical entries are
+        recorded in ``self.sentinels[title]``, a dictionary keyed by student
+        position.
+
+        Masks are recorded by the parsers and by the methods that add
+        computed columns (see record_mask) and kept up to date by the
+        methods that modify the students. They are rebuilt when missing or
+        when the students were modified without using the methods of the
+        table (see changed).
+
+        """
+        if not self._is_current_mask(title):
+            mask = bytearray(isinstance(student.get(title), (float, int))
+                             for student in self.students)
+            self.record_mask(title, mask, dict(
+                    (i, student[title])
+                    for i, student in enumerate(self.students)
+                    if not mask[i] and title in student))
+        return self.masks[title]
+
+    def record_mask(self, title, mask, sentinels):
+        """Record mask, the validity mask, and sentinels, the non numerical
+        entries, of the numerical column title for the current students."""
+        self.masks[title] = mask
+        self.sentinels[title] = sentinels
+        self.mask_versions[title] = self.version
+
+    def _is_current_mask(self, title):
+        """Return True if the mask of column title reflects the current
+        students."""
+        mask = self.masks.get(title)
+        return (mask is not None and
+                self.mask_versions.get(title) == self.version and
+                len(mask) == len(self.students))
+
+    def _current_masks(self):
+        """Return the titles of the masks that reflect the current
+        students."""
+        return [title for title in self.masks if self._is_current_mask(title)]
+
+    def changed(self):
+        """Record that the students changed. The methods of GradesTable call
+        it; code that modifies the students directly must call it so that
+        the indexes are rebuilt."""
+        self.version += 1
+
+    def create_index(self, title):
+        """Maintain a sorted index on the numerical column title. The index
+        is built on first use and rebuilt after the students change. select
+        uses it to find the students in a range without looking at every
+        student."""
+        if not self.columns.column(title).is_num:
+            raise ValueError('%s is not a numerical column, use '
+                             'create_hash_index.' % title)
+        self.indexes.setdefault(title, None)
+
+    def sorted_index(self, title):
+        """Return the up to date SortedIndex of column title or None if no
+        index was created for this column or if the column is not
+        numerical."""
+        if title not in self.indexes or \
+                not self.columns.column(title).is_num:
+            return None
+        index = self.indexes[title]
+        if not self._is_current(index):
+            index = SortedIndex(self.students, title, self.mask(title),
+                                self.version)
+            self.indexes[title] = index
+        return index
+
+    def create_hash_index(self, title):
+        """Maintain a hash index on the non numerical column title, e.g.
+        the names of the students. The index is kept up to date when
+        students are added with append or modified with set_value. lookup
+        and select use it to find the students with a given entry."""
+        if self.columns.column(title).is_num:
+            raise ValueError('%s is a numerical column, use create_index.'
+                             % title)
+        self.hash_indexes[title] = HashIndex(self.students, title,
+                                             self.version)
+
+    def hash_index(self, title):
+        """Return the up to date HashIndex of column title or None if no
+        hash index was created for this column. The index is rebuilt if the
+        students were modified without using the methods of the table."""
+        index = self.hash_indexes.get(title)
+        if index is not None and not self._is_current(index):
+            index = HashIndex(self.students, title, self.version)
+            self.hash_indexes[title] = index
+        return index
+
+    def index(self, title):
+        """Return the up to date index of column title, if there is one."""
+        return self.hash_index(title) or self.sorted_index(title)
+
+    def _is_current(self, index):
+        """Return True if index reflects the current students."""
+        return (index is not None and index.version == self.version and
+                index.size == len(self.students))
+
+    def categorical(self, title):
+        """Return the up to date Categories of the non numerical column
+        title or None if the column is numerical or has too many distinct
+        entries to be encoded. The encoding is built on first use and kept
+        up to date when students are added with append or modified with
+        set_value."""
+        if self.columns.column(title).is_num:
+            return None
+        categories = self.categoricals.get(title)
+        if not self._is_current(categories):
+            categories = Categories(self.students, title, self.version)
+            self.categoricals[title] = categories
+        if categories.codes is None:
+            return None
+        return categories
+
+    def _current(self):
+        """Return the hash indexes and the categories that reflect the
+        current students."""
+        return [index for index in (list(self.hash_indexes.values()) +
+                                    list(self.categoricals.values()))
+                if self._is_current(index)]
+
+    def create_aggregates(self, group_by=()):
+        """Maintain running aggregates of the numerical columns, overall and
+        for the groups of the columns in group_by (see the aggregates
+        module). compute_mean, compute_grouped_mean and compute_cumul then
+        use them instead of going through all the students. They are kept
+        up to date when students are added with append, modified with
+        set_value or deleted with delete, and so is the cumulative grade of
+        these students if the table has a cumul column."""
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        for key in group_by:
+            self.columns.position(key)
+        self._aggregates = Aggregates(self.students, self.columns, group_by,
+                                      self.version)
+
+    def aggregates(self, refresh=True):
+        """Return the up to date Aggregates or None if create_aggregates
+        was not called. The aggregates are rebuilt if the students were
+        modified without using the methods of the table or if numerical
+        columns were added. If refresh is True, the sums lost by changing
+        or deleting students are computed again (see Aggregates.refresh);
+        the methods that only update the aggregates leave them lost."""
+        aggregates = self._aggregates
+        if aggregates is not None and not (
+                self._is_current(aggregates) and
+                aggregates.titles == [column.title for column in self.columns
+                                      if column.is_num]):
+            aggregates = Aggregates(self.students, self.columns,
+                                    aggregates.group_by, self.version)
+            self._aggregates = aggregates
+        if refresh and aggregates is not None and aggregates.lost:
+            aggregates.refresh(self.students)
+        return aggregates
+
+    def _update_cumul(self, aggregates, student):
+        """Compute the cumulative grade of student again, if the table has
+        a cumul column. Return the titles of the updated columns."""
+        cumul = self._decorate('Cumul')
+        if not self.columns.has_title(cumul):
+            return []
+        total, tot_weight = aggregates.weighted_total(student)
+        student[cumul] = total / ((tot_weight or 1.) * 0.01)
+        adj = self._decorate('Adjustment')
+        after_supp = self._decorate('Cumul with supp')
+        supp = self.columns.supplemental
+        if not (supp and self.columns.has_title(adj)):
+            return [cumul]
+        grade = student.get(supp.title)
+        if not isinstance(grade, (float, int)):
+            student.pop(adj, None)
+            student.pop(after_supp, None)
+        elif grade < 60:
+            student[adj] = 0.
+            student[after_supp] = student[cumul]
+        else:
+            student[adj] = 60. - student[cumul]
+            student[after_supp] = 60.
+        return [cumul, adj, after_supp]
+
+    def lookup(self, title, entry):
+        """Return the list of students whose entry in column title is entry.
+        The hash index of the column is used if there is one."""
+        index = self.hash_index(title)
+        if index is None:
+            return [student for student in self.students
+                    if student.get(title, '') == entry]
+        return [self.students[i] for i in index.lookup('=', entry)]
+
+    def append(self, student):
+        """Append student to the table. The masks, the hash indexes and the
+        categories are updated."""
+        self.extend([student])
+
+    def extend(self, students):
+        """Append all the students of the iterable students (a list of
+        students or a GradesTable) to the table, in place. The students are
+        not copied. The masks, the hash indexes, the categories and the
+        aggregates are updated, so that appending k students costs O(k).
+        With aggregates and a cumul column, the cumulative grade of the
+        students is computed."""
+        current = self._current()
+        masks = self._current_masks()
+        aggregates = self.aggregates(refresh=False)
+        start = len(self.students)
+        self.students.extend(list(students))
+        positions = range(start, len(self.students))
+        if aggregates is not None:
+            for position in positions:
+                student = self.students[position]
+                self._update_cumul(aggregates, student)
+                aggregates.add(position, student)
+        for title in masks:
+            for position in positions:
+                self._mask_entry(title, position, self.students[position])
+        for index in current:
+            for position in positions:
+                index.add(position,
+                          self.students[position].get(index.title, ''))
+        if aggregates is not None:
+            current.append(aggregates)
+        self._changed(current, masks)
+
+    def set_value(self, position, title, entry):
+        """Set the entry of the student at position in column title. The
+        masks, the hash indexes, the categories and the aggregates are
+        updated. With aggregates and a cumul column, the cumulative grade of
+        the student is computed again."""
+        self.own()
+        current = self._current()
+        masks = self._current_masks()
+        aggregates = self.aggregates(refresh=False)
+        student = self.students[position]
+        old = student.get(title, '')
+        if aggregates is not None:
+            aggregates.remove(position, student)
+        student[title] = entry
+        titles = [title]
+        if aggregates is not None:
+            titles.extend(self._update_cumul(aggregates, student))
+            aggregates.add(position, student)
+        for changed in titles:
+            if changed in masks:
+                self.sentinels[changed].pop(position, None)
+                self._mask_entry(changed, position, student)
+        for index in current:
+            if index.title == title:
+                index.remove(position, old)
+                index.add(position, entry)
+        if aggregates is not None:
+            current.append(aggregates)
+        self._changed(current, masks)
+
+    def delete(self, position):
+        """Delete the student at position from the table. The masks, the
+        categories and the aggregates are updated. The other indexes are
+        rebuilt when they are next used."""
+        position = range(len(self.students))[position]
+        current = [categories for categories in self.categoricals.values()
+                   if self._is_current(categories)]
+        masks = self._current_masks()
+        aggregates = self.aggregates(refresh=False)
+        student = self.students.pop(position)
+        for title in masks:
+            del self.masks[title][position]
+            self.sentinels[title] = dict(
+                    (i - (i > position), token)
+                    for i, token in self.sentinels[title].items()
+                    if i != position)
+        for categories in current:
+            categories.delete(position)
+        if aggregates is not None:
+            aggregates.remove(position, student)
+            aggregates.delete(position)
+            current.append(aggregates)
+        self._changed(current, masks)
+
+    def _mask_entry(self, title, position, student):
+        """Record the validity of the entry of student, at position, in the
+        mask of column title."""
+        mask = self.masks[title]
+        entry = student.get(title)
+        is_number = isinstance(entry, (float, int))
+        if position == len(mask):
+            mask.append(is_number)
+        else:
+            mask[position] = is_number
+        if not is_number and title in student:
+            self.sentinels[title][position] = entry
+
+    def _changed(self, current, masks=()):
+        """Record that the students changed while keeping the indexes in
+        current and the masks of the columns titled masks up to date."""
+        self.changed()
+        for index in current:
+            index.version = self.version
+            index.size = len(self.students)
+        for title in masks:
+            self.mask_versions[title] = self.version
+
+    def _add_mask(self, title, mask=None):
+        """Record the mask for the computed column title. By default, all
+        the students have a value in the column."""
+        if mask is None:
+            mask = bytearray(b'\x01') * len(self.students)
+        self.record_mask(title, mask, {})
+
     def compute_cumul(self):
         """Calculate the weighted mean for each student and add that result
         in a new column at the end of the table.
 
         """
-        cumul = self.__decorate('Cumul')
-        supp = None
-        for column in self.columns:
-            if column['title'].upper().startswith('SUPP'):
-                supp = column
-                break
-        for student in self.students:
-            student[cumul] = 0.
-            tot_weight = 0.
-            for column in self.columns:
-                if (column['evalu']
-                    and isinstance(student[column['title']], (float, int))
-                    and column != supp):
-                    student[cumul] += (student[column['title']] *
-                        column['evalu']['weight'] /
-                        column['evalu']['max_grade'])
-                    tot_weight += column['evalu']['weight']
-            student[cumul] /= (tot_weight or 1.) * 0.01
-        self.columns.append({'title': cumul, 'is_num': True,
-                             'evalu': None, 'width': 0})
+        self.own()
+        cumul = self._decorate('Cumul')
+        supp = self.columns.supplemental
+        students = self.students
+        aggregates = self.aggregates(refresh=False)
+        if aggregates is not None:
+            totals, tot_weights = aggregates.totals, aggregates.weights
+        else:
+            totals = [0.] * len(students)
+            tot_weights = [0.] * len(students)
+            for column in self.columns.evaluations:
+                if column is not supp:
+                    title = column.title
+                    weight = column.evalu['weight']
+                    max_grade = column.evalu['max_grade']
+                    for i in compress(range(len(students)),
+                                      self.mask(title)):
+                        totals[i] += students[i][title] * weight / max_grade
+                        tot_weights[i] += weight
+        for student, total, tot_weight in zip(students, totals, tot_weights):
+            student[cumul] = total / ((tot_weight or 1.) * 0.01)
+        self.columns.append(Column(cumul, is_num=True, role='computed'))
+        self._add_mask(cumul)
+        computed = [cumul]
         if supp:
-            adj = self.__decorate('Adjustment')
-            self.columns.append({'title': adj,
-                                 'is_num': True,
-                                 'evalu': None, 'width': 0})
-            after_supp = self.__decorate('Cumul with supp')
-            self.columns.append({'title': after_supp,
-                                 'is_num': True,
-                                 'evalu': None, 'width': 0})
-            for student in self.students:
-                if isinstance(student[supp['title']], (float, int)):
-                    if student[supp['title']] < 60:
-                        student[adj] = 0.
-                        student[after_supp] = student[cumul]
-                    else:
-                        student[adj] = 60. - student[cumul]
-                        student[after_supp] = 60.
+            adj = self._decorate('Adjustment')
+            self.columns.append(Column(adj, is_num=True, role='computed'))
+            after_supp = self._decorate('Cumul with supp')
+            self.columns.append(Column(after_supp, is_num=True,
+                                       role='computed'))
+            supp_mask = self.mask(supp.title)
+            for student in compress(students, supp_mask):
+                if student[supp.title] < 60:
+                    student[adj] = 0.
+                    student[after_supp] = student[cumul]
+                else:
+                    student[adj] = 60. - student[cumul]
+                    student[after_supp] = 60.
+            self._add_mask(adj, bytearray(supp_mask))
+            self._add_mask(after_supp, bytearray(supp_mask))
+            computed.extend([adj, after_supp])
+        self._computed(aggregates, computed)
 
     def compute_assignment_mean(self):
         """Calculate the mean for each student for assignments."""
-        assign_cumul = self.__decorate('Assignments')
-        for student in self.students:
-            student[assign_cumul] = 0.
-            tot_weight = 0.
-            for column in self.columns:
-                if (column['evalu']
-                    and isinstance(student[column['title']], (float, int))
-                    and column['title'].upper().startswith(ASSIGNMENT_NAMES)):
-                    student[assign_cumul] += (student[column['title']])
-                    tot_weight += 1.
-            student[assign_cumul] /= (tot_weight or 1.) * 0.01
-        self.columns.append({'title': assign_cumul, 'is_num': True,
-                             'evalu': None, 'width': 0})
+        self.own()
+        aggregates = self.aggregates(refresh=False)
+        assign_cumul = self._decorate('Assignments')
+        students = self.students
+        totals = [0.] * len(students)
+        tot_weights = [0.] * len(students)
+        for column in self.columns.with_role('assignment'):
+            title = column.title
+            for i in compress(range(len(students)), self.mask(title)):
+                totals[i] += students[i][title]
+                tot_weights[i] += 1.
+        for student, total, tot_weight in zip(students, totals, tot_weights):
+            student[assign_cumul] = total / ((tot_weight or 1.) * 0.01)
+        self.columns.append(Column(assign_cumul, is_num=True,
+                                   role='computed'))
+        self._add_mask(assign_cumul)
+        self._computed(aggregates, [assign_cumul])
+
+    def _computed(self, aggregates, titles):
+        """Record that the computed columns titles were added, keeping the
+        aggregates, if any, up to date."""
+        # Adding columns leaves the masks of the other columns current.
+        masks = self._current_masks()
+        if aggregates is None:
+            self._changed([], masks)
+            return
+        for title in titles:
+            aggregates.add_column(title, self.students)
+        self._changed([aggregates], masks)
 
     def compute_mean(self, students=None, row_name='Mean'):
         """Calculate the mean for each evaluation and add the results to
         a new row at the bottom of the table. Blanks in the table are not taken
-        into account, i.e., a blank does not count as a zero.
+        into account, i.e., a blank does not count as a zero. The aggregates
+        of the table are used, if any (see create_aggregates).
 
         Input
         -----
@@ -175,31 +585,55 @@ class GradesTable:
            Name to use for the new footer row that contains the mean values.
 
         """
+        aggregates = None if students else self.aggregates()
+        if aggregates is not None:
+            self.footers.append(self._aggregated_mean(aggregates.columns,
+                                                      row_name))
+            return
         mean = defaultdict(str)
-        mean[self.columns[0]['title']] = self.__decorate(row_name)
-        if not students:
-            students = self.students
+        mean[self.columns[0]['title']] = self._decorate(row_name)
         for column in self.columns[1:]:
             col_title = column['title']
             if column['is_num']:
-                nb_students = sum((1 for student in students if
-                                 isinstance(student[col_title], (float, int))))
-                sumg = sum((student[col_title] for student in students
-                         if isinstance(student[col_title], (float, int))))
-                if nb_students:
-                    mean[col_title] = sumg / nb_students
+                if students:
+                    # No masks for an arbitrary list of students.
+                    grades = [student[col_title] for student in students
+                              if isinstance(student[col_title], (float, int))]
+                else:
+                    grades = [student[col_title] for student in
+                              compress(self.students, self.mask(col_title))]
+                if grades:
+                    mean[col_title] = sum(grades) / len(grades)
         self.footers.append(mean)
 
+    def _aggregated_mean(self, stats, row_name):
+        """Return a footer row with the means of the numerical columns
+        found in stats, a dictionary of aggregates.Stats keyed by title."""
+        mean = defaultdict(str)
+        mean[self.columns[0]['title']] = self._decorate(row_name)
+        for column in self.columns[1:]:
+            if column.is_num:
+                column_mean = stats[column.title].mean()
+                if column_mean is not None:
+                    mean[column.title] = column_mean
+        return mean
+
     def compute_grouped_mean(self, group_by='Group'):
         """Calculate grouped means. The values for each evaluation and computed
         columns are added as footers to the table.
 
+        The sums and counts for every group and every column are accumulated
+        in a single pass over the students, whatever the number of groups and
+        of group_by columns. If the table maintains aggregates for the
+        group_by columns (see create_aggregates), they are used instead.
+
         Parameters
         ----------
-        group_by: string
+        group_by: string or list of strings
            A column title to be used to group students. The mean is calculated
            for groups of students that have the same value for the column
-           group_by.
+           group_by. If a list of column titles is given, the means for each
+           of them are added, in order.
 
         Raises
         ------
@@ -207,14 +641,60 @@ class GradesTable:
             This exception is raised if group_by is not a column title.
 
         """
-        if not group_by in [col['title'] for col in self.columns]:
-            raise ValueError(group_by + " is not a valid column title.")
-        groups = defaultdict(list)
-        for student in self.students:
-            groups[student[group_by]].append(student)
-        for group in groups:
-            self.compute_mean(students=groups[group],
-                              row_name='Mean ' + str(group))
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        for key in group_by:
+            if not self.columns.has_title(key):
+                raise ValueError(key + " is not a valid column title.")
+        aggregates = self.aggregates()
+        if aggregates is not None and set(group_by) <= set(aggregates.group_by):
+            for key in group_by:
+                key_groups = aggregates.groups[key]
+                # Groups in order of first appearance: the students are
+                # looked at until all the groups are found.
+                order = {}
+                for student in self.students:
+                    order.setdefault(student[key], len(order))
+                    if len(order) == len(key_groups):
+                        break
+                for group in sorted(key_groups, key=order.get):
+                    self.footers.append(self._aggregated_mean(
+                            key_groups[group], 'Mean ' + str(group)))
+            return
+        num_titles = [col.title for col in self.columns[1:] if col.is_num]
+        # The groups of each student, as codes for categorical columns.
+        categories = [self.categorical(key) for key in group_by]
+        keys = [key_categories.codes if key_categories else
+                [student[key] for student in self.students]
+                for key, key_categories in zip(group_by, categories)]
+        # For each group_by column, map each group to its sums and counts.
+        # Dictionaries keep the groups in order of first appearance.
+        groups = [{} for key in group_by]
+        masks = [self.mask(title) for title in num_titles]
+        for i, student in enumerate(self.students):
+            cells = [(j, student[title])
+                     for j, (title, mask) in enumerate(zip(num_titles, masks))
+                     if mask[i]]
+            for key_groups, key_codes in zip(groups, keys):
+                group = key_codes[i]
+                if not group in key_groups:
+                    key_groups[group] = ([0] * len(num_titles),
+                                         [0] * len(num_titles))
+                sums, counts = key_groups[group]
+                for j, cell in cells:
+                    sums[j] += cell
+                    counts[j] += 1
+        for key_groups, key_categories in zip(groups, categories):
+            for group, (sums, counts) in key_groups.items():
+                if key_categories:
+                    group = key_categories.values[group]
+                mean = defaultdict(str)
+                mean[self.columns[0]['title']] = self._decorate(
+                        'Mean ' + str(group))
+                for title, sumg, nb_students in zip(num_titles, sums, counts):
+                    if nb_students:
+                        mean[title] = sumg / nb_students
+                self.footers.append(mean)
 
     def select(self, expression):
         """Select a subset of students based on expression.
@@ -222,30 +702,14 @@ class GradesTable:
         Parameter
         ---------
         expression: string
-           An expression is composed of a column name, one of the symbols '>',
-           '>=', '<', '<=' or '=' and a value.
+           An expression such as 'Midterm < 60' or 'Group in (301, 302)'.
+           See the query module for the syntax. A query.Query can be given
+           instead.
         """
-        sep = re.compile('(==?|[<>]=?|!=)')
-        splitted = sep.split(expression, maxsplit=1)
-        if len(splitted) == 3:
-            sel_table = GradesTable()
-            col_title, sep, value = splitted
-            col_title = col_title.strip()
-            value = value.strip()
-            if not col_title in [col['title'] for col in self.columns]:
-                raise KeyError('%s is not a column title.' % col_title)
-            sel_table.columns = deepcopy(self.columns)
-            if sep == '=':
-                sep = '=='
-            for student in self.students:
-                try:
-                    if student[col_title]:
-                        if eval('"' + str(student[col_title]) + '"'
-                                + sep + '"' + value + '"',
-                                {"__builtins__": None},{}):
-                            sel_table += student
-                except ValueError:
-                    pass
-        else:
-            raise Exception("Invalid SELECT statement: %s" % expression)
+        if not isinstance(expression, Query):
+            expression = Query(expression)
+        sel_table = GradesTable()
+        sel_table._share(self)
+        sel_table.extend(expression.filter(self.students, self.columns,
+                                           self.index))
         return sel_table
@@ -0,0 +1,132 @@
+#-*- coding: utf-8 -*-
+"""indexes
+
+This module provides indexes on the columns of a GradesTable.
+
+A SortedIndex keeps the numerical entries of a column in sorted order along
+with the positions of the students. A range such as ``Midterm < 60`` is then
+found by bisecting the index in O(log n + k) time instead of looking at every
+student. Sorted indexes are built by the table on first use and rebuilt
+after the students change (see GradesTable.create_index).
+
+A HashIndex maps the entries of a non numerical column, such as the names of
+the students, to the positions of the students. It is kept up to date when
+students are appended or modified through the table and answers equality
+lookups in constant time (see GradesTable.create_hash_index).
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from bisect import bisect_left, bisect_right
+from itertools import compress
+
+
+class SortedIndex:
+    """Sorted index of the numerical entries of a column.
+
+    Input
+    -----
+    students: list
+       The students of the table.
+
+    title: string
+       Title of the indexed column.
+
+    mask: bytearray
+       Validity mask of the column (see GradesTable.mask). Only the entries
+       that are numbers are indexed.
+
+    version: int
+       Version of the table the index is built from.
+
+    """
+    def __init__(self, students, title, mask, version=0):
+        pairs = sorted((students[i][title], i)
+                       for i in compress(range(len(students)), mask)
+                       if students[i][title] == students[i][title])  # NaN
+        self.title = title
+        self.keys = [key for key, position in pairs]
+        self.positions = [position for key, position in pairs]
+        self.size = len(students)
+        self.version = version
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, symbol, value):
+        """Return the positions of the students whose entry satisfies the
+        comparison ``entry symbol value`` where symbol is one of '<', '<=',
+        '>', '>=', '=' or '=='. The positions are sorted by entry. Return
+        None for other symbols."""
+        keys = self.keys
+        if symbol == '<':
+            return self.positions[:bisect_left(keys, value)]
+        if symbol == '<=':
+            return self.positions[:bisect_right(keys, value)]
+        if symbol == '>':
+            return self.positions[bisect_right(keys, value):]
+        if symbol == '>=':
+            return self.positions[bisect_left(keys, value):]
+        if symbol in ('=', '=='):
+            return self.positions[bisect_left(keys, value):
+                                  bisect_right(keys, value)]
+        return None
+
+
+class HashIndex:
+    """Hash index of the entries of a column. It maps each entry to the
+    sorted list of the positions of the students that have this entry.
+
+    Unlike a SortedIndex, a HashIndex is kept up to date by the table when
+    students are appended or entries are changed (see GradesTable.append
+    and GradesTable.set_value).
+
+    Input
+    -----
+    students: list
+       The students of the table.
+
+    title: string
+       Title of the indexed column.
+
+    version: int
+       Version of the table the index is built from.
+
+    """
+    def __init__(self, students, title, version=0):
+        self.title = title
+        self.entries = {}
+        for position, student in enumerate(students):
+            self.entries.setdefault(student.get(title, ''),
+                                    []).append(position)
+        self.size = len(students)
+        self.version = version
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, position, entry):
+        """Record that the student at position has entry."""
+        positions = self.entries.setdefault(entry, [])
+        if positions and positions[-1] > position:
+            positions.insert(bisect_left(positions, position), position)
+        else:
+            positions.append(position)
+
+    def remove(self, position, entry):
+        """Forget that the student at position has entry."""
+        positions = self.entries[entry]
+        del positions[bisect_left(positions, position)]
+        if not positions:
+            del self.entries[entry]
+
+    def lookup(self, symbol, value):
+        """Return the positions of the students whose entry is value if
+        symbol is '=' or '=='. Return None for other symbols."""
+        if symbol in ('=', '=='):
+            return self.entries.get(value, [])
+        return None
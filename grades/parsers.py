@@ -30,9 +30,11 @@ __author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
 __license__ = "BSD"
 
 
-from collections import defaultdict
+import multiprocessing
 import re
 from .gradestable import GradesTable
+from .schema import Column
+from .student import Student
 from . import defaults
 
 
@@ -41,12 +43,183 @@ EVAL_NAMES = ('TEST', 'EXAM', 'MIDTERM', 'QUIZ', 'FINAL', 'EVAL', 'SUPP',
               'DEVOIR')
 
 
+class NumberConverter:
+    """A number converter turns table entries into floats.
+
+    Entries that belong to the table of known sentinel tokens (blank, 'ABS',
+    'EXC', ...) are recognized with a set lookup before float() is ever
+    called on them, so that sparse tables do not pay for raising and catching
+    a ValueError for each missing grade. Only unknown non numerical entries go
+    through the exception path.
+
+    """
+    def __init__(self, sentinels=defaults.SENTINELS):
+        """Initialize the converter with an iterable of sentinel tokens. The
+        tokens are recognized in upper case, lower case and capitalized
+        forms."""
+        self.sentinels = set()
+        for token in sentinels:
+            self.sentinels.update((token, token.upper(), token.lower(),
+                                   token.capitalize()))
+        self.counts = {'number': 0, 'sentinel': 0, 'text': 0}
+
+    def convert(self, entry):
+        """Convert entry. Return a tuple (value, is_number) where value is a
+        float if is_number is True and entry otherwise."""
+        if entry in self.sentinels:
+            return entry, False
+        try:
+            return float(entry), True
+        except ValueError:
+            return entry, False
+
+    def convert_all(self, entries):
+        """Convert all the entries of a row or of a column.
+
+        Return a list of values and a bytearray mask that contains 1 for the
+        entries that were converted to floats. The number of entries that
+        were numbers, known sentinels or other text is added to
+        ``self.counts``.
+
+        """
+        values = list(entries)
+        mask = bytearray(len(values))
+        sentinels = self.sentinels
+        nb_sentinels = nb_text = 0
+        for i, entry in enumerate(values):
+            if entry in sentinels:
+                nb_sentinels += 1
+                continue
+            try:
+                values[i] = float(entry)
+                mask[i] = 1
+            except ValueError:
+                nb_text += 1
+        self.counts['sentinel'] += nb_sentinels
+        self.counts['text'] += nb_text
+        self.counts['number'] += len(values) - nb_sentinels - nb_text
+        return values, mask
+
+
+_converter = NumberConverter()
+
+
 def _to_float(val, default=100.):
     """Convert string val into float with fallback value default."""
-    try:
-        return float(val)
-    except ValueError:
-        return default
+    value, is_number = _converter.convert(val)
+    if is_number:
+        return value
+    return default
+
+
+class PipeLayout:
+    """Row layout of tables that separate cells with ``|`` characters ('org'
+    and 'grid rst' formats).
+
+    Once compiled for the number of cells of the header, a block of rows is
+    split with a single regular expression over the text of the whole block.
+    Rows that do not have the same number of cells as the header are split
+    one by one.
+
+    """
+    cell_sep = re.compile(r'\s*\|\s*')
+
+    def __init__(self):
+        self.block_re = None
+
+    def compile(self, header_rows):
+        """Compile the regular expression that matches a whole row with as
+        many cells as the header rows."""
+        cell = r'([^|\n]*?)[^\S\n]*\|[^\S\n]*'
+        self.block_re = re.compile(
+                r'^[^\S\n]*\|[^\S\n]*' + cell * len(header_rows[0]) + '$',
+                re.M)
+
+    def split(self, row):
+        """Split a row into cells."""
+        return self.cell_sep.split(row)[1:-1]
+
+    def split_all(self, rows):
+        """Split a list of rows. Return a list of sequences of cells."""
+        if self.block_re is not None:
+            cells = self.block_re.findall('\n'.join(rows))
+            # Each row matches at most once, so the rows all matched if
+            # there are as many matches as rows.
+            if len(cells) == len(rows):
+                if cells and not isinstance(cells[0], tuple):
+                    # findall returns strings for single cell rows.
+                    cells = [(cell,) for cell in cells]
+                return cells
+        return [self.split(row) for row in rows]
+
+
+class FixedWidthLayout:
+    """Row layout of tables whose cells are at fixed positions ('simple rst'
+    format).
+
+    A block of rows is sliced column by column and the cells are stripped in
+    bulk.
+
+    """
+    def __init__(self, slices):
+        """Initialize the layout with a list of (start, end) positions of
+        the cells. end is None for the last cell."""
+        self.slices = slices
+
+    def compile(self, header_rows):
+        """The layout is known from the first row of the table."""
+
+    def split(self, row):
+        """Split a row into cells."""
+        return [row[start:end].strip() for start, end in self.slices]
+
+    def split_all(self, rows):
+        """Split a list of rows. Return a list of sequences of cells."""
+        strip = str.strip
+        return list(zip(*[list(map(strip, [row[start:end] for row in rows]))
+                          for start, end in self.slices]))
+
+
+class Projection:
+    """A projection tells which columns of a table are needed. The other
+    columns are skipped by the parser: their cells are neither converted nor
+    stored. The parser always keeps the first column, where the footers
+    write their labels (see GradesTable.compute_mean).
+
+    Input
+    -----
+    titles: iterable
+       Titles of the needed columns.
+
+    evaluations: bool
+       If True, all the evaluation columns are needed (to compute the
+       cumulative grade).
+
+    assignments: bool
+       If True, the assignment columns are needed (to compute the assignment
+       mean).
+
+    """
+    def __init__(self, titles=(), evaluations=False, assignments=False):
+        self.titles = frozenset(titles)
+        self.evaluations = evaluations
+        self.assignments = assignments
+
+    def __repr__(self):
+        return 'Projection({!r}, evaluations={}, assignments={})'.format(
+                sorted(self.titles), self.evaluations, self.assignments)
+
+    def __eq__(self, other):
+        return repr(self) == repr(other)
+
+    def needs(self, column):
+        """Return True if column is needed."""
+        if column.title in self.titles:
+            return True
+        if column.evalu:
+            return (self.evaluations or self.assignments and
+                    column.role == 'assignment')
+        return False
 
 
 class TableMarkupError(Exception):
@@ -58,13 +231,18 @@ class TableParser:
     GradesTable data structure. The rows have to follow the 'org' or the 'grid
     rst' table formats."""
 
-    def __init__(self, ignore_char=defaults.IGNORE_CHAR):
+    def __init__(self, ignore_char=defaults.IGNORE_CHAR,
+                 sentinels=defaults.SENTINELS,
+                 parallel_threshold=defaults.PARALLEL_PARSE_THRESHOLD):
         self.ignore_char = ignore_char
+        self.sentinels = sentinels
+        self.parallel_threshold = parallel_threshold
+        self.converter = None
+        self.layout = PipeLayout()
 
     def split_row(self, row):
         """Split a row into cells using the ``|`` character as a separator."""
-        entry_sep = re.compile('\s*\|\s*')
-        return entry_sep.split(row)[1:-1]
+        return self.layout.split(row)
 
     def parse_header(self, table, rows):
         """The first three rows contains columns headers. If a column
@@ -85,6 +263,7 @@ class TableParser:
 
         if len(header_rows) != 3:
             raise TableMarkupError("There should be 3 header rows")
+        self.layout.compile(header_rows)
 
         headers = zip(*header_rows)
         for name, max_grade, weight in headers:
@@ -94,16 +273,12 @@ class TableParser:
             if name.upper().startswith(EVAL_NAMES):
                 evalu = {'max_grade': _to_float(max_grade, 100.),
                          'weight': _to_float(weight, 0.)}
-                table.columns.append(
-                        {'title': name, 'is_num': True, 'evalu': evalu,
-                         'width': 0})
+                table.columns.append(Column(name, is_num=True, evalu=evalu))
             else:
-                table.columns.append(
-                        {'title': name, 'is_num': False, 'evalu': None,
-                         'width': 0})
+                table.columns.append(Column(name))
         return end_headers
 
-    def parse(self, data):
+    def parse(self, data, processes=1, columns=None, where=None):
         """Parse lines into table row.
 
         Input
@@ -111,49 +286,193 @@ class TableParser:
         data: iterable
            A list of all the rows in the table.
 
-        ignore_char: string
-           Character (or string) that indicates a row or column that should be
-           ignored. A row or column header that starts with this character will be
-           ignored.
+        processes: int
+           Number of processes used to parse the student rows. The rows are
+           split in chunks that are parsed in a process pool and joined in
+           their original order. Tables with fewer than
+           ``self.parallel_threshold`` rows are always parsed in the current
+           process. None or 0 means one process per CPU.
+
+        columns: Projection
+           Columns that are needed. The other columns are left out of the
+           table, except the first one, which holds the names of the
+           students and the labels of the footers. By default, all the
+           columns are kept.
+
+        where: query.Query
+           If given, only the students that match the query are kept. The
+           other rows are rejected before they become student records. The
+           result is the same as selecting the students after parsing.
 
         Output
         ------
         table: GradesTable
 
+        After parsing, ``self.converter.counts`` tells how many entries of
+        numerical columns were numbers, sentinels or other text. The non
+        numerical columns with few distinct entries are dictionary encoded
+        (see GradesTable.categorical).
+
         """
+        self.converter = NumberConverter(self.sentinels)
         table = GradesTable()
         table.calc_char = self.ignore_char
         end_headers = self.parse_header(table, data)
+        positions = None
+        if columns is not None:
+            positions = [i for i, column in enumerate(table.columns)
+                         if not i or columns.needs(column)]
+            all_columns = table.columns
+            table.columns = [all_columns[i] for i in positions]
+            positions.append(len(all_columns))
+        if where is not None:
+            where.compile(table.columns)
+
+        # The next rows contain student records.
+        rows = [row for row in data[end_headers + 1:]
+                if not row.startswith(ROW_SEPS)]  # Skip separator rows
+        if processes != 1 and len(rows) >= self.parallel_threshold:
+            chunks = self._parse_parallel(table.columns, rows, processes,
+                                          positions, where)
+        else:
+            chunks = [self.parse_rows(table.columns, rows, positions, where)]
+
+        for column in table.columns:
+            if column.is_num:
+                table.record_mask(column.title, bytearray(), {})
+        for students, masks, sentinels in chunks:
+            offset = len(table.students)
+            table.students.extend(students)
+            for title in masks:
+                table.masks[title].extend(masks[title])
+                table.sentinels[title].update(
+                        (offset + i, token)
+                        for i, token in sentinels[title].items())
+        for column in table.columns:
+            if not column.is_num:
+                table.categorical(column.title)
+        return table
 
-        # The next rows contain student records. Students are stored as a
-        # list of defaultdict keyed by column title with a str default factory.
-        for row in data[end_headers + 1:]:
-            if row.startswith(ROW_SEPS):  # Separator row in the table
-                continue
-            student = defaultdict(str)
-            for i, entry in enumerate(self.split_row(row)):
-                if (i >= len(table.columns) 
-                    or entry.startswith(self.ignore_char)):
+    def parse_rows(self, columns, rows, positions=None, where=None):
+        """Parse student rows for a table with the given columns.
+
+        If positions is given, it contains the position of the cells of each
+        column in the rows followed by the number of cells of the rows. The
+        cells at other positions are skipped. If where is given, the rows
+        that do not match this query are skipped.
+
+        Students are stored as a list of Student records that share the
+        layout of the columns. Equal entries of the non numerical columns
+        share one string object. The validity mask and the non numerical
+        entries of each numerical column are recorded along the way. Return
+        a tuple (students, masks, sentinels) where masks and sentinels are
+        keyed by column title and sentinels are keyed by position in rows.
+
+        """
+        students = []
+        titles = [column['title'] for column in columns]
+        num_positions = [i for i, column in enumerate(columns)
+                         if column['is_num']]
+        text_positions = [i for i, column in enumerate(columns)
+                          if not column['is_num']]
+        # One string object per distinct entry of the non numerical columns.
+        distinct = dict((i, {}) for i in text_positions)
+        masks = dict((titles[i], bytearray()) for i in num_positions)
+        sentinels = dict((titles[i], {}) for i in num_positions)
+        layout = dict((title, i) for i, title in enumerate(titles))
+        nb_cells = len(titles) if positions is None else positions[-1]
+        if where is not None:
+            predicate = where.compile(columns)
+            needed = where.titles(columns)
+            probes = [(i, title, columns[i]['is_num'])
+                      for i, title in enumerate(titles) if title in needed]
+        for entries in self.layout.split_all(rows):
+            entries = entries[:nb_cells]
+            for i, entry in enumerate(entries):
+                if entry.startswith(self.ignore_char):
+                    entries = entries[:i]
                     break
-                if table.columns[i]['is_num']:
-                    student.update(
-                        [(table.columns[i]['title'], _to_float(entry, entry))])
+            if not entries:
+                continue
+            if positions is not None:
+                entries = [entries[i] for i in positions
+                           if i < len(entries)]
+            if where is not None:
+                # Only the cells used by the query are looked at before the
+                # row is accepted.
+                probe = {}
+                for i, title, is_num in probes:
+                    if i < len(entries):
+                        probe[title] = entries[i]
+                        if is_num:
+                            probe[title] = self.converter.convert(
+                                    entries[i])[0]
+                if not predicate(None, probe):
+                    continue
+            # Groups numbers and other non numerical columns are kept as
+            # strings, which looks better when printed.
+            entries = list(entries)
+            present = [i for i in num_positions if i < len(entries)]
+            values, valid = self.converter.convert_all(
+                    [entries[i] for i in present])
+            for mask in masks.values():
+                mask.append(0)
+            for i, value, is_number in zip(present, values, valid):
+                entries[i] = value
+                if is_number:
+                    masks[titles[i]][-1] = 1
                 else:
-                    # This is necessary to avoid casting groups numbers into
-                    # floats, which looks weird when printed.
-                    student.update([(table.columns[i]['title'], entry)])
-            if student:
-                table.students.append(student)
+                    sentinels[titles[i]][len(students)] = value
+            for i in text_positions:
+                if i < len(entries):
+                    entries[i] = distinct[i].setdefault(entries[i],
+                                                        entries[i])
+            students.append(Student(layout, entries))
+        return students, masks, sentinels
+
+    def _parse_parallel(self, columns, rows, processes, positions=None,
+                        where=None):
+        """Parse rows in chunks using a pool of processes. Return the list
+        of results of parse_rows for each chunk, in order."""
+        processes = processes or multiprocessing.cpu_count()
+        # A few chunks per process balance the load.
+        size = -(-len(rows) // (4 * processes))
+        tasks = [(self, columns, rows[i:i + size], positions, where)
+                 for i in range(0, len(rows), size)]
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_parse_chunk, tasks)
+        finally:
+            pool.close()
+            pool.join()
+        chunks = []
+        for chunk, counts in results:
+            for path in counts:
+                self.converter.counts[path] += counts[path]
+            chunks.append(chunk)
+        return chunks
+
+
+def _parse_chunk(task):
+    """Parse a chunk of rows in a worker process. task is a tuple
+    (parser, columns, rows, positions, where). Return the result of
+    parse_rows and the conversion counts."""
+    parser, columns, rows, positions, where = task
+    return (parser.parse_rows(columns, rows, positions, where),
+            parser.converter.counts)
 
-        return table
 
 class SimpleRSTParser(TableParser):
     """A table parser can read a list of rows and convert them into a
     GradesTable data structure. The rows have to follow the 'simple rst'
     table format."""
 
-    def __init__(self, first_row, ignore_char=defaults.IGNORE_CHAR):
-        TableParser.__init__(self, ignore_char=ignore_char)
+    def __init__(self, first_row, ignore_char=defaults.IGNORE_CHAR,
+                 sentinels=defaults.SENTINELS,
+                 parallel_threshold=defaults.PARALLEL_PARSE_THRESHOLD):
+        TableParser.__init__(self, ignore_char=ignore_char,
+                             sentinels=sentinels,
+                             parallel_threshold=parallel_threshold)
 
         self.columns = []
         col_start = first_row.find('=')
@@ -164,11 +483,6 @@ class SimpleRSTParser(TableParser):
                 break
             self.columns.append((col_start, col_end))
             col_start = first_row.find('=', col_end + 1)
-
-    def split_row(self, row):
-        splitted = []
-        for col in self.columns:
-            splitted.append(row[col[0]:col[1]].strip())
-        return splitted
+        self.layout = FixedWidthLayout(self.columns)
 
 
@@ -0,0 +1,467 @@
+#-*- coding: utf-8 -*-
+"""query
+
+This module compiles the expressions used to select students into
+predicates. An expression is parsed once into a Query. The query is then
+compiled for the columns of a table into a predicate that is matched against
+each student in a single pass, either after parsing (GradesTable.select) or
+while parsing so that the students that do not match are never built
+(TableParser.parse).
+
+An expression is made of the following terms:
+
+- comparisons: a column title, one of the symbols '>', '>=', '<', '<=', '=',
+  '==' or '!=' and a value, e.g. ``Group=302`` or ``*Cumul* < 60``.  For a
+  numerical column and a numerical value, the grades are compared as numbers
+  and non numerical entries (blank, 'ABS', ...) never match. Otherwise, the
+  entries are compared as strings and blank entries never match.
+
+- IN lists: a column title, ``in`` and a parenthesized list of values, e.g.
+  ``Group in (301, 302)``.
+
+- quoted student names, e.g. ``"Roger Gagnon"``, which match the students
+  whose entry in the first column is that name.
+
+- indices and slices of the list of students, e.g. ``3`` or ``4:6``.
+
+Terms are combined with ``and``, ``or`` and ``not`` and grouped with
+parentheses. A comma is a synonym for ``or``, so that ``"Bob Arthur",
+"Suzette"``, ``3, 5, 6`` or ``4:6,8:12`` select the union of the students.
+Titles and values that contain keywords, quotes, commas, parentheses or
+comparison symbols must be quoted with double or single quotes.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import operator
+import re
+from .schema import Schema
+
+
+OPERATORS = {'=': operator.eq, '==': operator.eq, '!=': operator.ne,
+             '<': operator.lt, '<=': operator.le, '>': operator.gt,
+             '>=': operator.ge}
+KEYWORDS = ('and', 'or', 'not', 'in')
+_TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<quoted>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op><=|>=|==|!=|=|<|>)
+  | (?P<punct>[(),])
+  | (?P<word>(?:[^\s<>=!(),"']|!(?!=))(?:[^\s<>=!(),]|!(?!=))*)
+  )''', re.X)
+_INDEX_RE = re.compile(r'^-?\d+$')
+_SLICE_RE = re.compile(r'^(-?\d*):(-?\d*)(?::(-?\d*))?$')
+
+
+class QueryError(Exception):
+    """Exception raised when a select expression is invalid."""
+
+
+def _to_number(value):
+    """Return value as a float or None if it is not a number."""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _tokenize(expression):
+    """Split expression into a list of (kind, text, start, end) tokens."""
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if not match or match.end() == pos:
+            raise QueryError('Invalid SELECT statement: %s' % expression)
+        kind = match.lastgroup
+        text = match.group(kind)
+        start = match.start(kind)
+        if kind == 'word' and text.lower() in KEYWORDS:
+            kind, text = 'keyword', text.lower()
+        tokens.append((kind, text, start, match.end()))
+        pos = match.end()
+    return tokens
+
+
+class _Compare:
+    """Comparison of the entries of a column with a value."""
+    def __init__(self, title, symbol, value):
+        self.title = title
+        self.symbol = symbol
+        self.value = value
+
+    def compile(self, titles, nb_students):
+        title = self.title
+        compare = OPERATORS[self.symbol]
+        number = _to_number(self.value)
+        if titles[title]['is_num'] and number is not None:
+            def predicate(index, student):
+                entry = student.get(title)
+                return (isinstance(entry, (float, int)) and
+                        compare(entry, number))
+        else:
+            value = self.value
+            def predicate(index, student):
+                entry = student.get(title, '')
+                return entry != '' and compare(str(entry), value)
+        return predicate
+
+    def candidates(self, titles, index, nb_students):
+        value = self.value
+        if titles[self.title]['is_num']:
+            value = _to_number(value)
+            if value is None:
+                return None
+        column_index = index(self.title)
+        if column_index is None:
+            return None
+        positions = column_index.lookup(self.symbol, value)
+        return None if positions is None else set(positions)
+
+
+class _In:
+    """Membership of the entries of a column in a list of values."""
+    def __init__(self, title, values):
+        self.title = title
+        self.values = values
+
+    def compile(self, titles, nb_students):
+        title = self.title
+        if titles[title]['is_num']:
+            # Each value is compared as a number to the grades, as in
+            # _Compare, or as a string to the other entries.
+            numbers = [_to_number(value) for value in self.values]
+            strings = frozenset(value for value, number in
+                                zip(self.values, numbers) if number is None)
+            numbers = frozenset(number for number in numbers
+                                if number is not None)
+            def predicate(index, student):
+                entry = student.get(title, '')
+                if isinstance(entry, (float, int)):
+                    return entry in numbers
+                return entry != '' and str(entry) in strings
+        else:
+            values = frozenset(self.values)
+            def predicate(index, student):
+                entry = student.get(title, '')
+                return entry != '' and str(entry) in values
+        return predicate
+
+    def candidates(self, titles, index, nb_students):
+        values = self.values
+        if titles[self.title]['is_num']:
+            values = [_to_number(value) for value in values]
+            if None in values:
+                return None
+        column_index = index(self.title)
+        if column_index is None:
+            return None
+        positions = set()
+        for value in values:
+            positions.update(column_index.lookup('=', value))
+        return positions
+
+
+class _Name:
+    """Student whose entry in the first column is a given name."""
+    def __init__(self, name):
+        self.name = name
+
+    def compile(self, titles, nb_students):
+        # titles are in the order of the columns.
+        title = next(iter(titles))
+        name = self.name
+        def predicate(index, student):
+            return student.get(title, '') == name
+        return predicate
+
+    def candidates(self, titles, index, nb_students):
+        return None
+
+
+class _Positions:
+    """Students at given positions in the table: an index or a slice."""
+    def __init__(self, start, stop=None, step=None, is_slice=False):
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.is_slice = is_slice
+
+    def positions(self, nb_students):
+        """Return the range of positions in a table of nb_students
+        students."""
+        if nb_students is None:
+            raise QueryError('Indices and slices cannot be used while '
+                             'parsing.')
+        if self.is_slice:
+            return range(*slice(self.start, self.stop,
+                                self.step).indices(nb_students))
+        index = self.start
+        if index < 0:
+            index += nb_students
+        return range(index, index + 1)
+
+    def compile(self, titles, nb_students):
+        positions = self.positions(nb_students)
+        def predicate(index, student):
+            return index in positions
+        return predicate
+
+    def candidates(self, titles, index, nb_students):
+        return set(self.positions(nb_students))
+
+
+class _Not:
+    def __init__(self, term):
+        self.terms = [term]
+
+    def compile(self, titles, nb_students):
+        term = self.terms[0].compile(titles, nb_students)
+        def predicate(index, student):
+            return not term(index, student)
+        return predicate
+
+    def candidates(self, titles, index, nb_students):
+        return None
+
+
+class _And:
+    def __init__(self, terms):
+        self.terms = terms
+
+    def compile(self, titles, nb_students):
+        terms = [term.compile(titles, nb_students) for term in self.terms]
+        def predicate(index, student):
+            for term in terms:
+                if not term(index, student):
+                    return False
+            return True
+        return predicate
+
+    def candidates(self, titles, index, nb_students):
+        """The students must be in the candidates of every term."""
+        known = [candidates for candidates in
+                 (term.candidates(titles, index, nb_students)
+                  for term in self.terms) if candidates is not None]
+        if not known:
+            return None
+        return set.intersection(*known)
+
+
+class _Or:
+    def __init__(self, terms):
+        self.terms = terms
+
+    def compile(self, titles, nb_students):
+        terms = [term.compile(titles, nb_students) for term in self.terms]
+        def predicate(index, student):
+            for term in terms:
+                if term(index, student):
+                    return True
+            return False
+        return predicate
+
+    def candidates(self, titles, index, nb_students):
+        """The students are in the candidates of one of the terms, which are
+        only known if they are known for every term."""
+        positions = set()
+        for term in self.terms:
+            candidates = term.candidates(titles, index, nb_students)
+            if candidates is None:
+                return None
+            positions.update(candidates)
+        return positions
+
+
+class _ExpressionParser:
+    """Recursive descent parser that builds the tree of terms of an
+    expression."""
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+
+    def error(self):
+        raise QueryError('Invalid SELECT statement: %s' % self.expression)
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos][:2]
+        return (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, kind, text):
+        if self.next() != (kind, text):
+            self.error()
+
+    def parse(self):
+        if not self.tokens:
+            self.error()
+        tree = self.parse_or()
+        if self.pos != len(self.tokens):
+            self.error()
+        return tree
+
+    def parse_or(self):
+        terms = [self.parse_and()]
+        while self.peek() in (('keyword', 'or'), ('punct', ',')):
+            self.next()
+            terms.append(self.parse_and())
+        return terms[0] if len(terms) == 1 else _Or(terms)
+
+    def parse_and(self):
+        terms = [self.parse_not()]
+        while self.peek() == ('keyword', 'and'):
+            self.next()
+            terms.append(self.parse_not())
+        return terms[0] if len(terms) == 1 else _And(terms)
+
+    def parse_not(self):
+        if self.peek() == ('keyword', 'not'):
+            self.next()
+            return _Not(self.parse_not())
+        return self.parse_term()
+
+    def parse_operand(self):
+        """Return (text, quoted) for the next operand. Consecutive words are
+        joined with the whitespace that separates them in the expression."""
+        kind, text = self.peek()
+        if kind == 'quoted':
+            self.next()
+            return re.sub(r'\\(.)', r'\1', text[1:-1]), True
+        if kind != 'word':
+            self.error()
+        start = self.tokens[self.pos][2]
+        while self.peek()[0] == 'word':
+            end = self.tokens[self.pos][3]
+            self.next()
+        return self.expression[start:end].strip(), False
+
+    def parse_term(self):
+        if self.peek() == ('punct', '('):
+            self.next()
+            tree = self.parse_or()
+            self.expect('punct', ')')
+            return tree
+        operand, quoted = self.parse_operand()
+        kind, text = self.peek()
+        if kind == 'op':
+            self.next()
+            return _Compare(operand, text, self.parse_operand()[0])
+        if (kind, text) == ('keyword', 'in'):
+            self.next()
+            return _In(operand, self.parse_list())
+        if (kind, text) == ('keyword', 'not'):
+            self.next()
+            self.expect('keyword', 'in')
+            return _Not(_In(operand, self.parse_list()))
+        if quoted:
+            return _Name(operand)
+        if _INDEX_RE.match(operand):
+            return _Positions(int(operand))
+        match = _SLICE_RE.match(operand)
+        if match:
+            start, stop, step = [int(bound) if bound else None
+                                 for bound in match.groups()]
+            return _Positions(start, stop, step, is_slice=True)
+        self.error()
+
+    def parse_list(self):
+        self.expect('punct', '(')
+        values = [self.parse_operand()[0]]
+        while self.peek() == ('punct', ','):
+            self.next()
+            values.append(self.parse_operand()[0])
+        self.expect('punct', ')')
+        return values
+
+
+def _schema(columns):
+    """Return columns as a Schema."""
+    if isinstance(columns, Schema):
+        return columns
+    return Schema(columns)
+
+
+def _walk(tree):
+    """Iterate over all the terms of tree."""
+    yield tree
+    for term in getattr(tree, 'terms', ()):
+        for subterm in _walk(term):
+            yield subterm
+
+
+class Query:
+    """A parsed select expression.
+
+    ``columns`` is the set of column titles used by comparisons and IN
+    lists. ``names`` is True if the query matches student names (the first
+    column of the table). ``positional`` is True if the query uses indices
+    or slices, in which case it can only be applied to a complete table.
+
+    """
+    def __init__(self, expression):
+        self.expression = expression
+        self.tree = _ExpressionParser(expression).parse()
+        terms = list(_walk(self.tree))
+        self.columns = frozenset(term.title for term in terms
+                                 if isinstance(term, (_Compare, _In)))
+        self.names = any(isinstance(term, _Name) for term in terms)
+        self.positional = any(isinstance(term, _Positions) for term in terms)
+
+    def __repr__(self):
+        return 'Query({!r})'.format(self.expression)
+
+    def __eq__(self, other):
+        return repr(self) == repr(other)
+
+    def check(self, columns):
+        """Raise a KeyError if the query uses a title that is not one of
+        the titles of columns."""
+        titles = _schema(columns).positions
+        for title in sorted(self.columns.difference(titles)):
+            raise KeyError('%s is not a column title.' % title)
+
+    def titles(self, columns):
+        """Return the set of titles of columns whose entries are needed to
+        match a student."""
+        if self.names and columns:
+            return self.columns | set([columns[0]['title']])
+        return self.columns
+
+    def compile(self, columns, nb_students=None):
+        """Compile the query for a table with the given columns and
+        nb_students students. Return a function predicate(index, student)
+        that returns True if the student at position index matches the
+        query. Without nb_students, indices and slices cannot be used."""
+        columns = _schema(columns)
+        self.check(columns)
+        return self.tree.compile(columns.by_title, nb_students)
+
+    def filter(self, students, columns, index=None):
+        """Return the list of students that match the query.
+
+        index is a function that returns the SortedIndex of a column title
+        or None. When the query can be answered from the indexes, only the
+        students found in the indexes are matched against the query.
+
+        """
+        predicate = self.compile(columns, len(students))
+        candidates = None
+        if index is not None:
+            candidates = self.tree.candidates(_schema(columns).by_title,
+                                              index, len(students))
+        if candidates is None:
+            return [student for i, student in enumerate(students)
+                    if predicate(i, student)]
+        return [students[i] for i in sorted(candidates)
+                if predicate(i, students[i])]
+
@@ -0,0 +1,309 @@
+#-*- coding: utf-8 -*-
+"""schema
+
+This module provides the description of the columns of a GradesTable.
+
+A Column describes one column: its title, whether its entries are numbers,
+the maximum grade and weight of the evaluation it records (``evalu``) and its
+printed width. Columns keep the mapping interface of the dictionaries they
+replace, so ``column['title']`` and ``column['evalu']['weight']`` still work
+and a column compares equal to the equivalent dictionary.
+
+The role of a column is worked out once, when the column is created:
+
+- 'evaluation': an evaluation counted in the cumulative grade;
+- 'supplemental': a supplemental exam (title starting with SUPP);
+- 'assignment': an evaluation that is an assignment (title starting with
+  one of ASSIGNMENT_NAMES), counted in the cumulative grade and in the
+  assignment mean;
+- 'computed': a column calculated by the table, such as ``*Cumul*``;
+- None: any other column, such as the names or the groups of the students.
+
+A Schema is the list of the columns of a table. It behaves like a list of
+columns and also maps the titles to the positions of the columns and the
+roles to the columns, so that a column is found without looking at all the
+others.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:  # Python 2
+    from collections import Mapping, MutableMapping
+
+
+ASSIGNMENT_NAMES = ('DEVOIR', 'ASSIGNMENT')
+SUPPLEMENTAL_NAMES = ('SUPP',)
+ROLES = ('evaluation', 'supplemental', 'assignment', 'computed')
+
+
+def _role(title, evalu):
+    """Return the role of a column with the given title and evaluation."""
+    if not evalu:
+        return None
+    name = title.upper()
+    if name.startswith(SUPPLEMENTAL_NAMES):
+        return 'supplemental'
+    if name.startswith(ASSIGNMENT_NAMES):
+        return 'assignment'
+    return 'evaluation'
+
+
+class Column(MutableMapping):
+    """Description of a column of a table.
+
+    Input
+    -----
+    title: string
+       Title of the column.
+
+    is_num: bool
+       True if the entries of the column are numbers.
+
+    evalu: dict
+       Maximum grade (key 'max_grade') and weight (key 'weight') of the
+       evaluation recorded in the column, or None.
+
+    width: int
+       Width of the printed column, set by the writers.
+
+    role: string
+       One of ROLES. By default, the role is worked out from the title and
+       evalu.
+
+    """
+    __slots__ = ('title', 'is_num', 'evalu', 'width', 'role')
+    _keys = ('title', 'is_num', 'evalu', 'width')
+
+    def __init__(self, title, is_num=False, evalu=None, width=0, role=None):
+        self.title = title
+        self.is_num = is_num
+        self.evalu = evalu
+        self.width = width
+        self.role = role or _role(title, evalu)
+
+    @classmethod
+    def from_dict(cls, column):
+        """Return the Column described by the dictionary column."""
+        return cls(column['title'], column.get('is_num', False),
+                   column.get('evalu'), column.get('width', 0))
+
+    def __getitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self._keys:
+            raise KeyError(key)
+        setattr(self, key, value)
+        if key in ('title', 'evalu') and self.role != 'computed':
+            self.role = _role(self.title, self.evalu)
+
+    def __delitem__(self, key):
+        raise TypeError('The entries of a column cannot be deleted.')
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        return (Column, (self.title, self.is_num, self.evalu, self.width,
+                         self.role))
+
+    def copy(self):
+        """Return a copy of the column. The evaluation is shared."""
+        return Column(self.title, self.is_num, self.evalu, self.width,
+                      self.role)
+
+
+def _column(column):
+    """Return column as a Column."""
+    if isinstance(column, Column):
+        return column
+    return Column.from_dict(column)
+
+
+class Schema(list):
+    """List of the columns of a table.
+
+    Dictionaries added to a schema are turned into Column objects. Besides
+    the methods of list, a schema maps the titles of its columns to their
+    positions and its roles to its columns. These maps are built when first
+    needed and again after the schema changes.
+
+    Input
+    -----
+    columns: iterable
+       Columns or dictionaries describing the columns.
+
+    """
+    __slots__ = ('_positions', '_by_title', '_roles')
+
+    def __init__(self, columns=()):
+        list.__init__(self, (_column(column) for column in columns))
+        self._changed()
+
+    def __reduce__(self):
+        return (Schema, (list(self),))
+
+    def _changed(self):
+        self._positions = None
+        self._by_title = None
+        self._roles = None
+
+    def _map_titles(self):
+        positions = {}
+        for position, column in enumerate(self):
+            positions.setdefault(column.title, position)
+        self._positions = positions
+        self._by_title = dict((title, self[position])
+                              for title, position in positions.items())
+
+    @property
+    def positions(self):
+        """Dictionary mapping the titles to the positions of the columns,
+        in the order of the columns. When several columns have the same
+        title, the first one is kept."""
+        if self._positions is None:
+            self._map_titles()
+        return self._positions
+
+    @property
+    def by_title(self):
+        """Dictionary mapping the titles to the columns, in the order of
+        the columns."""
+        if self._by_title is None:
+            self._map_titles()
+        return self._by_title
+
+    @property
+    def titles(self):
+        """List of the titles of the columns."""
+        return [column.title for column in self]
+
+    def position(self, title):
+        """Return the position of the column title. Raise KeyError if there
+        is no such column."""
+        try:
+            return self.positions[title]
+        except KeyError:
+            raise KeyError('%s is not a column title.' % title)
+
+    def column(self, title):
+        """Return the column title. Raise KeyError if there is no such
+        column."""
+        return self[self.position(title)]
+
+    def has_title(self, title):
+        """Return True if one of the columns is titled title."""
+        return title in self.positions
+
+    def with_role(self, *roles):
+        """Return the list of the columns that have one of the roles, in
+        order."""
+        if self._roles is None:
+            self._roles = dict((role, []) for role in ROLES + (None,))
+            for column in self:
+                self._roles.setdefault(column.role, []).append(column)
+        if len(roles) == 1:
+            return self._roles[roles[0]]
+        return [column for column in self if column.role in roles]
+
+    @property
+    def evaluations(self):
+        """Columns of the evaluations, including the supplemental exams and
+        the assignments."""
+        return self.with_role('evaluation', 'supplemental', 'assignment')
+
+    @property
+    def supplemental(self):
+        """The first supplemental exam column or None."""
+        columns = self.with_role('supplemental')
+        return columns[0] if columns else None
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            value = [_column(column) for column in value]
+        else:
+            value = _column(value)
+        list.__setitem__(self, key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        list.__delitem__(self, key)
+        self._changed()
+
+    def __iadd__(self, columns):
+        self.extend(columns)
+        return self
+
+    def __add__(self, columns):
+        return Schema(list(self) + list(columns))
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Schema(list.__getitem__(self, key))
+        return list.__getitem__(self, key)
+
+    def append(self, column):
+        list.append(self, _column(column))
+        self._changed()
+
+    def extend(self, columns):
+        list.extend(self, (_column(column) for column in columns))
+        self._changed()
+
+    def insert(self, position, column):
+        list.insert(self, position, _column(column))
+        self._changed()
+
+    def remove(self, column):
+        list.remove(self, column)
+        self._changed()
+
+    def pop(self, position=-1):
+        column = list.pop(self, position)
+        self._changed()
+        return column
+
+    def clear(self):
+        del self[:]
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._changed()
+
+    def copy(self):
+        """Return a shallow copy of the schema."""
+        return Schema(self)
@@ -0,0 +1,284 @@
+#-*- coding: utf-8 -*-
+"""streaming
+
+This module prints the table of a grades file with an amount of memory that
+does not grow with the number of students.
+
+A GradesFile parses the whole table before printing it, because the width of
+each column depends on all the rows. A StreamingFile reads the file twice
+instead, a chunk of STREAM_CHUNK_SIZE student rows at a time:
+
+- the first pass parses each chunk, computes the requested columns
+  (``*Cumul*``, ``*Assignments*``), finds the width of each column and adds
+  the grades to the aggregates.Stats needed for the means, overall and for
+  each group;
+- the second pass parses each chunk again, computes the same columns and
+  prints its rows right away, with the widths of the first pass. The footers
+  with the means are built from the Stats and printed after the last chunk.
+
+Only one chunk of students is held in memory at a time. The output is the
+same as printing the GradesFile: the chunks are read in the order of the
+rows and the grades of each chunk are added to the sums of the previous
+chunks, so that the sums, and the means, are the same as those of
+GradesTable.compute_mean and GradesTable.compute_grouped_mean. Encrypted
+files and queries on the positions of the students need the whole table and
+cannot be printed this way.
+
+"""
+
+
+from __future__ import print_function
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import sys
+from . import defaults
+from . import parsers
+from . import writers
+from .aggregates import Stats
+from .gradestable import GradesTable
+
+
+def can_stream(fname, select=None):
+    """Return True if the file fname can be printed by a StreamingFile that
+    selects the students with the query.Query select."""
+    return (not fname.endswith('.asc') and
+            not (select is not None and select.positional))
+
+
+class StreamingFile:
+    """The table of a grades file, printed a chunk of students at a time.
+
+    Input
+    -----
+    fname: string
+       Name of the grades file.
+
+    ignore_char: string
+       Columns whose title starts with ignore_char are not read.
+
+    calc_char: string
+       Decoration of the titles of the computed columns. By default,
+       ignore_char.
+
+    columns: parsers.Projection
+       Columns that are needed, as for TableParser.parse.
+
+    where: query.Query
+       Query that selects the students while parsing, as for
+       TableParser.parse.
+
+    select: query.Query
+       Query that selects the students after the computed columns are added,
+       as GradesTable.select. It must not use the positions of the students.
+
+    cumul, assignments: bool
+       Add the cumulative grade or the assignments mean of each student (see
+       GradesTable.compute_cumul and GradesTable.compute_assignment_mean).
+
+    mean: bool
+       Add the mean of each numerical column in a footer.
+
+    group_by: list
+       Add the means of each group of students for each of these column
+       titles in footers (see GradesTable.compute_grouped_mean).
+
+    chunk_size: int
+       Number of student rows parsed and printed at a time.
+
+    """
+    def __init__(self, fname, ignore_char=defaults.IGNORE_CHAR,
+                 calc_char=None, columns=None, where=None, select=None,
+                 cumul=False, assignments=False, mean=False, group_by=(),
+                 chunk_size=defaults.STREAM_CHUNK_SIZE):
+        self.fname = fname
+        self.ignore_char = ignore_char
+        self.calc_char = calc_char or ignore_char
+        self.columns = columns
+        self.where = where
+        self.select = select
+        self.cumul = cumul
+        self.assignments = assignments
+        self.mean = mean
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        self.group_by = list(group_by or ())
+        self.chunk_size = chunk_size
+        self.table_format = defaults.TABLE_FORMAT
+
+    def _open(self):
+        """Open the file and read the lines before the table, stripped, as
+        GradesFile does. Return the file, these lines and the first row of
+        the table."""
+        fileh = open(self.fname)
+        header = []
+        line = fileh.readline()
+        while line:
+            line = line.strip()
+            if line.startswith(('|', '+', '=')):
+                break
+            header.append(line)
+            line = fileh.readline()
+        return fileh, header, line
+
+    def _chunks(self, fileh, line):
+        """Generate the tables of the successive chunks of students of the
+        table that starts with the row line in fileh, with the computed
+        columns. At least one table is generated, even if there is no
+        student. When the generator is exhausted, self._end is the line
+        that ended the table."""
+        # The rows of the column headers, up to the separator that ends
+        # them, start each chunk.
+        header_rows = []
+        while line.strip():
+            header_rows.append(line)
+            line = fileh.readline()
+            if len(header_rows) > 1 and \
+                    header_rows[-1].startswith(parsers.ROW_SEPS):
+                break
+        if header_rows and header_rows[0][0] == '=':
+            tparser = parsers.SimpleRSTParser(header_rows[0],
+                                              ignore_char=self.ignore_char)
+        else:
+            tparser = parsers.TableParser(ignore_char=self.ignore_char)
+        rows = []
+        # Number of rows of the table and of student rows in rows.
+        nb_rows = len(header_rows)
+        nb_students = 0
+        generated = False
+        while True:
+            if line.strip():
+                rows.append(line)
+                if not line.startswith(parsers.ROW_SEPS):
+                    nb_students += 1
+                line = fileh.readline()
+                if nb_students < self.chunk_size:
+                    continue
+            nb_rows += len(rows)
+            if nb_rows < 3:
+                raise Exception('Malformed table in file ' + self.fname)
+            table = self._chunk(tparser, header_rows + rows)
+            if table.students or not generated:
+                yield table
+                generated = True
+            if not line.strip():
+                break
+            rows = []
+            nb_students = 0
+        self._end = line
+
+    def _chunk(self, tparser, rows):
+        """Parse rows and add the computed columns."""
+        table = tparser.parse(rows, columns=self.columns, where=self.where)
+        table.calc_char = self.calc_char
+        if self.cumul:
+            table.compute_cumul()
+        if self.assignments:
+            table.compute_assignment_mean()
+        if self.select is not None:
+            table = table.select(self.select)
+        return table
+
+    def _footer_lines(self, fileh):
+        """Generate the lines after the table, stripped, as GradesFile
+        does."""
+        line = self._end
+        while line:
+            yield line.strip()
+            line = fileh.readline()
+
+    def scan(self, writer_class=writers.TableWriter, **kwargs):
+        """Read the file a first time. Return a table with the columns and
+        the footers of the table and the widths of the columns, keyed by
+        title, for a writer of class writer_class created with the keyword
+        arguments kwargs."""
+        widths = {}
+        stats = {}
+        groups = dict((key, {}) for key in self.group_by)
+        fileh, header, line = self._open()
+        try:
+            for table in self._chunks(fileh, line):
+                for key in self.group_by:
+                    if not table.columns.has_title(key):
+                        raise ValueError(key +
+                                         " is not a valid column title.")
+                for title, width in writer_class(
+                        table, **kwargs).column_widths().items():
+                    widths[title] = max(width, widths.get(title, 0))
+                if self.mean or self.group_by:
+                    self._add_grades(table, stats, groups)
+        finally:
+            fileh.close()
+        totals = GradesTable(calc_char=self.calc_char)
+        totals.columns = table.columns
+        if self.mean:
+            totals.footers.append(totals._aggregated_mean(stats, 'Mean'))
+        for key in self.group_by:
+            for group, group_stats in groups[key].items():
+                totals.footers.append(totals._aggregated_mean(
+                        group_stats, 'Mean ' + str(group)))
+        for title, width in writer_class(totals,
+                                         **kwargs).column_widths().items():
+            widths[title] = max(width, widths.get(title, 0))
+        return totals, widths
+
+    def _add_grades(self, table, stats, groups):
+        """Add the grades of the numerical columns of table, in order, to
+        stats, the dictionary of the Stats of the columns, and to groups,
+        which maps each group_by title to the dictionary of the Stats of the
+        columns of each group."""
+        for column in table.columns:
+            if not column.is_num:
+                continue
+            title = column.title
+            grades = [student.get(title) for student in table.students]
+            _extend(stats.setdefault(title, Stats()), grades)
+            for key in self.group_by:
+                by_group = {}
+                for student, grade in zip(table.students, grades):
+                    by_group.setdefault(student[key], []).append(grade)
+                for group, group_grades in by_group.items():
+                    _extend(groups[key].setdefault(group, {}).setdefault(
+                            title, Stats()), group_grades)
+
+    def print_file(self, div_on=None, columns=None, tableonly=False,
+                   file=sys.stdout, buffer_size=defaults.WRITE_BUFFER_SIZE,
+                   **kwargs):
+        """Print the file and the table, like GradesFile.print_file. The
+        file is read twice."""
+        writer_class = writers.writer_class(self.table_format)
+        totals, widths = self.scan(writer_class, **kwargs)
+        twriter = writer_class(totals, **kwargs)
+        twriter.widths = widths
+        fileh, header, line = self._open()
+        try:
+            if not tableonly:
+                print('\n'.join(header), file=file)
+            writers.write_lines(
+                    twriter.chunk_lines(self._chunks(fileh, line),
+                                        div_on=div_on, columns=columns),
+                    file, buffer_size)
+            if not tableonly:
+                writers.write_lines(_join(self._footer_lines(fileh)), file,
+                                    buffer_size)
+        finally:
+            fileh.close()
+
+
+def _extend(stats, entries):
+    """Add the grades among entries, in order, to stats."""
+    stats.extend([entry for entry in entries
+                  if isinstance(entry, (float, int))])
+
+
+def _join(lines):
+    """Generate the same text as print('\\n'.join(lines)), a line at a
+    time."""
+    separator = ''
+    for line in lines:
+        yield separator + line
+        separator = '\n'
+    yield '\n'
@@ -0,0 +1,146 @@
+#-*- coding: utf-8 -*-
+"""student
+
+This module provides the compact record type used for the rows of a
+GradesTable.
+
+A Student stores its entries in a list indexed by column position. The
+mapping from column titles to positions is shared by all the students of a
+table, so that a student costs a small object and a list of references
+instead of a full dictionary keyed by column titles. Students keep the
+mapping interface of the dictionaries they replace: ``student['Midterm']``,
+``student.get('Midterm')``, ``'Midterm' in student``, iteration over the
+titles, and so on. Like a defaultdict(str), a student returns an empty
+string for a title it has no entry for.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:  # Python 2
+    from collections import Mapping, MutableMapping
+
+
+class _Unset(object):
+    """Marker for the positions of a student that have no entry."""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'UNSET'
+
+    def __reduce__(self):
+        # Pickled by reference so that the marker stays a singleton.
+        return 'UNSET'
+
+
+UNSET = _Unset()
+
+
+class Student(MutableMapping):
+    """A student record.
+
+    Input
+    -----
+    layout: dict
+       Mapping from column titles to positions, shared by the students of a
+       table. Titles that are not in the layout yet are added to it when
+       they are assigned.
+
+    values: iterable
+       Entries of the student in column order. UNSET marks a missing entry.
+       Titles beyond the end of values have no entry.
+
+    """
+    __slots__ = ('_layout', '_values')
+
+    def __init__(self, layout=None, values=()):
+        self._layout = {} if layout is None else layout
+        self._values = list(values)
+
+    def __getitem__(self, title):
+        try:
+            value = self._values[self._layout[title]]
+        except (KeyError, IndexError):
+            return ''
+        if value is UNSET:
+            return ''
+        return value
+
+    def get(self, title, default=None):
+        try:
+            value = self._values[self._layout[title]]
+        except (KeyError, IndexError):
+            return default
+        if value is UNSET:
+            return default
+        return value
+
+    def __contains__(self, title):
+        return self.get(title, UNSET) is not UNSET
+
+    def __setitem__(self, title, value):
+        layout = self._layout
+        position = layout.get(title)
+        if position is None:
+            position = layout[title] = len(layout)
+        values = self._values
+        if position >= len(values):
+            values.extend([UNSET] * (position + 1 - len(values)))
+        values[position] = value
+
+    def __delitem__(self, title):
+        if title not in self:
+            raise KeyError(title)
+        self._values[self._layout[title]] = UNSET
+
+    def pop(self, title, *default):
+        if title in self:
+            value = self[title]
+            del self[title]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(title)
+
+    def __iter__(self):
+        values = self._values
+        nb_values = len(values)
+        for title, position in list(self._layout.items()):
+            if position < nb_values and values[position] is not UNSET:
+                yield title
+
+    def __len__(self):
+        return sum(1 for value in self._values if value is not UNSET)
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Student({!r})'.format(dict(self.items()))
+
+    def __getstate__(self):
+        return (self._layout, self._values)
+
+    def __setstate__(self, state):
+        self._layout, self._values = state
+
+    def copy(self):
+        """Return a copy of the student that shares the layout."""
+        return Student(self._layout, self._values)
+
+    __copy__ = copy
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+Test the running aggregates of a table.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import math
+from nose.tools import assert_equal, assert_almost_equal, assert_true
+import grades
+from grades.aggregates import ExactSum, Stats
+from grades.student import Student, UNSET
+
+
+class TestAggregates(object):
+    in_str = """\
+| Name              | Group | Test 1 | Midterm | Supp |
+|                   |       |  20.00 |  100.00 | 100.00 |
+|                   |       |  10.00 |   30.00 |   0.00 |
+|-------------------+-------+--------+---------+--------|
+| Bob Arthur        | 301   |  13.00 |         |        |
+| Suzanne Tremblay  | 302   |  17.50 |   80.00 |        |
+| Albert Prévert    | 301   | ABS    |   78.00 |  70.00 |
+| André Arthur      | 301   |  15.00 |   41.00 |  55.00 |
+| Roger Gagnon      | 302   |  12.00 |   80.00 |        |"""
+
+    def setUp(self):
+        self.tparser = grades.parsers.TableParser()
+        self.table = self.tparser.parse(self.in_str.split('\n'))
+        self.table.create_aggregates('Group')
+        self.table.compute_cumul()
+        self.aggregates = self.table.aggregates()
+
+    def check(self):
+        """The table gives the same results as a table where everything is
+        computed from scratch."""
+        table = self.table
+        expected = grades.gradestable.GradesTable()
+        expected.columns = [column.copy() for column in table.columns[:5]]
+        expected.extend(Student(dict((title, i) for i, title in
+                                     enumerate(expected.columns.titles)),
+                                [student.get(title, UNSET) for title in
+                                 expected.columns.titles])
+                        for student in table.students)
+        expected.compute_cumul()
+        # The aggregates were updated, not rebuilt.
+        assert_true(table.aggregates() is self.aggregates)
+        assert_equal(table.students, expected.students)
+        for title in table.masks:
+            assert_equal(table.mask(title), expected.mask(title))
+        table.footers = []
+        table.compute_mean()
+        table.compute_grouped_mean()
+        expected.compute_mean()
+        expected.compute_grouped_mean()
+        assert_equal([footer['Name'] for footer in table.footers],
+                     [footer['Name'] for footer in expected.footers])
+        for footer, expected_footer in zip(table.footers, expected.footers):
+            assert_equal(set(footer), set(expected_footer))
+            for title in table.columns.titles[2:]:
+                if title in footer:
+                    assert_equal(footer[title], expected_footer[title])
+
+    def test_created(self):
+        aggregates = self.table.aggregates()
+        assert_equal(aggregates.columns['Test 1'].count, 4)
+        assert_equal(aggregates.columns['Midterm'].mean(), 279. / 4)
+        assert_equal(aggregates.groups['Group']['302']['Test 1'].mean(),
+                     14.75)
+        assert_equal(list(aggregates.groups['Group']), ['301', '302'])
+        assert_equal(aggregates.cumul(0), 65.)
+        self.check()
+
+    def test_append(self):
+        layout = {'Name': 0, 'Group': 1, 'Test 1': 2, 'Midterm': 3,
+                  'Supp': 4}
+        self.table.append(Student(layout, ['Alicia Keys', '303', 19., 91.]))
+        self.table.append(Student(layout, ['Ann Oh', '301', 10., 50., 65.]))
+        assert_almost_equal(self.table.students[5]['*Cumul*'], 92.)
+        assert_equal(self.table.students[6]['*Cumul with supp*'], 60.)
+        self.check()
+
+    def test_set_value(self):
+        self.table.set_value(0, 'Test 1', 'ABS')
+        self.table.set_value(0, 'Midterm', 40.)
+        self.table.set_value(2, 'Supp', 50.)
+        self.table.set_value(3, 'Supp', '')
+        self.table.set_value(1, 'Group', '303')
+        assert_equal(self.table.students[0]['*Cumul*'], 40.)
+        assert_equal(self.table.students[2]['*Adjustment*'], 0.)
+        assert_true('*Adjustment*' not in self.table.students[3])
+        self.check()
+
+    def test_delete(self):
+        self.table.delete(1)
+        self.table.delete(-1)
+        assert_equal(len(self.table.students), 3)
+        assert_equal(list(self.table.aggregates().groups['Group']), ['301'])
+        assert_equal(self.table.sentinels['Test 1'], {1: 'ABS'})
+        self.check()
+
+    def test_rounding(self):
+        """The means are the same as those computed from scratch, including
+        their rounding, after the grades are changed."""
+        layout = {'Name': 0, 'Group': 1, 'Test 1': 2, 'Midterm': 3}
+        for grade in (0.1, 0.2, 0.3):
+            self.table.append(Student(layout, ['Ann Oh', '303', grade, 0.7]))
+        assert_true(not self.aggregates.lost)
+        self.check()
+        self.table.set_value(5, 'Test 1', 0.4)
+        self.table.set_value(6, 'Midterm', 0.1)
+        assert_true(self.aggregates.lost)
+        self.check()
+        assert_true(not self.aggregates.lost)
+        self.table.delete(7)
+        self.check()
+        assert_equal(self.aggregates.groups['Group']['303']['Test 1'].mean(),
+                     (0.4 + 0.2) / 2)
+
+    def test_integers(self):
+        """Sums of integers stay exact when grades are changed."""
+        self.table.set_value(4, 'Midterm', 'ABS')
+        self.table.set_value(0, 'Midterm', 20.)
+        self.table.delete(2)
+        assert_equal(self.aggregates.columns['Midterm'].total, 141.)
+        for stats in self.aggregates.groups['Group'].values():
+            assert_true(stats['Midterm'].total is not None)
+        self.check()
+
+    def test_rebuilt(self):
+        """Changes made directly to the students rebuild the aggregates."""
+        self.table.students[0]['Test 1'] = 3.
+        self.table.changed()
+        assert_equal(self.table.aggregates().columns['Test 1'].mean(),
+                     47.5 / 4)
+
+
+def test_exact_sum():
+    """Removing a number leaves the exact sum of the others."""
+    total = ExactSum()
+    for x in (1e16, 1., 0.1, -1e16, 0.2):
+        total.add(x)
+    assert_equal(total.value(), 1.3)
+    total.add(-1.)
+    assert_equal(total.value(), math.fsum([0.1, 0.2]))
+
+
+def test_stats_sum():
+    """The sum of the grades is the sum in the order they were added."""
+    grades = [0.1, 0.2, 0.3]
+    stats = Stats()
+    stats.extend(grades[:1])
+    stats.add(grades[1])
+    stats.extend(grades[2:])
+    assert_equal(stats.total, sum(grades))
+    assert_true(stats.total != math.fsum(grades))
+    stats.remove(0.2)
+    assert_true(stats.total is None)
+    stats = Stats()
+    stats.extend([1., 3., 5.])
+    stats.remove(3.)
+    stats.add(4., last=False)
+    assert_equal(stats.total, 10.)
+    stats.add(0.5, last=False)
+    assert_true(stats.total is None)
+
@@ -0,0 +1,143 @@
+#-*- coding: utf-8 -*-
+"""test_cache
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from nose.tools import assert_equal, assert_true
+import os
+import shutil
+import tempfile
+import grades
+
+
+class TestParseCache(object):
+    file_str = """\
+* Grades for a fictive class
+
+| Nom              | Group | Test 1 | Test 2 | Midterm |
+|                  |       |  70.00 | 100.00 |  100.00 |
+|                  |       |  10.00 |  10.00 |   30.00 |
+|------------------+-------+--------+--------+---------|
+| Bob Arthur       | 301   |  23.00 |  45.00 |         |
+| Suzanne Tremblay | 302   |  67.00 |  78.00 |   80.00 |
+| Albert Prévert   | 302   |        | ABS    |   78.00 |
+
+Some text after the table.
+"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fname = os.path.join(self.tmpdir, 'Grades.rst')
+        self.write(self.file_str)
+        self.cache = grades.cache.ParseCache(
+                directory=os.path.join(self.tmpdir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, content, fname=None):
+        with open(fname or self.fname, 'w') as fileh:
+            fileh.write(content)
+
+    def test_load(self):
+        """A snapshot gives the same result as parsing the file."""
+        gfile1 = self.cache.load(self.fname)
+        gfile2 = self.cache.load(self.fname)
+        gfile = grades.writers.GradesFile(self.fname)
+        for loaded in (gfile1, gfile2):
+            assert_equal(loaded.header, gfile.header)
+            assert_equal(loaded.footer, gfile.footer)
+            assert_equal(loaded.table, gfile.table)
+        assert_equal(len(self.cache._entries()), 1)
+
+    def test_modified_file_same_mtime(self):
+        """A file modified without changing its size and modification time
+        is parsed again."""
+        self.cache.load(self.fname)
+        stat = os.stat(self.fname)
+        self.write(self.file_str.replace('Bob Arthur', 'Bob Arthus'))
+        os.utime(self.fname, (stat.st_atime, stat.st_mtime))
+        gfile = self.cache.load(self.fname)
+        assert_equal(gfile.table.students[0]['Nom'], 'Bob Arthus')
+        snapshot = self.cache._read_entry(self.cache._entries()[0])
+        assert_equal(snapshot['gfile'].table.students[0]['Nom'], 'Bob Arthus')
+
+    def test_modified_file(self):
+        self.cache.load(self.fname)
+        stat = os.stat(self.fname)
+        self.write(self.file_str.replace('Bob Arthur', 'Bob Arthus'))
+        os.utime(self.fname, (stat.st_atime, stat.st_mtime + 10))
+        gfile = self.cache.load(self.fname)
+        assert_equal(gfile.table.students[0]['Nom'], 'Bob Arthus')
+
+    def test_touched_file(self):
+        """A touched file with the same content is served from the cache."""
+        self.cache.load(self.fname)
+        stat = os.stat(self.fname)
+        os.utime(self.fname, (stat.st_atime, stat.st_mtime + 10))
+        gfile = self.cache.load(self.fname)
+        assert_equal(gfile.table.students[0]['Nom'], 'Bob Arthur')
+        snapshot = self.cache._read_entry(self.cache._entries()[0])
+        assert_equal(snapshot['mtime'], stat.st_mtime + 10)
+
+    def test_options(self):
+        """Each set of parsing options has its own snapshot."""
+        self.cache.load(self.fname)
+        gfile = self.cache.load(self.fname, ignore_char='/')
+        assert_equal(gfile.table.calc_char, '/')
+        assert_equal(len(self.cache._entries()), 2)
+
+    def test_projection(self):
+        """The projections share the snapshot of all the columns."""
+        for titles in (['Midterm'], ['Test 1', 'Test 2'], ['Midterm']):
+            gfile = self.cache.load(self.fname,
+                                    columns=grades.parsers.Projection(titles))
+            assert_equal(len(gfile.table.columns), 5)
+        assert_equal(len(self.cache._entries()), 1)
+
+    def test_where(self):
+        """The queries share the snapshot of all the students."""
+        for expression in ('Group = 302', 'Test 1 < 50', 'Group = 302'):
+            where = grades.query.Query(expression)
+            gfile = self.cache.load(self.fname, where=where)
+            expected = grades.writers.GradesFile(self.fname, where=where)
+            assert_equal(gfile.table.students, expected.table.students)
+            assert_equal(gfile.table.mask('Midterm'),
+                         expected.table.mask('Midterm'))
+        assert_equal(len(self.cache._entries()), 1)
+        gfile = self.cache.load(self.fname)
+        assert_equal(len(gfile.table.students), 3)
+
+    def test_invalidate(self):
+        fname2 = os.path.join(self.tmpdir, 'Other.rst')
+        self.write(self.file_str, fname2)
+        self.cache.load(self.fname)
+        self.cache.load(fname2)
+        self.cache.invalidate(self.fname)
+        entries = self.cache._entries()
+        assert_equal(len(entries), 1)
+        assert_equal(self.cache._read_entry(entries[0])['path'],
+                     os.path.abspath(fname2))
+        self.cache.clear()
+        assert_equal(self.cache._entries(), [])
+
+    def test_evict(self):
+        self.cache.max_entries = 1
+        fname2 = os.path.join(self.tmpdir, 'Other.rst')
+        self.write(self.file_str, fname2)
+        self.cache.load(self.fname)
+        self.cache.load(fname2)
+        entries = self.cache._entries()
+        assert_equal(len(entries), 1)
+
+    def test_unwritable_cache(self):
+        """Failing to write the cache is not an error."""
+        self.write('', os.path.join(self.tmpdir, 'notadir'))
+        self.cache.directory = os.path.join(self.tmpdir, 'notadir')
+        gfile = self.cache.load(self.fname)
+        assert_true(gfile.table.students)
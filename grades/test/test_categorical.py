@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+Test the dictionary encoding of the non numerical columns.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from nose.tools import assert_equal, assert_true
+import grades
+from grades import categorical
+from grades.student import Student
+
+
+class TestCategorical(object):
+    in_str = """\
+| Name              | Group | Test 1 | Midterm |
+|                   |       |  70.00 |  100.00 |
+|                   |       |  10.00 |   30.00 |
+|-------------------+-------+--------+---------|
+| Bob Arthur        | 301   |  23.00 |         |
+| Suzanne Tremblay  | 302   |  67.00 |   80.00 |
+| Albert Prévert    | 301   |        |   78.00 |
+| André Arthur      | 301   |  75.00 |   65.00 |
+| Roger Gagnon      | 302   |  67.00 |   80.00 |
+| Eleonor Brochu    |       |  67.00 |    0.00 |"""
+
+    def setUp(self):
+        tparser = grades.parsers.TableParser()
+        self.table = tparser.parse(self.in_str.split('\n'))
+
+    def test_parse(self):
+        """Columns with few distinct entries are encoded while parsing."""
+        groups = self.table.categorical('Group')
+        assert_equal(groups.values, ['301', '302', ''])
+        assert_equal(list(groups.codes), [0, 1, 0, 0, 1, 2])
+        assert_true(self.table.categoricals['Group'] is groups)
+        assert_true(self.table.students[0]['Group'] is
+                    self.table.students[2]['Group'])
+        assert_equal(self.table.categorical('Name'), None)
+        assert_equal(self.table.categorical('Test 1'), None)
+
+    def test_updates(self):
+        """Appends and changes made through the table update the codes."""
+        groups = self.table.categorical('Group')
+        self.table.append(Student({'Name': 0, 'Group': 1},
+                                  ['Alicia Keys', '303']))
+        self.table.set_value(0, 'Group', '302')
+        assert_true(self.table.categorical('Group') is groups)
+        assert_equal(groups.values, ['301', '302', '', '303'])
+        assert_equal(list(groups.codes), [1, 1, 0, 0, 1, 2, 3])
+        assert_equal([groups.value(i) for i in range(7)],
+                     [student['Group'] for student in self.table.students])
+        self.table.students[6]['Group'] = '301'
+        self.table.changed()
+        assert_equal(self.table.categorical('Group').value(6), '301')
+
+    def test_overflow(self):
+        """The encoding is given up when there are too many entries."""
+        table = self.table
+        table.categorical('Group')
+        for i in range(categorical.MAX_CATEGORIES):
+            table.set_value(i % len(table.students), 'Group', str(i))
+        assert_equal(table.categorical('Group'), None)
+        table.set_value(0, 'Group', '301')
+        assert_equal(table.categorical('Group'), None)
+
+    def test_grouped_mean_and_divisions(self):
+        """Grouping with codes gives the same results as with strings."""
+        self.table.compute_grouped_mean('Group')
+        assert_equal([footer['Name'] for footer in self.table.footers],
+                     ['*Mean 301*', '*Mean 302*', '*Mean *'])
+        assert_equal(self.table.footers[1]['Midterm'], 80.)
+        writer = grades.writers.TableWriter(self.table[:])
+        writer._set_columns_width()
+        rows = writer.rows_str(div_on=('Group',)).split('\n')
+        assert_equal([i for i, row in enumerate(rows) if row[1:2] == '-'],
+                     [1, 3, 6, 8])
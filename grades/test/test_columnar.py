@@ -0,0 +1,167 @@
+#-*- coding: utf-8 -*-
+"""
+Test the columnar storage backend.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+import random
+from nose.plugins.skip import SkipTest
+from nose.tools import assert_equal, assert_almost_equal, assert_true
+import grades
+
+
+class TestColumnarGradesTable(object):
+    """Test that the columnar backend behaves like a GradesTable."""
+    in_str = """\
+| Name              | Group | Test 1 | Test 2 | Midterm |
+|                   |       |  70.00 | 100.00 |  100.00 |
+|                   |       |  10.00 |  10.00 |   30.00 |
+|-------------------+-------+--------+--------+---------|
+| Bob Arthur        | 301   |  23.00 |  45.00 |         |
+| Suzanne Tremblay  | 301   |  67.00 |  78.00 |   80.00 |
+| Albert Prévert    | 301   |        | ABS    |   78.00 |
+| André Arthur      | 301   |  75.00 |  91.00 |   65.00 |
+| Roger Gagnon      | 302   |  67.00 |  78.00 |   80.00 |
+| Eleonor Brochu    | 302   |  67.00 |  78.00 |   80.00 |
+| Capitaine Haddock | 302   |  34.00 |  84.00 |   99.00 |
+| Buster Keaton     | 302   |  56.00 |  43.00 |   66.00 |
+| Alicia Keys       | 302   |  82.00 | ABS    |   73.00 |"""
+
+    def setUp(self):
+        if grades.columnar.np is None:
+            raise SkipTest('numpy is not installed')
+        tparser = grades.parsers.TableParser()
+        self.gtable = tparser.parse(self.in_str.split('\n'))
+        self.ctable = grades.columnar.ColumnarGradesTable(self.gtable)
+
+    def check_footers(self, footers1, footers2):
+        assert_equal(len(footers1), len(footers2))
+        for footer1, footer2 in zip(footers1, footers2):
+            assert_equal(set(footer1), set(footer2))
+            for key in footer1:
+                assert_almost_equal(footer1[key], footer2[key])
+
+    def test_row_view(self):
+        """The row view contains the same students as the original table."""
+        assert_equal(self.ctable.students, self.gtable.students)
+        assert_equal(self.ctable.columns, self.gtable.columns)
+        assert_equal(list(self.ctable), list(self.gtable))
+
+    def test_sentinels(self):
+        """Non numerical entries in numerical columns are preserved."""
+        assert_equal(self.ctable.students[2]['Test 1'], '')
+        assert_equal(self.ctable.students[2]['Test 2'], 'ABS')
+        assert_true(not self.ctable._valid['Test 2'][2])
+
+    def test_slice(self):
+        subtable = self.ctable[1:7:2]
+        assert_true(isinstance(subtable, grades.columnar.ColumnarGradesTable))
+        assert_equal(subtable.students, self.gtable[1:7:2].students)
+        assert_equal(self.ctable[5].students, self.gtable[5].students)
+
+    def test_select(self):
+        stable = self.ctable.select('Test 2<46')
+        assert_equal(stable.students, self.gtable.select('Test 2<46').students)
+
+    def test_mean(self):
+        self.ctable.compute_mean()
+        self.gtable.compute_mean()
+        self.check_footers(self.ctable.footers, self.gtable.footers)
+
+    def test_grouped_mean(self):
+        self.ctable.compute_grouped_mean('Group')
+        self.gtable.compute_grouped_mean('Group')
+        self.check_footers(self.ctable.footers, self.gtable.footers)
+
+    def test_cumul(self):
+        self.ctable.compute_cumul()
+        self.gtable.compute_cumul()
+        assert_equal(self.ctable.columns, self.gtable.columns)
+        assert_equal(self.ctable.students, self.gtable.students)
+
+    def test_write(self):
+        """Writers work with the row view."""
+        self.ctable.compute_cumul()
+        self.gtable.compute_cumul()
+        assert_equal(str(grades.writers.TableWriter(self.ctable)),
+                     str(grades.writers.TableWriter(self.gtable)))
+
+    def test_cumul_with_supp(self):
+        in_str = """\
+| Name              | Group | Test 1 | Test 2 | Midterm | Supplemental exam |
+|                   |       |  70.00 | 100.00 |  100.00 |            100.00 |
+|                   |       |  10.00 |  10.00 |   30.00 |              0.00 |
+|-------------------+-------+--------+--------+---------+-------------------|
+| Bob Arthur        | 301   |  23.00 |  45.00 |         |             78.00 |
+| Suzanne Tremblay  | 301   |  67.00 |  78.00 |   80.00 |             58.00 |
+| Albert Prévert    | 301   |        | ABS    |   78.00 |                   |
+"""
+        gtable = grades.parsers.TableParser().parse(in_str.split('\n'))
+        ctable = grades.columnar.ColumnarGradesTable(gtable)
+        gtable.compute_cumul()
+        ctable.compute_cumul()
+        assert_equal(ctable.columns, gtable.columns)
+        assert_equal(ctable.students, gtable.students)
+
+    def test_cumul_is_exact(self):
+        """The vectorized cumul gives exactly the same floats."""
+        rand = random.Random(42)
+        rows = self.in_str.split('\n')[:4]
+        for i in range(500):
+            cells = ['Student %d' % i, str(300 + i % 4)]
+            for j in range(3):
+                if rand.random() < 0.2:
+                    cells.append(rand.choice(('', 'ABS')))
+                else:
+                    cells.append('%.2f' % rand.uniform(0, 70))
+            rows.append('| ' + ' | '.join(cells) + ' |')
+        gtable = grades.parsers.TableParser().parse(rows)
+        ctable = grades.columnar.ColumnarGradesTable(gtable)
+        gtable.compute_cumul()
+        ctable.compute_cumul()
+        assert_equal([s['*Cumul*'] for s in ctable.students],
+                     [s['*Cumul*'] for s in gtable.students])
+
+    def test_mean_is_exact(self):
+        """The means are exactly the same floats as those of a GradesTable,
+        for a table large enough for numpy to sum by blocks."""
+        rand = random.Random(42)
+        rows = self.in_str.split('\n')[:4]
+        for i in range(3000):
+            cells = ['Student %d' % i, str(300 + i % 4)]
+            for j in range(3):
+                if rand.random() < 0.2:
+                    cells.append(rand.choice(('', 'ABS')))
+                else:
+                    cells.append(repr(rand.uniform(0, 70)))
+            rows.append('| ' + ' | '.join(cells) + ' |')
+        gtable = grades.parsers.TableParser().parse(rows)
+        ctable = grades.columnar.ColumnarGradesTable(gtable)
+        for table in (gtable, ctable):
+            table.compute_mean()
+            table.compute_grouped_mean()
+        assert_equal(ctable.footers, gtable.footers)
+
+    def test_grouped_mean_several_keys(self):
+        self.ctable.compute_grouped_mean(['Group', 'Test 2'])
+        self.gtable.compute_grouped_mean(['Group', 'Test 2'])
+        self.check_footers(self.ctable.footers, self.gtable.footers)
+
+    def test_copy_columnar(self):
+        ctable = grades.columnar.ColumnarGradesTable(self.ctable)
+        assert_equal(ctable.students, self.gtable.students)
+        assert_equal(ctable.mask('Test 2'), self.gtable.mask('Test 2'))
+        assert_equal(ctable.sentinels['Test 2'], {2: 'ABS', 8: 'ABS'})
+
+    def test_append_and_set_value(self):
+        student = self.gtable.students[0].copy()
+        for table in (self.ctable, self.gtable):
+            table.append(student.copy())
+            table.set_value(0, 'Midterm', 50.)
+        assert_equal(self.ctable.students, self.gtable.students)
+        assert_equal(self.ctable.mask('Midterm'), self.gtable.mask('Midterm'))
@@ -8,8 +8,9 @@ __author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
 __license__ = "BSD"
 
 
-from nose.tools import assert_equal, assert_raises
+from nose.tools import assert_equal, assert_raises, assert_true
 import os
+import pickle
 try:
     import cStringIO as io
 except ImportError:
@@ -247,6 +248,33 @@ lines and columns.
         self.check_output(self.output_str4, gfile, div_on=('Group',),
                          columns=('Nom', 'Test 1', 'Test 2', '*Cumul*'))
 
+    def test_mmap(self):
+        """A memory-mapped file gives the same table and prints the text
+        around the table unchanged."""
+        with open(self.fname) as fileh:
+            gfile = grades.writers.GradesFile(fileh, use_mmap=True)
+        gfile2 = grades.writers.GradesFile(self.fname)
+        assert_equal(gfile.table, gfile2.table)
+        gfile.table.compute_cumul()
+        gfile.table.compute_grouped_mean('Group')
+        gfile.table_format = 'org'
+        self.check_output(self.output_str, gfile, div_on=('Group',))
+        assert_equal(bytes(gfile.header).decode(),
+                     self.file_str[:self.file_str.index('| Nom')])
+
+    def test_mmap_pickle(self):
+        """A memory-mapped GradesFile can be pickled."""
+        with open(self.fname) as fileh:
+            gfile = grades.writers.GradesFile(fileh, use_mmap=True)
+        gfile = pickle.loads(pickle.dumps(gfile))
+        gfile.table_format = 'org'
+        mystdout = io.StringIO()
+        gfile.print_file(file=mystdout)
+        assert_true(mystdout.getvalue().startswith(
+            self.file_str[:self.file_str.index('| Nom')]))
+        assert_true(mystdout.getvalue().endswith(
+            self.file_str[self.file_str.index('\nWhat precedes'):]))
+
     def test_simple_rst_format(self):
         gfile = grades.writers.GradesFile(self.fname)
         gfile.table.compute_cumul()
@@ -11,7 +11,7 @@ __license__ = "BSD"
 
 
 from collections import defaultdict
-from nose.tools import assert_equal, assert_not_equal, assert_almost_equal, assert_raises
+from nose.tools import assert_equal, assert_not_equal, assert_almost_equal, assert_raises, assert_true
 import grades
 
 
@@ -146,6 +146,56 @@ class TestGrablesTable(object):
         assert_equal(gtable.students, gtable2.students)
         assert_equal(gtable.columns, gtable2.columns)
 
+    def test_copy_is_independent(self):
+        """Modifying the students or the columns of a copy directly does not
+        modify the original table."""
+        gtable = self.tparser.parse(self.in_str.split('\n'))
+        gtable2 = grades.gradestable.GradesTable(gtable)
+        gtable2.students[1]['Test 1'] = 1.
+        gtable2.columns[2]['evalu']['weight'] = 99.
+        assert_equal(gtable.students[1]['Test 1'], 67.)
+        assert_equal(gtable.columns[2]['evalu']['weight'], 10.)
+
+    def test_copy_on_write(self):
+        """Slices and selections share the students until they are
+        modified."""
+        gtable = self.tparser.parse(self.in_str.split('\n'))
+        students = [student.copy() for student in gtable.students]
+        columns = [column.copy() for column in gtable.columns]
+        gtable2 = grades.gradestable.GradesTable(gtable)
+        subtable = gtable[2:5]
+        stable = gtable.select('Group = 302')
+        for table in (subtable, stable):
+            assert_true(table.columns is gtable.columns)
+            assert_true(table.students[0] in gtable.students)
+        subtable.compute_cumul()
+        stable.set_value(0, 'Test 1', 70.)
+        gtable2.compute_cumul()
+        gtable.compute_assignment_mean()
+        assert_equal(subtable.students[0]['*Cumul*'], 78.)
+        assert_equal(stable.students[0]['Test 1'], 70.)
+        assert_true('*Cumul*' in gtable2.students[0])
+        assert_equal(gtable[:1].columns[-1]['title'], '*Assignments*')
+        for table in (gtable2, subtable, stable):
+            assert_true(table.columns is not gtable.columns)
+        assert_equal([column['title'] for column in gtable.columns],
+                     [column['title'] for column in columns] +
+                     ['*Assignments*'])
+        for student, original in zip(gtable.students, students):
+            del student['*Assignments*']
+            assert_equal(student, original)
+
+    def test_own(self):
+        """A view that owns its columns and students can be modified
+        directly without modifying the original table."""
+        gtable = self.tparser.parse(self.in_str.split('\n'))
+        for view in (gtable[:3], gtable.select('Group = 301')):
+            view.own()
+            view.students[1]['Test 1'] = 1.
+            view.columns[2]['evalu']['weight'] = 99.
+            assert_equal(gtable.students[1]['Test 1'], 67.)
+            assert_equal(gtable.columns[2]['evalu']['weight'], 10.)
+
     def test_add_tables(self):
         """Add two tables."""
         gtable1 = self.tparser.parse(self.in_str.split('\n')[:7])
@@ -155,6 +205,28 @@ class TestGrablesTable(object):
         sumtable = gtable1 + gtable2
         assert_equal(gtable, sumtable)
 
+    def test_add_tables_in_place(self):
+        gtable1 = self.tparser.parse(self.in_str.split('\n')[:7])
+        gtable2 = self.tparser.parse(self.in_str.split('\n')[:4]
+                                            + self.in_str.split('\n')[7:])
+        gtable = self.tparser.parse(self.in_str.split('\n'))
+        table = gtable1
+        gtable1 += gtable2
+        assert_true(gtable1 is table)
+        assert_equal(gtable, gtable1)
+        assert_equal(gtable1.mask('Test 2'), gtable.mask('Test 2'))
+        assert_equal(gtable1.sentinels['Test 2'], gtable.sentinels['Test 2'])
+
+    def test_extend(self):
+        """Extending a table does not copy the students."""
+        gtable = self.tparser.parse(self.in_str.split('\n'))
+        etable = grades.gradestable.GradesTable()
+        etable.columns = gtable.columns
+        etable.extend(gtable.students[:3])
+        etable.extend(gtable[3:])
+        assert_equal(etable.students, gtable.students)
+        assert_true(etable.students[4] is gtable.students[4])
+
     def test_add_tables_with_different_headers(self):
         """Add two tables with different headers."""
         gtable1 = self.tparser.parse(self.in_str.split('\n')[:7])
@@ -264,3 +336,41 @@ class TestGrablesTable(object):
         for i, student in enumerate(students):
             for key in student:
                 assert_almost_equal(student[key], gtable.students[i][key])
+
+    def test_grouped_mean_several_keys(self):
+        """Means for several group_by columns are computed in one call."""
+        self.tparser.ignore_char = '/'
+        gtable = self.tparser.parse(self.in_str.split('\n'))
+        gtable2 = self.tparser.parse(self.in_str.split('\n'))
+        gtable.compute_grouped_mean(['Group', 'Test 1'])
+        gtable2.compute_grouped_mean('Group')
+        gtable2.compute_grouped_mean('Test 1')
+        assert_equal(gtable.footers, gtable2.footers)
+        assert_equal(gtable.footers[0]['Name'], '/Mean 301/')
+        assert_equal(gtable.footers[2]['Name'], '/Mean 23.0/')
+
+    def test_mask_rebuilt(self):
+        """Masks are rebuilt when the students change."""
+        gtable = self.tparser.parse(self.in_str.split('\n')[:7])
+        assert_equal(gtable.mask('Test 2'), bytearray(b'\x01\x01\x00'))
+        gtable.students.append(defaultdict(str, (('Test 2', 12.),)))
+        assert_equal(gtable.mask('Test 2'), bytearray(b'\x01\x01\x00\x01'))
+        assert_equal(gtable.sentinels['Test 2'], {2: 'ABS'})
+
+    def test_mask_rebuilt_after_edit(self):
+        """Masks are rebuilt when an entry is edited and changed is
+        called."""
+        gtable = self.tparser.parse(self.in_str.split('\n')[:7])
+        gtable.compute_mean()
+        assert_equal(gtable.footers[-1]['Test 1'], 45.)
+        gtable.students[0]['Test 1'] = 'ABS'
+        gtable.changed()
+        gtable.compute_mean()
+        assert_equal(gtable.footers[-1]['Test 1'], 67.)
+        gtable.compute_cumul()
+        assert_equal(gtable.sentinels['Test 1'][0], 'ABS')
+        gtable.students[0]['Test 1'] = 70.
+        gtable.changed()
+        gtable.compute_mean()
+        assert_equal(gtable.footers[-1]['Test 1'], 68.5)
+        assert_equal(gtable.mask('Test 1'), bytearray(b'\x01\x01\x00'))
@@ -11,7 +11,7 @@ __license__ = "BSD"
 
 
 from nose.tools import assert_equal, assert_raises
-from grades import parsers
+from grades import parsers, query
 
 
 class TestParser:
@@ -86,3 +86,98 @@ class TestParser:
         tparser = parsers.TableParser()
         assert_raises(parsers.TableMarkupError, tparser.parse,
                       self.too_short_header)
+
+    def test_masks(self):
+        """The parser records which entries of numerical columns are
+        numbers."""
+        tparser = parsers.TableParser()
+        table = tparser.parse(self.org_table.strip().split('\n'))
+        assert_equal(table.masks, {'Test 1': bytearray(b'\x01\x01\x00'),
+                                   'Test 2': bytearray(b'\x01\x01\x00'),
+                                   'Midterm': bytearray(b'\x00\x01\x01')})
+        assert_equal(table.sentinels, {'Test 1': {2: ''}, 'Test 2': {2: 'ABS'},
+                                       'Midterm': {0: ''}})
+
+    def test_converter_counts(self):
+        """The converter reports how each numerical entry was converted."""
+        tparser = parsers.TableParser()
+        tparser.parse(self.org_table.strip().split('\n'))
+        assert_equal(tparser.converter.counts,
+                     {'number': 6, 'sentinel': 3, 'text': 0})
+
+    def test_converter(self):
+        converter = parsers.NumberConverter()
+        values, mask = converter.convert_all(['12', 'abs', 'Exc', 'Oops',
+                                              '', '3.5'])
+        assert_equal(values, [12., 'abs', 'Exc', 'Oops', '', 3.5])
+        assert_equal(mask, bytearray(b'\x01\x00\x00\x00\x00\x01'))
+        assert_equal(converter.counts, {'number': 2, 'sentinel': 3, 'text': 1})
+        assert_equal(converter.convert('ABS'), ('ABS', False))
+        assert_equal(converter.convert('70'), (70., True))
+
+    def test_parallel(self):
+        """Parsing in chunks with a process pool gives the same table as
+        parsing in a single process."""
+        rows = self.org_table.strip().split('\n')
+        rows += rows[4:] * 20
+        table = parsers.TableParser().parse(rows)
+        tparser = parsers.TableParser(parallel_threshold=10)
+        ptable = tparser.parse(rows, processes=2)
+        assert_equal(ptable.students, table.students)
+        assert_equal(ptable.masks, table.masks)
+        assert_equal(ptable.sentinels, table.sentinels)
+        assert_equal(tparser.converter.counts,
+                     {'number': 126, 'sentinel': 63, 'text': 0})
+
+    def test_pipe_layout(self):
+        """Splitting a block of rows gives the same cells as splitting the
+        rows one by one, even when some rows have extra cells."""
+        layout = parsers.PipeLayout()
+        layout.compile([['Name', 'Test 1']])
+        rows = ['| Bob  |  23.00 |', '|Suzanne|67|', '| Albert | | ABS |']
+        assert_equal([list(cells) for cells in layout.split_all(rows)],
+                     [layout.split(row) for row in rows])
+        assert_equal([list(cells) for cells in layout.split_all(rows[:2])],
+                     [['Bob', '23.00'], ['Suzanne', '67']])
+
+    def test_fixed_width_layout(self):
+        layout = parsers.FixedWidthLayout([(0, 6), (7, None)])
+        rows = ['Bob    23.00', ' Alan', '']
+        assert_equal([list(cells) for cells in layout.split_all(rows)],
+                     [['Bob', '23.00'], ['Alan', ''], ['', '']])
+        assert_equal(layout.split(rows[0]), ['Bob', '23.00'])
+
+    def test_projection(self):
+        """Only the needed columns are parsed."""
+        rows = self.org_table.strip().split('\n')
+        tparser = parsers.TableParser()
+        table = tparser.parse(rows, columns=parsers.Projection(['Name',
+                                                                'Midterm']))
+        assert_equal(table.columns, [self.columns[0], self.columns[4]])
+        assert_equal(table.students,
+                     [{'Name': student['Name'], 'Midterm': student['Midterm']}
+                      for student in self.students])
+        assert_equal(table.masks, {'Midterm': bytearray(b'\x00\x01\x01')})
+        assert_equal(tparser.converter.counts,
+                     {'number': 2, 'sentinel': 1, 'text': 0})
+        table = tparser.parse(rows, columns=parsers.Projection(
+                ['Group'], evaluations=True))
+        assert_equal(table.columns, self.columns)
+        table = tparser.parse(rows, columns=parsers.Projection(['Midterm']))
+        assert_equal(table.columns, [self.columns[0], self.columns[4]])
+        table.compute_mean()
+        assert_equal(table.footers[0]['Name'], '*Mean*')
+        assert_equal(table.footers[0]['Midterm'], 79.)
+
+    def test_where(self):
+        """Selecting students while parsing gives the same students as
+        selecting them after parsing."""
+        rows = self.org_table.strip().split('\n')
+        for expression in ('Group=302', 'Test 2 >= 50', 'Midterm<80'):
+            where = query.Query(expression)
+            table = parsers.TableParser().parse(rows, where=where)
+            selected = parsers.TableParser().parse(rows).select(expression)
+            assert_equal(table.students, selected.students)
+            assert_equal(table.mask('Midterm'), selected.mask('Midterm'))
+        assert_raises(KeyError, parsers.TableParser().parse, rows,
+                      where=query.Query('Spam=1'))
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+Test the select expressions.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from collections import defaultdict
+from nose.tools import assert_equal, assert_raises, assert_true
+import grades
+from grades.query import Query, QueryError
+
+
+class TestQuery(object):
+    in_str = """\
+| Name              | Group | Test 1 | Test 2 | Midterm |
+|                   |       |  70.00 | 100.00 |  100.00 |
+|                   |       |  10.00 |  10.00 |   30.00 |
+|-------------------+-------+--------+--------+---------|
+| Bob Arthur        | 301   |  23.00 |  45.00 |         |
+| Suzanne Tremblay  | 301   |  67.00 |  78.00 |   80.00 |
+| Albert Prévert    | 301   |        | ABS    |   78.00 |
+| André Arthur      | 301   |  75.00 |  91.00 |   65.00 |
+| Roger Gagnon      | 302   |  67.00 |  78.00 |   80.00 |
+| Eleonor Brochu    | 302   |  67.00 |  78.00 |    0.00 |
+| Capitaine Haddock | 302   |   4.00 |  84.00 |   99.00 |"""
+
+    def setUp(self):
+        tparser = grades.parsers.TableParser()
+        self.table = tparser.parse(self.in_str.split('\n'))
+
+    def check_select(self, expression, indices):
+        stable = self.table.select(expression)
+        assert_equal(stable.students,
+                     [self.table.students[i] for i in indices])
+
+    def test_numerical(self):
+        """Numerical columns are compared as numbers."""
+        self.check_select('Test 1 < 50', [0, 6])
+        self.check_select('Midterm <= 65', [3, 5])
+        self.check_select('Test 2=78', [1, 4, 5])
+
+    def test_text(self):
+        self.check_select('Name = Bob Arthur', [0])
+        self.check_select('Name < C', [0, 2, 3])
+        self.check_select('Test 2 = ABS', [2])
+        self.check_select('Test 2 != ABS', [0, 1, 3, 4, 5, 6])
+
+    def test_boolean(self):
+        self.check_select('Group = 302 and Midterm > 50', [4, 6])
+        # not is the complement: blank entries satisfy it.
+        self.check_select('Group = 301 and not (Test 1 > 60 or Test 1 < 30)',
+                          [2])
+        self.check_select('Test 1 < 10 or Test 2 > 90', [3, 6])
+        self.check_select('not Group = 301', [4, 5, 6])
+
+    def test_in(self):
+        self.check_select('Group in (302)', [4, 5, 6])
+        self.check_select('Test 1 in (67, 4)', [1, 4, 5, 6])
+        self.check_select('Test 1 not in (67, 4)', [0, 2, 3])
+        self.check_select('Test 2 in (ABS, 45)', [0, 2])
+        self.check_select('Test 2 not in (ABS, 45)', [1, 3, 4, 5, 6])
+
+    def test_names(self):
+        self.check_select('"Roger Gagnon", \'André Arthur\'', [3, 4])
+
+    def test_indices_and_slices(self):
+        self.check_select('3, 5, -1', [3, 5, 6])
+        self.check_select('4:6,1:2', [1, 4, 5])
+        self.check_select('::3 and Group=301', [0, 3])
+
+    def test_quoted_title(self):
+        self.check_select('"Test 1" >= 75', [3])
+
+    def test_invalid(self):
+        for expression in ('Test / 2', '', 'Group =', '(Group = 301',
+                           'Group in 301', 'Group = 301 and'):
+            assert_raises(QueryError, Query, expression)
+        assert_raises(KeyError, self.table.select, 'Spam = 1')
+
+    def test_attributes(self):
+        query = Query('"Bob" or Group = 301 and Test 1 in (1, 2)')
+        assert_equal(query.columns, frozenset(['Group', 'Test 1']))
+        assert_true(query.names)
+        assert_true(not query.positional)
+        assert_true(Query('2:4').positional)
+        assert_raises(QueryError, Query('2:4').compile, self.table.columns)
+
+    def test_sorted_index(self):
+        """Selecting with sorted indexes gives the same students as
+        scanning the table."""
+        expressions = ('Test 1 < 50', 'Test 1 >= 67', 'Midterm = 80',
+                       'Test 2 > 78 and Midterm <= 80', 'Test 1 in (4, 75)',
+                       'Test 1 > 60 or 1:3', 'Test 2 != 78', '2:5')
+        selections = [self.table.select(expression).students
+                      for expression in expressions]
+        for title in ('Test 1', 'Test 2', 'Midterm'):
+            self.table.create_index(title)
+        for expression, students in zip(expressions, selections):
+            assert_equal(self.table.select(expression).students, students)
+        assert_equal(len(self.table.sorted_index('Test 1')), 6)
+        assert_raises(KeyError, self.table.create_index, 'Spam')
+
+    def test_sorted_index_text_column(self):
+        """Sorted indexes are only used on numerical columns."""
+        selections = [self.table.select(expression).students
+                      for expression in ('Group = 302', 'Group in (301, 302)')]
+        assert_raises(ValueError, self.table.create_index, 'Group')
+        self.table.indexes['Group'] = None
+        assert_true(self.table.sorted_index('Group') is None)
+        assert_equal(self.table.select('Group = 302').students, selections[0])
+        assert_equal(self.table.select('Group in (301, 302)').students,
+                     selections[1])
+
+    def test_sorted_index_rebuilt(self):
+        """The index is rebuilt after the students change."""
+        self.table.create_index('Midterm')
+        index = self.table.sorted_index('Midterm')
+        assert_true(self.table.sorted_index('Midterm') is index)
+        self.table.students[0]['Midterm'] = 50.
+        self.table.masks['Midterm'][0] = 1
+        self.table.changed()
+        self.check_select('Midterm < 60', [0, 5])
+        self.table.compute_cumul()
+        self.table.create_index('*Cumul*')
+        self.check_select('*Cumul* > 80', [1, 4])
+
+    def test_hash_index(self):
+        """Equality selections and lookups use the hash index, which is kept
+        up to date through appends and changes."""
+        expressions = ('Group = 302', 'Name = André Arthur',
+                       'Group in (301, 303) and Test 1 > 50', 'Group < 302')
+        selections = [self.table.select(expression).students
+                      for expression in expressions]
+        self.table.create_hash_index('Group')
+        self.table.create_hash_index('Name')
+        for expression, students in zip(expressions, selections):
+            assert_equal(self.table.select(expression).students, students)
+        assert_equal(self.table.hash_index('Group').lookup('=', '302'),
+                     [4, 5, 6])
+        student = defaultdict(str, {'Name': 'Alicia Keys', 'Group': '302',
+                                    'Test 1': 82., 'Test 2': 'ABS',
+                                    'Midterm': 73.})
+        index = self.table.hash_index('Group')
+        self.table.append(student)
+        self.table.set_value(0, 'Group', '302')
+        self.table.set_value(0, 'Midterm', 50.)
+        assert_true(self.table.hash_index('Group') is index)
+        assert_equal(index.lookup('=', '302'), [0, 4, 5, 6, 7])
+        assert_equal(self.table.lookup('Name', 'Alicia Keys'), [student])
+        assert_equal(self.table.mask('Test 2'),
+                     bytearray(b'\x01\x01\x00\x01\x01\x01\x01\x00'))
+        assert_equal(self.table.sentinels['Test 2'], {2: 'ABS', 7: 'ABS'})
+        assert_equal(self.table.mask('Midterm')[0], 1)
+        self.check_select('Group = 302 and Midterm < 60', [0, 5])
+        assert_raises(ValueError, self.table.create_hash_index, 'Midterm')
+
+    def test_hash_index_rebuilt(self):
+        """Changes made directly to the students rebuild the index."""
+        self.table.create_hash_index('Name')
+        self.table.students.append(defaultdict(str, {'Name': 'Bob Arthur'}))
+        assert_equal(self.table.lookup('Name', 'Bob Arthur'),
+                     [self.table.students[0], self.table.students[7]])
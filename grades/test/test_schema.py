@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+Test the description of the columns of a table.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from copy import deepcopy
+import pickle
+from nose.tools import assert_equal, assert_raises, assert_true
+import grades
+from grades.schema import Column, Schema
+
+
+class TestSchema(object):
+    in_str = """\
+| Name          | Group | Test 1 | Devoir 1 | Supp 1 |
+|               |       |  20.00 |    10.00 | 100.00 |
+|               |       |  10.00 |     5.00 |   0.00 |
+|---------------+-------+--------+----------+--------|
+| Bob Arthur    | 301   |  12.00 |     7.00 |  65.00 |"""
+
+    def setUp(self):
+        tparser = grades.parsers.TableParser()
+        self.table = tparser.parse(self.in_str.split('\n'))
+        self.schema = self.table.columns
+
+    def test_columns(self):
+        assert_true(isinstance(self.schema, Schema))
+        assert_equal(self.schema[2], {'title': 'Test 1', 'is_num': True,
+                                      'evalu': {'max_grade': 20.,
+                                                'weight': 10.},
+                                      'width': 0})
+        assert_equal(self.schema[0]['title'], 'Name')
+        assert_equal(self.schema[3].evalu['weight'], 5.)
+        assert_raises(KeyError, self.schema[0].__getitem__, 'spam')
+
+    def test_titles(self):
+        assert_equal(self.schema.titles,
+                     ['Name', 'Group', 'Test 1', 'Devoir 1', 'Supp 1'])
+        assert_equal(self.schema.position('Devoir 1'), 3)
+        assert_true(self.schema.column('Group') is self.schema[1])
+        assert_true(self.schema.has_title('Supp 1'))
+        assert_true(not self.schema.has_title('Spam'))
+        assert_raises(KeyError, self.schema.position, 'Spam')
+
+    def test_roles(self):
+        assert_equal([column.role for column in self.schema],
+                     [None, None, 'evaluation', 'assignment',
+                      'supplemental'])
+        assert_equal(self.schema.supplemental['title'], 'Supp 1')
+        assert_equal(len(self.schema.evaluations), 3)
+        self.table.compute_cumul()
+        self.table.compute_assignment_mean()
+        assert_equal([column.title for column in
+                      self.schema.with_role('computed')],
+                     ['*Cumul*', '*Adjustment*', '*Cumul with supp*',
+                      '*Assignments*'])
+
+    def test_list(self):
+        """The maps follow the changes made to the schema."""
+        schema = self.schema
+        schema.insert(1, {'title': 'Email', 'is_num': False, 'evalu': None,
+                          'width': 0})
+        assert_true(isinstance(schema[1], Column))
+        assert_equal(schema.position('Group'), 2)
+        schema.remove(schema.column('Test 1'))
+        assert_true(not schema.has_title('Test 1'))
+        schema.append({'title': 'Final', 'is_num': True,
+                       'evalu': {'max_grade': 100., 'weight': 50.}})
+        assert_equal(schema.position('Final'), 5)
+        assert_equal(schema[-1]['width'], 0)
+        assert_equal([column.title for column in schema.evaluations],
+                     ['Devoir 1', 'Supp 1', 'Final'])
+        del schema[:2]
+        assert_equal(schema.position('Group'), 0)
+        assert_true(isinstance(schema[1:], Schema))
+
+    def test_copy(self):
+        for schema in (deepcopy(self.schema),
+                       pickle.loads(pickle.dumps(self.schema))):
+            assert_true(isinstance(schema, Schema))
+            assert_equal(schema, self.schema)
+            assert_equal(schema.position('Supp 1'), 4)
+            assert_equal(schema[4].role, 'supplemental')
+            schema[2]['evalu']['weight'] = 1.
+            assert_equal(self.schema[2]['evalu']['weight'], 10.)
+
+    def test_assign_list(self):
+        """A list of dictionaries assigned to a table becomes a Schema."""
+        table = grades.gradestable.GradesTable()
+        table.columns = grades.defaults.COLUMNS
+        assert_true(isinstance(table.columns, Schema))
+        assert_equal(table.columns, grades.defaults.COLUMNS)
+        assert_equal(table.columns.position('Final'), 9)
@@ -0,0 +1,138 @@
+#-*- coding: utf-8 -*-
+"""test_streaming
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from nose.tools import assert_equal, assert_raises, assert_true
+import os
+try:
+    import StringIO as io
+except ImportError:
+    import io  # For Python 3
+import tempfile
+import grades
+from grades.streaming import StreamingFile, can_stream
+
+
+class TestStreamingFile(object):
+    file_str = """* Grades for a fictive class
+Some text before the table.
+
+| Nom              | Group | Test 1 | Test 2 | Midterm | Devoir 1 |
+|                  |       |  70.00 | 100.00 |  100.00 |    10.00 |
+|                  |       |  10.00 |  10.00 |   30.00 |     5.00 |
+|------------------+-------+--------+--------+---------+----------|
+| Bob Arthur       | 301   |  23.00 |  45.00 |         |     8.00 |
+|------------------+-------+--------+--------+---------+----------|
+| Suzanne Tremblay | 302   |  67.00 |  78.00 |   80.00 |     9.50 |
+| Albert Prévert   | 302   |        | ABS    |   78.00 |          |
+| André Arthur     | 301   |  75.00 |  91.00 |   65.00 |     7.00 |
+| Roger Gagnon     | 302   |  67.00 |  78.00 |   80.00 |     6.00 |
+| Capitaine Haddock| 302   |  34.00 |  84.00 |   99.00 |    10.00 |
+| Eleonor Brochu   | 303   |  67.00 |  78.00 |   80.00 |     8.50 |
+|------------------+-------+--------+--------+---------+----------|
+| *Mean*           |       |  45.00 |  61.50 |   79.00 |          |
+
+Some text after the table.
+"""
+
+    def setUp(self):
+        self.fd, self.fname = tempfile.mkstemp()
+        of = open(self.fname, 'w')
+        of.write(self.file_str)
+        of.close()
+
+    def teardown(self):
+        os.close(self.fd)
+        os.unlink(self.fname)
+
+    def check(self, chunk_size=2, table_format='org', div_on=None,
+              columns=None, tableonly=False, **options):
+        """Printing the file in chunks gives the same output as printing
+        the parsed file."""
+        gfile = grades.writers.GradesFile(self.fname,
+                                          where=options.get('where'))
+        gfile.table_format = table_format
+        table = gfile.table
+        if options.get('cumul'):
+            table.compute_cumul()
+        if options.get('assignments'):
+            table.compute_assignment_mean()
+        if options.get('select'):
+            table = gfile.table = table.select(options['select'])
+        if options.get('mean'):
+            table.compute_mean()
+        if options.get('group_by'):
+            table.compute_grouped_mean(options['group_by'])
+        expected = io.StringIO()
+        gfile.print_file(div_on=div_on, columns=columns, tableonly=tableonly,
+                         file=expected)
+
+        sfile = StreamingFile(self.fname, chunk_size=chunk_size, **options)
+        sfile.table_format = table_format
+        output = io.StringIO()
+        sfile.print_file(div_on=div_on, columns=columns, tableonly=tableonly,
+                         file=output, buffer_size=10)
+        assert_equal(output.getvalue(), expected.getvalue())
+
+    def test_print(self):
+        for chunk_size in (1, 2, 3, 100):
+            for table_format in ('org', 'simple_rst', 'grid_rst'):
+                self.check(chunk_size, table_format)
+                self.check(chunk_size, table_format, div_on=('Group',),
+                           cumul=True, mean=True, group_by='Group')
+
+    def test_options(self):
+        self.check(tableonly=True, assignments=True, cumul=True)
+        self.check(columns=['Nom', 'Test 2', '*Cumul*'], cumul=True,
+                   mean=True)
+        self.check(select=grades.query.Query('*Cumul* > 70'), cumul=True,
+                   mean=True, group_by=['Group'])
+        self.check(where=grades.query.Query('Group = 302'), mean=True,
+                   group_by='Group', div_on=('Group',))
+        self.check(where=grades.query.Query('Group = 304'), mean=True)
+
+    def test_memory(self):
+        """Only one chunk of students is parsed at a time."""
+        sfile = StreamingFile(self.fname, chunk_size=3)
+        fileh, header, line = sfile._open()
+        sizes = [len(table.students) for table in sfile._chunks(fileh, line)]
+        fileh.close()
+        assert_equal(header, ['* Grades for a fictive class',
+                              'Some text before the table.', ''])
+        assert_equal(sizes, [3, 3, 1])
+
+    def test_errors(self):
+        sfile = StreamingFile(self.fname, group_by='Spam')
+        assert_raises(ValueError, sfile.print_file, file=io.StringIO())
+        of = open(self.fname, 'w')
+        of.write('| Nom | Group |\n\nSome text.\n')
+        of.close()
+        assert_raises(Exception, StreamingFile(self.fname).print_file,
+                      file=io.StringIO())
+
+    def test_can_stream(self):
+        assert_true(can_stream('Grades.rst'))
+        assert_true(can_stream('Grades.rst',
+                               grades.query.Query('Test 1 < 50')))
+        assert_true(not can_stream('Grades.rst.asc'))
+
+    def test_rounding(self):
+        """The means are rounded as those of the parsed file. In the example
+        file, the cumulative grade of group 301 is 69.57499999999999 when
+        summed in order and 69.575 when summed exactly."""
+        example = os.path.join(os.path.dirname(__file__), '..', '..',
+                               'examples', 'Grades.rst')
+        of = open(self.fname, 'w')
+        of.write(open(example).read())
+        of.close()
+        for chunk_size in (1, 2, 3, 100):
+            self.check(chunk_size, cumul=True, mean=True, group_by='Group')
+        totals, widths = StreamingFile(self.fname, chunk_size=2, cumul=True,
+                                       group_by='Group').scan()
+        assert_equal(totals.footers[0]['*Cumul*'], 69.57499999999999)
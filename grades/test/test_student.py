@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+#-*- coding: utf-8 -*-
+"""
+Test the Student record type.
+
+"""
+
+
+__author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
+__license__ = "BSD"
+
+
+from copy import copy, deepcopy
+import pickle
+from nose.tools import assert_equal, assert_raises, assert_true
+from grades.student import Student, UNSET
+
+
+class TestStudent(object):
+    def setUp(self):
+        self.layout = {'Name': 0, 'Group': 1, 'Midterm': 2}
+        self.student = Student(self.layout, ['Bob Arthur', UNSET, 78.])
+
+    def test_mapping(self):
+        student = self.student
+        assert_equal(student['Name'], 'Bob Arthur')
+        assert_equal(student['Group'], '')
+        assert_equal(student['Spam'], '')
+        assert_equal(student.get('Group'), None)
+        assert_true('Midterm' in student)
+        assert_true('Group' not in student)
+        assert_equal(list(student), ['Name', 'Midterm'])
+        assert_equal(len(student), 2)
+        assert_equal(student, {'Name': 'Bob Arthur', 'Midterm': 78.})
+        assert_equal({'Name': 'Bob Arthur', 'Midterm': 78.}, student)
+
+    def test_set_and_delete(self):
+        student = self.student
+        other = Student(self.layout, ['Suzanne Tremblay'])
+        student['*Cumul*'] = 80.
+        student['Group'] = '301'
+        assert_equal(self.layout['*Cumul*'], 3)
+        assert_equal(student, {'Name': 'Bob Arthur', 'Group': '301',
+                               'Midterm': 78., '*Cumul*': 80.})
+        assert_equal(other, {'Name': 'Suzanne Tremblay'})
+        del student['Midterm']
+        assert_true('Midterm' not in student)
+        assert_raises(KeyError, student.__delitem__, 'Midterm')
+
+    def test_copy(self):
+        for duplicate in (copy(self.student), self.student.copy(),
+                          deepcopy(self.student),
+                          pickle.loads(pickle.dumps(self.student, 2))):
+            assert_equal(duplicate, self.student)
+            duplicate['Name'] = 'Bob Arthus'
+            assert_equal(self.student['Name'], 'Bob Arthur')
+            assert_true(duplicate.get('Group') is None)
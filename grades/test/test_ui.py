@@ -17,6 +17,7 @@ except ImportError:
     except ImportError:
         import io  # For Python 3
 import os
+import shutil
 import sys
 import uuid
 import tempfile
@@ -54,12 +55,14 @@ pencil case.
         of.close()
         self.old_stream = sys.stdout
         sys.stdout = self.mystdout = io.StringIO()
-        self.runner = ui.Runner()
+        self.cache_dir = tempfile.mkdtemp()
+        self.runner = ui.Runner(cache_dir=self.cache_dir)
 
     def teardown(self):
         os.close(self.fd)
         os.unlink(self.fname)
         sys.stdout = self.old_stream
+        shutil.rmtree(self.cache_dir)
 
     out_str1 = """\
 | Nom               | Group | Test 1 | *Cumul* |
@@ -178,6 +181,24 @@ pencil case.
         out_str = '\n'.join(in_rows[:12] + in_rows[13:])
         self.check_output(['print', self.fname, '-f', 'org'], out_str)
 
+    def test_print_cache_dir(self):
+        """Parsed files are cached in the directory given to the Runner."""
+        self.runner.run(['print', self.fname, '-f', 'org'])
+        assert_equal(len(os.listdir(self.cache_dir)), 1)
+        self.runner.run(['print', '--no-cache', self.fname, '-f', 'org'])
+        assert_equal(len(os.listdir(self.cache_dir)), 1)
+
+    def test_print_projection_mean(self):
+        """The mean footer of a column is printed even if the first column
+        is not printed."""
+        for stream in ([], ['--stream']):
+            self.mystdout.truncate(0)
+            self.mystdout.seek(0)
+            self.runner.run(['print', '-tmC', 'Midterm', '-f', 'org',
+                             self.fname] + stream)
+            assert_equal(self.mystdout.getvalue().strip().split('\n')[-1],
+                         '|   77.62 |')
+
     def test_print_all_opts(self):
         argv = ['print', '-mctd', 'Group', '-g', 'Group', '-C',
                 'Nom,Group,Test 1', self.fname, '-f', 'org']
@@ -227,10 +248,12 @@ pencil case.
 class TestUIInit:
     def setUp(self):
         self.fname = str(uuid.uuid1())
-        self.runner = ui.Runner()
+        self.cache_dir = tempfile.mkdtemp()
+        self.runner = ui.Runner(cache_dir=self.cache_dir)
 
     def teardown(self):
         os.unlink(self.fname)
+        shutil.rmtree(self.cache_dir)
 
     def check_output(self, argv, output_str):
         self.runner.run(argv)
@@ -326,12 +349,14 @@ class TestUIAdd:
         of.close()
         self.old_stream = sys.stdout
         sys.stdout = self.mystdout = io.StringIO()
-        self.runner = ui.Runner()
+        self.cache_dir = tempfile.mkdtemp()
+        self.runner = ui.Runner(cache_dir=self.cache_dir)
 
     def teardown(self):
         os.close(self.fd)
         os.unlink(self.fname)
         sys.stdout = self.old_stream
+        shutil.rmtree(self.cache_dir)
 
     def check_output(self, argv, output_str, specs):
         sys.stdin = io.StringIO('\n'.join(specs))
@@ -10,7 +10,8 @@ __author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
 __license__ = "BSD"
 
 
-from nose.tools import assert_equal
+import errno
+from nose.tools import assert_equal, assert_raises, assert_true
 try:
     import cStringIO as io
 except ImportError:
@@ -217,3 +218,104 @@ class TestTableWriter:
 +------------------+-------+--------+--------+---------+---------+
 """
         assert_equal(mystdout.getvalue(), table_str)
+
+    def test_streaming(self):
+        """The table is written in several buffered writes, with the same
+        result as the string representation."""
+        writes = []
+
+        class Output:
+            def write(self, text):
+                writes.append(text)
+
+        self.gtable.compute_grouped_mean('Group')
+        for writer_class in (grades.writers.TableWriter,
+                             grades.writers.SimpleRSTWriter,
+                             grades.writers.GridRSTWriter):
+            del writes[:]
+            writer = writer_class(self.gtable)
+            writer.write(file=Output(), div_on=('Group',), buffer_size=100)
+            assert_true(len(writes) > 5)
+            assert_true(all(len(text) < 200 for text in writes))
+            assert_equal(''.join(writes), writer.__str__(div_on=('Group',)))
+
+    def test_broken_pipe(self):
+        """No more rows are produced once the reader went away."""
+        class Output:
+            def write(self, text):
+                raise IOError(errno.EPIPE, 'Broken pipe')
+
+        rows = []
+        writer = grades.writers.TableWriter(self.gtable)
+        row_str = writer._row_str
+        writer._row_str = lambda row: rows.append(row) or row_str(row)
+        assert_raises(IOError, writer.write, file=Output(), buffer_size=1)
+        assert_equal(len(rows), 1)
+        assert_raises(ValueError, writer.write, file=Output(),
+                      div_on=('Spam',))
+
+    def test_cells_formatted_once(self):
+        """The cells are formatted once per rendering, when the widths are
+        found, and again only if the table changed."""
+        calls = []
+        writer = grades.writers.TableWriter(self.gtable)
+        format_cells = writer._format_cells
+        writer._format_cells = lambda column, students, footers: (
+                calls.append(column.title) or
+                format_cells(column, students, footers))
+        table_str = str(writer)
+        nb_columns = len(self.gtable.columns)
+        assert_equal(len(calls), nb_columns)
+        assert_equal(writer.header_str() + writer.rows_str() +
+                     writer.footer_str(), table_str)
+        assert_equal(len(calls), nb_columns)
+        self.gtable.changed()
+        writer.rows_str()
+        assert_equal(len(calls), 2 * nb_columns)
+
+    def test_compiled_layout(self):
+        """The rows are rendered with a template compiled for the visible
+        columns."""
+        writers = ((grades.writers.TableWriter,
+                    '| %-17s | %-5s | %6s | %6s | %7s |\n',
+                    '|-------------------+-------+--------+--------+'
+                    '---------|\n'),
+                   (grades.writers.SimpleRSTWriter,
+                    ' %-17s   %-5s   %6s   %6s   %7s \n',
+                    '------------------- ------- -------- -------- '
+                    '---------\n'),
+                   (grades.writers.GridRSTWriter,
+                    '| %-17s | %-5s | %6s | %6s | %7s |\n',
+                    '+-------------------+-------+--------+--------+'
+                    '---------+\n'))
+        for writer_class, template, div_row in writers:
+            writer = writer_class(self.gtable)
+            str(writer)
+            assert_equal(writer._template, template)
+            assert_equal(writer._dividers['row'], div_row)
+        writer = grades.writers.TableWriter(self.gtable)
+        writer.__str__(columns=('Nom', 'Test 2'))
+        assert_equal(writer._template, '| %-17s | %6s |\n')
+        rows = writer.rows_str().splitlines()
+        assert_equal(rows[2], '| Albert Prévert    | ABS    |')
+        assert_equal(rows[8], '| Alicia Keys       | ABS    |')
+
+    def test_parallel(self):
+        """Rendering the rows in parallel gives the same output."""
+        self.gtable.compute_cumul()
+        self.gtable.compute_grouped_mean('Group')
+        for writer_class in (grades.writers.TableWriter,
+                             grades.writers.SimpleRSTWriter,
+                             grades.writers.GridRSTWriter):
+            serial = writer_class(self.gtable)
+            parallel = writer_class(self.gtable, processes=2,
+                                    parallel_threshold=1)
+            for kwargs in ({}, {'div_on': ('Group',)},
+                           {'columns': ('Nom', 'Test 2', '*Cumul*')}):
+                assert_equal(parallel.__str__(**kwargs),
+                             serial.__str__(**kwargs))
+        # Small tables are rendered in the current process.
+        writer = grades.writers.TableWriter(self.gtable, processes=2)
+        writer._parallel_row_lines = None
+        assert_equal(str(writer),
+                     str(grades.writers.TableWriter(self.gtable)))
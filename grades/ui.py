@@ -16,14 +16,20 @@ __license__ = "BSD"
 
 
 import argparse
+import errno
 import os
 import sys
-from collections import defaultdict
 import matplotlib.pyplot as plt
 from . import __version__
+from . import cache
 from . import defaults
+from . import parsers
+from . import query
+from . import streaming
 from . import writers
 from .gradestable import GradesTable
+from .schema import Column
+from .student import Student
 
 try:
     if raw_input:
@@ -59,8 +65,9 @@ def _calc_weights(nbevals):
 class Runner:
     """Set the options and execute the chosen subcommands."""
 
-    def __init__(self):
-        """Define default values."""
+    def __init__(self, cache_dir=defaults.CACHE_DIR):
+        """Define default values. Parsed files are cached in the directory
+        cache_dir."""
         self.input_filenames = defaults.INPUT_FILENAMES
         self.output_filename = defaults.OUTPUT_FILENAME
         self.ignore_char = defaults.IGNORE_CHAR
@@ -70,6 +77,7 @@ class Runner:
         self.padding_right = defaults.PADDING_RIGHT
         self.min_cell_width = defaults.MIN_CELL_WIDTH
         self.columns = defaults.COLUMNS
+        self.cache = cache.ParseCache(cache_dir)
 
     def read_config(self):
         pass
@@ -92,44 +100,125 @@ class Runner:
             self.clparser.print_help()
             return
 
-        gfile = writers.GradesFile(table_file, self.ignore_char)
-        if self.calc_char != self.ignore_char:
-            gfile.table.calc_char = self.calc_char
         if args.columns:
             args.columns = [col.strip() for col in args.columns.split(',')]
         if args.divs:
             args.divs = [div.strip() for div in args.divs.split(',')]
         if args.groups:
             args.groups = [group.strip() for group in args.groups.split(',')]
+        if args.students:
+            args.students = query.Query(args.students)
+        where = None
+        if (args.students and not args.students.positional and
+            not any(title.startswith((self.calc_char, self.ignore_char))
+                    for title in args.students.columns)):
+            # The query does not use computed columns nor positions,
+            # students are selected while parsing.
+            where = args.students
+            args.students = None
+        projection = self._projection(args, where)
+        if args.stream and streaming.can_stream(fname, args.students):
+            table_file.close()
+            gfile = streaming.StreamingFile(fname, self.ignore_char,
+                                            calc_char=self.calc_char,
+                                            columns=projection, where=where,
+                                            select=args.students,
+                                            cumul=args.cumul,
+                                            assignments=args.assignments,
+                                            mean=args.mean,
+                                            group_by=args.groups)
+            self._print_columns(args)
+            if args.table_format:
+                gfile.table_format = args.table_format
+            self._print(gfile, args)
+            return
+        if args.cache:
+            table_file.close()
+            gfile = self.cache.load(fname, self.ignore_char,
+                                    columnar=args.columnar,
+                                    use_mmap=args.mmap,
+                                    processes=args.jobs,
+                                    columns=projection, where=where)
+        else:
+            gfile = writers.GradesFile(table_file, self.ignore_char,
+                                       columnar=args.columnar,
+                                       use_mmap=args.mmap,
+                                       processes=args.jobs,
+                                       columns=projection, where=where)
+        if self.calc_char != self.ignore_char:
+            gfile.table.calc_char = self.calc_char
         if args.cumul:
             gfile.table.compute_cumul()
-            if args.columns:
-                args.columns.append(self.calc_char +
-                                    'Cumul' + self.calc_char)
         if args.assignments:
             gfile.table.compute_assignment_mean()
-            if args.columns:
-                args.columns.append(self.calc_char + 'Assignments' +
-                        self.calc_char)
+        self._print_columns(args)
         if args.students:
             gfile.table = gfile.table.select(args.students)
         if args.mean:
             gfile.table.compute_mean()
         if args.groups:
-            for group in args.groups:
-                gfile.table.compute_grouped_mean(group_by=group)
+            gfile.table.compute_grouped_mean(group_by=args.groups)
         if args.table_format:
             gfile.table_format = args.table_format
+        self._print(gfile, args)
+
+    def _print_columns(self, args):
+        """Add the computed columns to the columns to print, if they are
+        given."""
+        if args.columns:
+            if args.cumul:
+                args.columns.append(self.calc_char +
+                                    'Cumul' + self.calc_char)
+            if args.assignments:
+                args.columns.append(self.calc_char + 'Assignments' +
+                        self.calc_char)
+
+    def _print(self, gfile, args):
+        """Print gfile, a writers.GradesFile or a streaming.StreamingFile,
+        with the options in args."""
         #if args.output:
             #output = arg.output
         #else:
         output = sys.stdout
-        gfile.print_file(div_on=args.divs, columns=args.columns,
-                         tableonly=args.tableonly, file=output,
-                         min_width=self.min_cell_width,
-                         padding_left=self.padding_left,
-                         padding_right=self.padding_right,
-                         precision=self.precision)
+        try:
+            gfile.print_file(div_on=args.divs, columns=args.columns,
+                             tableonly=args.tableonly, file=output,
+                             min_width=self.min_cell_width,
+                             padding_left=self.padding_left,
+                             padding_right=self.padding_right,
+                             precision=self.precision,
+                             processes=args.jobs)
+        except IOError as err:
+            if err.errno != errno.EPIPE:
+                raise
+            # The reader went away, e.g. the output was piped into head.
+            # Nothing more is written and the interpreter must not fail
+            # when it flushes sys.stdout on exit.
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, output.fileno())
+
+    def _projection(self, args, where=None):
+        """Return the parsers.Projection of the columns needed to print the
+        table with the options in args and the query where or None if all
+        the columns are needed."""
+        if not args.columns:
+            return None
+        titles = args.columns + (args.divs or []) + (args.groups or [])
+        # The first column, against which names are matched, is always
+        # kept.
+        for select in (args.students, where):
+            if select:
+                titles.extend(select.columns)
+        return parsers.Projection(titles, evaluations=args.cumul,
+                                  assignments=args.assignments)
+
+    def clear_cache(self, args):
+        """Remove the parsed files stored in the cache. If a file name is
+        given, only the snapshots of this file are removed."""
+        if args.filename:
+            self.cache.invalidate(args.filename)
+        else:
+            self.cache.clear()
 
     def init(self, args):
         """Initialize a file containing a grades table.
@@ -155,27 +244,21 @@ class Runner:
         table = GradesTable(calc_char=self.calc_char)
         table.columns = self.columns
         if args.nbevals:
-            for col in table.columns[:]:
-                if col['evalu']:
-                    table.columns.remove(col)
+            table.columns = [col for col in table.columns if not col.evalu]
 
             final_w, midterm_w, test_w = _calc_weights(args.nbevals)
 
             for i in range((args.nbevals - 1) // 2):
-                table.columns.append(
-                    {'title': 'Test ' + str(i + 1), 'is_num': True, 'width': 0,
-                     'evalu': {'max_grade': 20., 'weight': test_w}})
+                table.columns.append(Column('Test ' + str(i + 1), is_num=True,
+                    evalu={'max_grade': 20., 'weight': test_w}))
             if midterm_w > 0:
-                table.columns.append(
-                    {'title': 'Midterm', 'is_num': True, 'width': 0,
-                     'evalu': {'max_grade': 100., 'weight': midterm_w}})
+                table.columns.append(Column('Midterm', is_num=True,
+                    evalu={'max_grade': 100., 'weight': midterm_w}))
             for i in range((args.nbevals - 1) // 2, args.nbevals - 2):
-                table.columns.append(
-                    {'title': 'Test ' + str(i + 1), 'is_num': True, 'width': 0,
-                     'evalu': {'max_grade': 20., 'weight': test_w}})
-            table.columns.append(
-                {'title': 'Final', 'is_num': True, 'width': 0,
-                 'evalu': {'max_grade': 100., 'weight': final_w}})
+                table.columns.append(Column('Test ' + str(i + 1), is_num=True,
+                    evalu={'max_grade': 20., 'weight': test_w}))
+            table.columns.append(Column('Final', is_num=True,
+                evalu={'max_grade': 100., 'weight': final_w}))
         table_writer = writers.TableWriter
         if args.table_format:
             if args.table_format == 'simple_rst':
@@ -191,7 +274,7 @@ class Runner:
     def add_column(self, args):
         gfile = writers.GradesFile(args.filename, self.ignore_char)
         col_name = input('Enter column name: ')
-        if col_name in [col['title'] for col in gfile.table.columns]:
+        if gfile.table.columns.has_title(col_name):
             print(sys.argv[0] +
                 ' add column: error: column name already in table',
                 file=sys.stderr)
@@ -214,13 +297,10 @@ class Runner:
                     input('What is the maximum grade for this evaluation? '))
             weight = float(
                     input('What is the weight for this evaluation? '))
-            gfile.table.columns.insert(position,
-                {'title': col_name, 'is_num': True, 'width': 0,
-                 'evalu': {'max_grade': max_grade, 'weight': weight}})
+            gfile.table.columns.insert(position, Column(col_name, is_num=True,
+                evalu={'max_grade': max_grade, 'weight': weight}))
         else:
-            gfile.table.columns.insert(position,
-                {'title': col_name, 'is_num': False, 'width': 0,
-                 'evalu': None})
+            gfile.table.columns.insert(position, Column(col_name))
 
         ofile = open(args.filename, 'w')
         if args.table_format:
@@ -242,12 +322,12 @@ class Runner:
         """
         gfile = writers.GradesFile(args.filename, self.ignore_char)
 
-        student = defaultdict(str)
+        student = Student()
         for col in gfile.table.columns:
-            if not col['evalu']:
-                student[col['title']] = input("Enter student's " +
-                                              col['title'] + ': ')
-        gfile.table.students.append(student)
+            if not col.evalu:
+                student[col.title] = input("Enter student's " +
+                                           col.title + ': ')
+        gfile.table.append(student)
 
         ofile = open(args.filename, 'w')
         if args.table_format:
@@ -321,7 +401,22 @@ class Runner:
                 help='print the mean for each GROUP for each evaluation; '
                      + 'GROUP must be a column title')
         printparser.add_argument('-s', '--students',
-                help='expression specifying students to print')
+                help='expression specifying students to print, e.g. '
+                     + '"Group = 301 and Midterm < 60"')
+        printparser.add_argument('--columnar', action='store_true',
+                help='store the table column by column (requires numpy)')
+        printparser.add_argument('--mmap', action='store_true',
+                help='memory-map the file instead of reading it line by line')
+        printparser.add_argument('-j', '--jobs', type=int, default=1,
+                help='number of processes used to parse and print large '
+                     + 'tables; 0 means one per CPU')
+        printparser.add_argument('--stream', action='store_true',
+                help='read the file twice, a chunk of students at a time, so '
+                     + 'that the memory used does not grow with the number of '
+                     + 'students')
+        printparser.add_argument('--no-cache', action='store_false',
+                dest='cache',
+                help='always parse the file instead of using the cache')
         #printparser.add_argument('-o', '--output', type=argparse.FileType('w'),
                 #help='write output in file name')
         printparser.add_argument('filename',
@@ -352,6 +447,12 @@ class Runner:
                 help='grades file to read and parse', nargs='?')
         add_student_parser.set_defaults(func=self.add_student)
         
+        cacheparser = subparsers.add_parser('clear-cache',
+                help='remove parsed files from the cache')
+        cacheparser.add_argument('filename', nargs='?',
+                help='only remove the cached versions of this file')
+        cacheparser.set_defaults(func=self.clear_cache)
+
         plotparser = subparsers.add_parser('plot',
                 help='draw a histogram of results for the given evaluation')
         plotparser.add_argument('eval',
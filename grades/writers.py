@@ -11,6 +11,15 @@ __author__ = "Loïc Séguin-C. <loicseguin@gmail.com>"
 __license__ = "BSD"
 
 
+import itertools
+try:
+    from itertools import izip as zip
+except ImportError:
+    pass  # Python 3
+import locale
+import mmap
+import multiprocessing
+import re
 import sys
 try:
     import StringIO as io
@@ -18,6 +27,12 @@ except ImportError:
     import io  # For Python 3
 from . import defaults
 from . import parsers
+from .columnar import ColumnarGradesTable
+
+
+# First line of a table and first blank line after a table, in bytes.
+_TABLE_START = re.compile(br'^[ \t]*[|+=]', re.M)
+_BLANK_LINE = re.compile(br'^[ \t\r\f\v]*$', re.M)
 
 
 class GradesFile:
@@ -25,9 +40,24 @@ class GradesFile:
     initialized with a file handle. It takes care of safeguarding the content
     of the file before and after the table.
 
+    With ``use_mmap=True``, the file is memory-mapped instead of being read
+    line by line. The table boundaries are found by scanning the bytes and
+    only the table is decoded and parsed. The header and the footer are kept
+    as zero-copy views of the mapped file that are written back byte for
+    byte by print_file (without the whitespace stripping done when reading
+    line by line). The file must not be truncated or rewritten while the
+    GradesFile is in use.
+
     """
-    def __init__(self, fileh, ignore_char=defaults.IGNORE_CHAR):
-        """Initialize the GradesFile object by parsing fileh."""
+    def __init__(self, fileh, ignore_char=defaults.IGNORE_CHAR,
+                 columnar=False, use_mmap=False, processes=1,
+                 columns=None, where=None):
+        """Initialize the GradesFile object by parsing fileh. If columnar is
+        True, the table is stored in a ColumnarGradesTable. If use_mmap is
+        True, the file is memory-mapped. Large tables are parsed with
+        processes processes (see TableParser.parse). If columns is a
+        parsers.Projection, only the needed columns are parsed. If where is
+        a query.Query, only the matching students are kept."""
         self.header = []
         self.table_format = defaults.TABLE_FORMAT
         self.footer = []
@@ -48,7 +78,33 @@ class GradesFile:
             gpg = gnupg.GPG()
             data = gpg.decrypt(fileh.read())
             fileh = io.StringIO(data.data.decode())
-        is_table = False
+        elif use_mmap and hasattr(fileh, 'fileno'):
+            tablerows = self._map(fileh)
+        if not tablerows:
+            tablerows = self._read_lines(fileh)
+
+        if len(tablerows) < 3:
+            raise Exception('Malformed table in file ' + fname)
+        if tablerows[0][0] == '=':
+            tparser = parsers.SimpleRSTParser(tablerows[0],
+                    ignore_char=ignore_char)
+        else:
+            tparser = parsers.TableParser(ignore_char=ignore_char)
+        self.table = tparser.parse(tablerows, processes=processes,
+                                   columns=columns, where=where)
+        if columnar:
+            try:
+                self.table = ColumnarGradesTable(self.table)
+            except ImportError:
+                print("GradesFile: error: cannot import numpy.  To use the " +
+                      "columnar backend, install numpy.", file=sys.stderr)
+                sys.exit(10)
+
+    def _read_lines(self, fileh):
+        """Read fileh line by line. The lines before and after the table are
+        stored in self.header and self.footer. Return the rows of the
+        table."""
+        tablerows = []
         line = fileh.readline()
         while line:
             # Reading header
@@ -66,35 +122,127 @@ class GradesFile:
             line = line.strip()
             self.footer.append(line)
             line = fileh.readline()
-
-        if len(tablerows) < 3:
-            raise Exception('Malformed table in file ' + fname)
-        if tablerows[0][0] == '=':
-            tparser = parsers.SimpleRSTParser(tablerows[0],
-                    ignore_char=ignore_char)
+        return tablerows
+
+    def _map(self, fileh):
+        """Memory-map fileh and find the table by scanning the bytes. The
+        header and the footer are stored as memoryviews of the mapped file.
+        Return the decoded rows of the table, or an empty list if the file
+        cannot be mapped."""
+        try:
+            data = mmap.mmap(fileh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, mmap.error, io.UnsupportedOperation):
+            # Empty files and streams cannot be mapped.
+            return []
+        view = memoryview(data)
+        match = _TABLE_START.search(data)
+        start = match.start() if match else len(data)
+        match = _BLANK_LINE.search(data, start)
+        end = match.start() if match else len(data)
+        if start == end:
+            return []
+        self.encoding = getattr(fileh, 'encoding', None) or \
+                locale.getpreferredencoding(False)
+        self.header = view[:start]
+        self.footer = view[end:]
+        tablerows = view[start:end].tobytes().decode(
+                self.encoding).splitlines(True)
+        tablerows[0] = tablerows[0].strip()
+        return tablerows
+
+    def __getstate__(self):
+        """Memoryviews of a mapped file cannot be pickled, copy them."""
+        state = self.__dict__.copy()
+        for key in ('header', 'footer'):
+            if isinstance(state[key], memoryview):
+                state[key] = state[key].tobytes()
+        return state
+
+    def _print_text(self, text, file):
+        """Print the text before or after the table. text is either a list of
+        lines or the raw bytes read from a mapped file."""
+        if isinstance(text, list):
+            print('\n'.join(text), file=file)
+        elif hasattr(file, 'buffer'):
+            file.flush()
+            file.buffer.write(text)
+            file.buffer.flush()
         else:
-            tparser = parsers.TableParser(ignore_char=ignore_char)
-        self.table = tparser.parse(tablerows)
+            file.write(bytes(text).decode(self.encoding))
 
     def print_file(self, div_on=None, columns=None, tableonly=False,
             file=sys.stdout, **kwargs):
         """Print the file and the table."""
-        if self.table_format == 'simple_rst':
-            twriter = SimpleRSTWriter(self.table, **kwargs)
-        elif self.table_format == 'grid_rst':
-            twriter = GridRSTWriter(self.table, **kwargs)
-        else:
-            if self.table_format != 'org':
-                print(sys.argv[0] +
-                      ': error: invalid table format. '
-                      'Using org table format instead.', file=sys.stderr)
-            twriter = TableWriter(self.table, **kwargs)
+        twriter = writer_class(self.table_format)(self.table, **kwargs)
         if tableonly:
             twriter.printt(div_on=div_on, columns=columns, file=file)
         else:
-            print('\n'.join(self.header), file=file)
+            self._print_text(self.header, file)
             twriter.printt(div_on=div_on, columns=columns, file=file)
-            print('\n'.join(self.footer), file=file)
+            self._print_text(self.footer, file)
+
+
+def writer_class(table_format):
+    """Return the writer class for table_format, one of 'org', 'simple_rst'
+    and 'grid_rst'."""
+    if table_format == 'simple_rst':
+        return SimpleRSTWriter
+    elif table_format == 'grid_rst':
+        return GridRSTWriter
+    if table_format != 'org':
+        print(sys.argv[0] +
+              ': error: invalid table format. '
+              'Using org table format instead.', file=sys.stderr)
+    return TableWriter
+
+
+def write_lines(lines, file, buffer_size=defaults.WRITE_BUFFER_SIZE):
+    """Write the lines of the iterable lines to file, through a buffer of
+    about buffer_size characters."""
+    buffered = []
+    size = 0
+    for line in lines:
+        buffered.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            file.write(''.join(buffered))
+            buffered = []
+            size = 0
+    file.write(''.join(buffered))
+
+
+# Writer whose rows are rendered by the worker processes, which inherit it
+# when they are forked. See TableWriter._parallel_row_lines.
+_rendering = None
+
+
+def _fork_context():
+    """Return the multiprocessing context that forks the worker processes or
+    None if processes cannot be forked."""
+    try:
+        return multiprocessing.get_context('fork')
+    except AttributeError:  # Python 2 forks on POSIX systems.
+        return None if sys.platform == 'win32' else multiprocessing
+    except ValueError:
+        return None
+
+
+def _render_chunk(bounds):
+    """Render the rows of the students from position start to stop in a
+    worker process, where bounds is (start, stop). Return the lines as one
+    string."""
+    start, stop = bounds
+    writer = _rendering
+    template = writer._template
+    div_row = writer._dividers['row']
+    cells = [texts[start:stop] for texts in writer._visible]
+    rows = zip(*cells) if cells else itertools.repeat((), stop - start)
+    lines = []
+    for mark, row in zip(writer._marks[start:stop], rows):
+        if mark:
+            lines.append(div_row)
+        lines.append(template % row)
+    return ''.join(lines)
 
 
 def _len(iterable):
@@ -110,6 +258,11 @@ def _len(iterable):
     except NameError:
         return iterable.__len__()
 
+try:
+    unicode
+except NameError:  # Python 3, where len works with non-ASCII characters.
+    _len = len
+
 
 class TableWriter:
     """A TableWriter takes care of formatting and printing a GradesTable.
@@ -133,20 +286,30 @@ class TableWriter:
     def __init__(self, grade_table, min_width=defaults.MIN_CELL_WIDTH,
                  padding_left=defaults.PADDING_LEFT,
                  padding_right=defaults.PADDING_RIGHT,
-                 precision=defaults.PRECISION):
+                 precision=defaults.PRECISION, processes=1,
+                 parallel_threshold=defaults.PARALLEL_RENDER_THRESHOLD):
         """Initialize the writer. The default parameters for a writer are to
         use a minimum column width of 5, left and right padding of 1 and a
         precision for floating point values of 2.
 
+        The rows of tables with at least parallel_threshold students are
+        rendered by processes processes (see _parallel_row_lines). None or 0
+        means one process per CPU.
+
         """
         self.min_width = min_width
         self.padding_left = padding_left
         self.padding_right = padding_right
         self.precision = precision
+        self.processes = processes
+        self.parallel_threshold = parallel_threshold
         self.table = grade_table
         self.columns_to_print = {}
         for column in self.table.columns:
-            self.columns_to_print[column['title']] = True
+            self.columns_to_print[column.title] = True
+        # Minimum widths of the columns, keyed by title, such as the widths
+        # found by a first pass over a table printed in chunks.
+        self.widths = {}
 
     def __str__(self, div_on=None, columns=None):
         """Return a string representation of the table.
@@ -163,15 +326,70 @@ class TableWriter:
            the columns.
 
         """
+        return ''.join(self.lines(div_on=div_on, columns=columns))
+
+    def lines(self, div_on=None, columns=None):
+        """Return an iterator over the lines of the table, with their end
+        of line. The parameters are the same as for __str__. The lines are
+        produced one at a time, as they are consumed."""
+        self._set_columns_to_print(columns)
+        self._set_columns_width()
+        # The divisions are checked before anything is produced.
+        rows = self.row_lines(div_on)
+        return itertools.chain(self.header_lines(), rows,
+                               self.footer_lines())
+
+    def chunk_lines(self, chunks, div_on=None, columns=None):
+        """Return an iterator over the lines of a table whose students come
+        in chunks. self.table gives the columns and the footers of the
+        table and chunks is an iterable of tables with the same columns,
+        whose students are printed in order. Only one chunk is formatted at
+        a time, as the lines are consumed, so the widths of the columns must
+        be known beforehand and set in self.widths (see column_widths). The
+        other parameters are the same as for __str__."""
+        self._set_columns_to_print(columns)
+        self._set_columns_width()
+        return itertools.chain(self.header_lines(),
+                               self._chunk_rows(chunks, div_on),
+                               self.footer_lines())
+
+    def _chunk_rows(self, chunks, div_on):
+        """Generate the lines of the rows of the tables in chunks."""
+        table = self.table
+        previous = None
+        try:
+            for chunk in chunks:
+                self.table = chunk
+                self._cells = None
+                for line in self.row_lines(div_on, previous):
+                    yield line
+                if chunk.students:
+                    previous = chunk.students[-1]
+        finally:
+            self.table = table
+            self._cells = None
+
+    def column_widths(self):
+        """Return the widths of the columns, keyed by title, for the
+        entries of the table."""
+        self._set_columns_width()
+        return dict((column.title, column.width)
+                    for column in self.table.columns)
+
+    def _set_columns_to_print(self, columns):
+        """Print only the columns whose titles are in columns, if given."""
         if columns:
             for column in self.table.columns:
-                title = column['title']
+                title = column.title
                 self.columns_to_print[title] = title in columns
-        self._set_columns_width()
-        return self.header_str() + self.rows_str(div_on) + self.footer_str()
 
-    def printt(self, div_on=None, columns=None, file=sys.stdout):
-        """Print the table.
+    def printt(self, div_on=None, columns=None, file=sys.stdout,
+               buffer_size=defaults.WRITE_BUFFER_SIZE):
+        """Print the table. Each line is written to file as soon as it is
+        produced, through a buffer of about buffer_size characters, so that
+        the whole table is never held in memory. If the reader of file goes
+        away (for example, when the output is piped into head), the
+        IOError (BrokenPipeError) is raised and no more lines are produced.
 
         Parameters
         ----------
@@ -187,31 +405,40 @@ class TableWriter:
         file: stream object
            Stream where the ouput will be written.
 
+        buffer_size: int
+           Number of characters gathered before each write to file.
+
         """
-        print(self.__str__(div_on=div_on, columns=columns), end='', file=file)
+        write_lines(self.lines(div_on=div_on, columns=columns), file,
+                    buffer_size)
 
     # Synonym for printt.
     write = printt
 
     def header_str(self):
         """Generate a string containing the header for the table."""
+        return ''.join(self.header_lines())
+
+    def header_lines(self):
+        """Generate the lines of the header for the table."""
         # Column names row.
-        str_hdr = self._div_top()
-        str_hdr += self._row_str(col['title'] for col in self.table.columns)
+        dividers = self._compiled()
+        yield dividers['top']
+        yield self._row_str(self.table.columns.titles)
 
         # Max and weight rows. These are filled only for evaluation columns.
         max_row = []
         weight_row = []
         for column in self.table.columns:
-            if column['evalu']:
-                max_row.append(column['evalu']['max_grade'])
-                weight_row.append(column['evalu']['weight'])
+            if column.evalu:
+                max_row.append(column.evalu['max_grade'])
+                weight_row.append(column.evalu['weight'])
             else:
                 max_row.append('')
                 weight_row.append('')
-        str_hdr += self._row_str(max_row) + self._row_str(weight_row)
-        str_hdr += self._div_head()
-        return str_hdr
+        yield self._row_str(max_row)
+        yield self._row_str(weight_row)
+        yield dividers['head']
 
     def rows_str(self, div_on=None):
         """Generate a string containing all the rows for the table.
@@ -224,74 +451,245 @@ class TableWriter:
            column titles.
 
         """
-        str_tbl = ''
-
-        if not self.table.students:
-            # Empty table, nothing to return.
-            return str_tbl
-
-        col_titles = [col['title'] for col in self.table.columns]
-        if div_on:
-            for ctitle in div_on:
-                if not ctitle in col_titles:
-                    raise ValueError(ctitle + " is not a valid column title.")
-            prevs = [self.table.students[0][ctitle] for ctitle in div_on]
-        for student in self.table.students:
-            if div_on:
-                curs = [student[ctitle] for ctitle in div_on]
-                for prev, cur in zip(prevs, curs):
-                    if prev != cur:
-                        str_tbl += self._div_row()
-                        break
-                prevs = curs
-            str_tbl += self._row_str(student[ctitle] for ctitle in col_titles)
-        return str_tbl
+        return ''.join(self.row_lines(div_on))
+
+    def row_lines(self, div_on=None, previous=None):
+        """Return an iterator over the lines of the rows for the table. See
+        rows_str for div_on, which is checked right away. previous is the
+        student printed just before the first student of the table, if the
+        table is printed in chunks."""
+        return self._row_lines(self._divisions(div_on, previous))
+
+    def _divisions(self, div_on, previous=None):
+        """Return the set of the positions of the students that are
+        preceded by a division. Raise ValueError if div_on contains a title
+        that is not a column title."""
+        students = self.table.students
+        if not div_on or not students:
+            return set()
+        for ctitle in div_on:
+            if not self.table.columns.has_title(ctitle):
+                raise ValueError(ctitle + " is not a valid column title.")
+        # Categorical columns are compared through their codes.
+        keys = []
+        for ctitle in div_on:
+            categories = self.table.categorical(ctitle)
+            keys.append(categories.codes if categories else
+                        [student[ctitle] for student in students])
+        divs = set(i for i in range(1, len(students))
+                   if any(key[i] != key[i - 1] for key in keys))
+        if previous is not None and any(previous[ctitle] != students[0][ctitle]
+                                        for ctitle in div_on):
+            divs.add(0)
+        return divs
+
+    def _row_lines(self, divs):
+        """Generate the lines of the rows for the table, with a division
+        before the students at the positions in divs. The rows of large
+        tables may be rendered in parallel, several lines at a time."""
+        self._compiled()
+        if (self.processes != 1 and
+                len(self.table.students) >= self.parallel_threshold):
+            return self._parallel_row_lines(divs)
+        return self._row_lines_serial(divs)
+
+    def _row_lines_serial(self, divs):
+        """Generate the lines of the rows for the table in the current
+        process."""
+        div_row = self._dividers['row']
+        for i, row in enumerate(self._compiled_rows()):
+            if i in divs:
+                yield div_row
+            yield row
+
+    def _parallel_row_lines(self, divs):
+        """Render the rows for the table in chunks using a pool of
+        processes. Generate the lines of each chunk as one string, in order,
+        as they are ready.
+
+        The worker processes are forked once the cells are formatted and
+        the layout is compiled, so that they inherit them: only the bounds
+        of the chunks and the rendered lines go between the processes.
+        Where processes cannot be forked, the rows are rendered in the
+        current process.
+
+        """
+        global _rendering
+        context = _fork_context()
+        if context is None:
+            for line in self._row_lines_serial(divs):
+                yield line
+            return
+        processes = self.processes or multiprocessing.cpu_count()
+        nb_students = len(self.table.students)
+        # A few chunks per process balance the load.
+        size = -(-nb_students // (4 * processes))
+        self._marks = bytearray(nb_students)
+        for i in divs:
+            self._marks[i] = 1
+        _rendering = self
+        try:
+            pool = context.Pool(processes)
+            try:
+                for lines in pool.imap(_render_chunk,
+                                       [(i, min(i + size, nb_students))
+                                        for i in range(0, nb_students, size)]):
+                    yield lines
+                pool.close()
+            finally:
+                pool.terminate()
+                pool.join()
+        finally:
+            _rendering = None
+            self._marks = None
 
     def footer_str(self):
         """Generate string for the footer of the table."""
-        str_ftr = ''
+        return ''.join(self.footer_lines())
+
+    def footer_lines(self):
+        """Generate the lines of the footer for the table."""
+        dividers = self._compiled()
         if self.table.footers:
-            str_ftr += self._div_row()
-            col_titles = [col['title'] for col in self.table.columns]
-            for footer in self.table.footers:
-                str_ftr += self._row_str(footer[ctitle] for ctitle in
-                        col_titles)
-        return str_ftr + self._div_bottom()
+            yield dividers['row']
+            for row in self._compiled_rows(footers=True):
+                yield row
+        yield dividers['bottom']
 
     def _set_columns_width(self):
         """Find the width of each column. The width of a column is the maximum
         width of an entry in this column plus the padding.
 
+        The cells of the students and of the footers are formatted once, here,
+        and kept in self._cells with their width for the rendering of the
+        rows, which is then compiled (see _compile).
+
         """
-        rows = self.table.students + self.table.footers
+        padding = self.padding_left + self.padding_right
+        self._cells = []
         for column in self.table.columns:
-            ctitle = column['title']
-            col_contents = [ctitle]
-            if column['is_num']:
-                for row in rows:
-                    if isinstance(row[ctitle], (float, int)):
-                        # Numerical data will be formatted to self.precision.
-                        # Calculate the width of the formatted numbers.
-                        col_contents.append(
-                                format(row[ctitle], '.%df' % self.precision))
-                    else:
-                        # Allow some cells to contain non numerical data such
-                        # as 'ABS' for absences.
-                        col_contents.append(row[ctitle])
-            else:
-                col_contents += [row[ctitle] for row in rows]
-            column['width'] = (self.padding_left + self.padding_right +
-                               max(_len(str(row)) for row in col_contents))
+            cells = self._format_cells(column, self.table.students,
+                                       self.table.footers)
+            self._cells.append(cells)
+            column.width = max(padding + max(_len(str(column.title)),
+                                             max(cells[1] or [0])),
+                               self.widths.get(column.title, 0))
+        self._cells_version = (self.table.version, len(self.table.students),
+                               len(self.table.footers))
+        self._compile()
+
+    def _format_cells(self, column, students, footers):
+        """Format the entries of column for the students and the footers, in
+        this order. Return the formatted entries, their widths, whether the
+        column is justified right (a numerical column) and the positions of
+        the entries that do not follow the alignment of the column or whose
+        width is not their length."""
+        ctitle = column.title
+        entries = [row[ctitle] for row in students]
+        footer_entries = [row[ctitle] for row in footers]
+        irregular = []
+        if column.is_num:
+            # Numerical data is formatted to self.precision, once for each
+            # distinct grade. Allow some cells to contain non numerical data
+            # such as 'ABS' for absences, which are justified left. The
+            # grades of the students are given by the validity mask of the
+            # column, those of the footers by the type of their entries.
+            fmt = '.%df' % self.precision
+            formatted = {}
+            texts = []
+            valid = list(self.table.mask(ctitle))
+            valid.extend(isinstance(entry, (float, int))
+                         for entry in footer_entries)
+            for i, (entry, is_grade) in enumerate(
+                    zip(entries + footer_entries, valid)):
+                if is_grade:
+                    text = formatted.get(entry)
+                    if text is None:
+                        text = formatted[entry] = format(entry, fmt)
+                else:
+                    text = str(entry)
+                    irregular.append(i)
+                texts.append(text)
+        else:
+            texts = [str(entry) for entry in entries + footer_entries]
+        widths = [_len(text) for text in texts]
+        if _len is not len:
+            irregular = sorted(set(irregular).union(
+                    i for i, text in enumerate(texts)
+                    if widths[i] != len(text)))
+        try:
+            # One byte per cell for the usual widths.
+            widths = bytearray(widths)
+        except ValueError:
+            pass
+        return texts, widths, column.is_num, irregular
+
+    def _compiled(self):
+        """Return the dividers of the compiled layout, formatting the cells
+        and compiling the layout again if the table changed since the widths
+        were found."""
+        if (getattr(self, '_cells', None) is None or self._cells_version !=
+                (self.table.version, len(self.table.students),
+                 len(self.table.footers))):
+            self._set_columns_width()
+        return self._dividers
+
+    def _compile(self):
+        """Compile the layout of the rows for the visible columns, their
+        widths and alignments.
+
+        The rows of the students and of the footers are rendered with a
+        single formatting operation, self._template % cells, where cells
+        are the formatted entries of the visible columns. Numbers are
+        justified right and other entries left. Entries that do not follow
+        the alignment of their column (such as 'ABS' in a numerical column)
+        or whose width is not their length are padded beforehand. The
+        dividers are also built once, in self._dividers.
+
+        """
+        fields = []
+        self._visible = []
+        for column, (texts, widths, right, irregular) in zip(
+                self.table.columns, self._cells):
+            if not self.columns_to_print[column.title]:
+                continue
+            width = column.width - self.padding_left - self.padding_right
+            for i in irregular:
+                texts[i] += ' ' * (width - widths[i])
+            fields.append(' ' * self.padding_left + ('%' if right else '%-') +
+                          str(width) + 's' + ' ' * self.padding_right)
+            self._visible.append(texts)
+        self._template = self._join_cells(fields)
+        self._dividers = {'top': self._div_top(), 'head': self._div_head(),
+                          'row': self._div_row(),
+                          'bottom': self._div_bottom()}
+
+    def _compiled_rows(self, footers=False):
+        """Generate the lines of the students, or of the footers if footers
+        is True, with the compiled layout."""
+        self._compiled()
+        nb_students = len(self.table.students)
+        if footers:
+            start, stop = nb_students, nb_students + len(self.table.footers)
+        else:
+            start, stop = 0, nb_students
+        if self._visible:
+            rows = itertools.islice(zip(*self._visible), start, stop)
+        else:
+            rows = itertools.repeat((), stop - start)
+        template = self._template
+        for cells in rows:
+            yield template % cells
 
     def _pad_cells(self, row):
         """Return list of padded cells."""
         padded = []
         for i, rowelmt in enumerate(row):
             col = self.table.columns[i]
-            if not self.columns_to_print[col['title']]:
+            if not self.columns_to_print[col.title]:
                 continue
-            width = col['width']
-            if (col['is_num'] and isinstance(rowelmt, (float, int))):
+            width = col.width
+            if (col.is_num and isinstance(rowelmt, (float, int))):
                 str_elmt = format(rowelmt, '.%df' % self.precision)
                 padded.append(
                         ' ' * (width - _len(str_elmt) - self.padding_right)
@@ -309,15 +707,18 @@ class TableWriter:
         corresponding to evaluations have their numbers justified right.
 
         """
-        padded = self._pad_cells(row)
+        return self._join_cells(self._pad_cells(row))
+
+    def _join_cells(self, padded):
+        """Join the padded cells of a row."""
         return '|' + '|'.join(padded) + '|\n'
 
     def _div_row(self):
         """Return a division to separate student rows.
         Such a division looks like |-----+------+------|."""
-        div = '|' + '+'.join('-' * col['width'] for col in
+        div = '|' + '+'.join('-' * col.width for col in
                              self.table.columns if
-                             self.columns_to_print[col['title']])
+                             self.columns_to_print[col.title])
         return div + '|\n'
 
     def _div_top(self):
@@ -354,27 +755,23 @@ class SimpleRSTWriter(TableWriter):
         ================== ======= ======== ======== ========= =========
 
     """
-    def _row_str(self, row):
-        """Create a string representation for a row in the table. The columns
-        corresponding to evaluations have their numbers justified right.
-
-        """
-        padded = self._pad_cells(row)
+    def _join_cells(self, padded):
+        """Join the padded cells of a row."""
         return ' '.join(padded) + '\n'
 
     def _div_row(self):
         """Return a division that looks like '------- ------ ----- -------'."""
-        div = ' '.join('-' * col['width'] for col in
+        div = ' '.join('-' * col.width for col in
                              self.table.columns if
-                             self.columns_to_print[col['title']])
+                             self.columns_to_print[col.title])
         return div + '\n'
 
     def _div_top(self):
         """Return a division for the top of the table.
         Such a division looks like '======= ====== ===== ======='."""
-        div = ' '.join('=' * col['width'] for col in
+        div = ' '.join('=' * col.width for col in
                              self.table.columns if
-                             self.columns_to_print[col['title']])
+                             self.columns_to_print[col.title])
         return div + '\n'
 
     def _div_bottom(self):
@@ -412,9 +809,9 @@ class GridRSTWriter(TableWriter):
     """
     def _div_row(self):
         """Return a division that looks like '+------+---------+-----+'."""
-        div = '+' + '+'.join('-' * col['width'] for col in
+        div = '+' + '+'.join('-' * col.width for col in
                              self.table.columns if
-                             self.columns_to_print[col['title']])
+                             self.columns_to_print[col.title])
         return div + '+\n'
 
     def _div_top(self):
@@ -430,43 +827,33 @@ class GridRSTWriter(TableWriter):
     def _div_head(self):
         """Return a division to separate the header from the rest of the table.
         Such a division looks like '+======+=========+=====+'."""
-        div = '+' + '+'.join('=' * col['width'] for col in
+        div = '+' + '+'.join('=' * col.width for col in
                              self.table.columns if
-                             self.columns_to_print[col['title']])
+                             self.columns_to_print[col.title])
         return div + '+\n'
 
-    def rows_str(self, div_on=None):
-        """Generate a string containing all the rows for the table.
+    def row_lines(self, div_on=None, previous=None):
+        """Return an iterator over the lines of the rows for the table.
 
         Parameters
         ----------
         div_on: tuple
             For reStructuredText tables, this parameter is ignored.
 
-        """
-        str_tbl = ''
-
-        if not self.table.students:
-            # Empty table, nothing to return.
-            return str_tbl
+        previous: Student
+            Student printed just before the first student of the table, if
+            the table is printed in chunks.
 
-        col_titles = [col['title'] for col in self.table.columns]
-        first = True
-        for student in self.table.students:
-            if not first:
-                str_tbl += self._div_row()
-            first = False
-            str_tbl += self._row_str(student[ctitle] for ctitle in col_titles)
-        return str_tbl
+        """
+        # A division before every student but the first one.
+        first = 0 if previous is not None else 1
+        return self._row_lines(set(range(first, len(self.table.students))))
 
-    def footer_str(self):
-        """Generate string for the footer of the table."""
-        str_ftr = ''
+    def footer_lines(self):
+        """Generate the lines of the footer for the table."""
+        div_row = self._compiled()['row']
         if self.table.footers:
-            str_ftr += self._div_row()
-            col_titles = [col['title'] for col in self.table.columns]
-            for footer in self.table.footers:
-                str_ftr += self._row_str(footer[ctitle] for ctitle in
-                        col_titles)
-                str_ftr += self._div_row()
-        return str_ftr
+            yield div_row
+            for row in self._compiled_rows(footers=True):
+                yield row
+                yield div_row